@@ -8,12 +8,41 @@ If the `blind` keyword is passed, the output of the `identify.py` script is
 used directly and the `interface.py` output is ignored. This is useful for
 better understanding the identify output and stress testing this script.
 
-For each article and information kind, the latest written piece of information
-is used. Thereby newer data will override earlier data.
+Expanding information is parsed once per article, see `expansion.py`, and
+malformed lines are reported in `malformed.csv` instead of aborting. With
+`--jobs N` the articles are loaded and parsed by N worker processes.
+
+If the `merge` keyword is passed, the output of `identify.py` and
+`interface.py` are merged, see `merge.py`. Reviewed articles use the reviewed
+information, with any information identified after the review, while articles
+which were not reviewed use the identified information.
+
+If the `incremental` keyword is passed, the articles are kept in a SQLite
+store, see `aggregate_store.py`, and only articles whose files changed since
+the last run are loaded again. The exports are then written from the store.
+
+If the `parquet` keyword is passed, the information is also exported as long
+and wide Parquet tables, see `columnar.py`. This requires pyarrow.
+
+For each article, sample and information kind, the latest written piece of
+information is used. Thereby newer data will override earlier data.
+
+The articles are streamed, only one article is held in memory at a time. A
+first pass collects the schema, the information titles and the fields expanded
+from expanding information, which are needed for the CSV headers. The schema
+is cached and the first pass skipped if no article file changed since. A
+second pass writes the JSON and CSV rows as each article is read.
 '''
 
 import json
+import ndjson
+import aggregate_store
 import csv
+import expansion
+import hashlib
+import itertools
+import merge
+import multiprocessing
 import os
 import sys
 
@@ -26,156 +55,363 @@ IDENTIFY_RESULT = './output/identify/results.json'
 # The export directory path
 EXPORT_DIRECTORY = './output/aggregate'
 
-# Read the output of `identify.py` or `interface.py`
-def load(summary_path):
-    # Load the summary file
+# The path of the cached schema
+SCHEMA_PATH = f'{EXPORT_DIRECTORY}/schema.json'
+
+# The version of the schema, caches of other versions are recomputed
+SCHEMA_VERSION = 3
+
+# The path of the report of malformed lines of expanding information
+MALFORMED_PATH = f'{EXPORT_DIRECTORY}/malformed.csv'
+
+# The path of the aggregate store, used if the `incremental` keyword is passed
+STORE_PATH = f'{EXPORT_DIRECTORY}/aggregate.sqlite'
+
+# The number of articles prepared at a time by the worker pool
+PREPARE_CHUNK = 256
+
+# Read the summary of the output of `identify.py` or `interface.py`
+def load_summary(summary_path):
     if os.path.isfile(summary_path) and (file := open(summary_path)):
-        summary = json.load(file)
+        return json.load(file)
     else:
         print(f'Failed to load {summary_path}, are you sure you have ran the previous script?')
         exit(-1)
 
+# Merges the summaries of `identify.py` and `interface.py`, each article has
+# the pair of its identify and interface paths, either of which may be None
+def merge_summaries(identify_summary, interface_summary):
+    return {article_name: [identify_summary.get(article_name), interface_summary.get(article_name)]
+            for article_name in list(identify_summary) + list(interface_summary)}
+
+# Read the latest piece of information of each title of each sample of a
+# single article, keyed by (sample number, title) where the sample number is
+# None for article associated data. The path may be a pair of paths to merge,
+# see `merge_summaries`
+def load_article(path):
+    # Stream the pieces of information, the files may be either the NDJSON of
+    # `identify.py` or the JSON of `interface.py`
     information = {}
-    for article_name, path in summary.items():
-        if file := open(path):
-            article = json.load(file)
+    try:
+        if isinstance(path, list):
+            identified, reviewed = [None if part is None else ndjson.read(part) for part in path]
+            infos = merge.merge(identified, reviewed)
         else:
-            print(f'Failed to open file {path}')
-            exit(-1)
+            infos = ndjson.read(path)
 
-        information[article_name] = {}
-        for info in article:
-            information[article_name][info['title']] = info
+        for info in infos:
+            nr = None if info['sample'] is None else int(info['sample'])
+            information[(nr, info['title'])] = info
+    except OSError:
+        print(f'Failed to open file {path}')
+        exit(-1)
 
     return information
 
-# Create the export directory
-os.makedirs(EXPORT_DIRECTORY, exist_ok=True)
+# Loads a single article of the summary. The article is separated into article
+# associated data and the data associated with each of its samples, where all
+# data of a sample is collected into a single group. The data of expanding
+# information is parsed into tables, see `expansion.py`, keyed by (sample
+# number, title) where the sample number is None for article associated data
+def prepare_article(summary_item):
+    article_name, path = summary_item
 
-print(f'Filtering through information ... ', flush=True, end='')
-if len(sys.argv) == 1:
-    information = load(INTERFACE_RESULT)
-elif sys.argv[1] == 'blind':
-    information = load(IDENTIFY_RESULT)
-else:
-    print('unrecognized arguments, exiting')
-    exit(-1)
-print('done')
-
-# We separate the information into two different dictionaries. One for article
-# associated data and one for sample associated data. We collect all data
-# associated with each sample into a single group
-articles, unique_article_titles = {}, set()
-samples, unique_sample_titles = [], set()
-for (article_name, infos) in information.items():
-    articles[article_name] = {}
+    article = {}
     article_samples = {}
-
-    for (title, info) in infos.items():
-        if info['sample'] is None:
-            articles[article_name][title] = info
-            unique_article_titles.add(info['title'])
+    expanded = {}
+    for ((nr, title), info) in load_article(path).items():
+        if nr is None:
+            article[title] = info
         else:
-            nr = int(info['sample'])
             if nr not in article_samples:
                 article_samples[nr] = {}
 
             article_samples[nr][title] = info
-            unique_sample_titles.add(info['title'])
 
-    # Add all samples to sample list
+        if info['expanding'] and info['data'] is not None:
+            expanded[(nr, title)] = expansion.parse(info['data'])
+
+    samples = []
     for (nr, sample) in article_samples.items():
         sample['article'] = article_name
         sample['sample number'] = nr
         samples.append(sample)
 
-print(f'Exporting in JSON format ... ', flush=True, end='')
-if ((article_file := open(f'{EXPORT_DIRECTORY}/articles.json', 'w+')) and
-    (samples_file := open(f'{EXPORT_DIRECTORY}/samples.json', 'w+'))):
-    json.dump(articles, article_file)
-    json.dump(samples, samples_file)
-    print('done')
+    return (article_name, article, samples, expanded)
+
+# Iterates over the prepared articles of the summary in order. With a worker
+# pool, the articles are prepared in parallel a chunk at a time, to keep the
+# memory bounded
+def articles_and_samples(summary, pool=None):
+    if pool is None:
+        yield from map(prepare_article, summary.items())
+        return
+
+    items = iter(summary.items())
+    while 0 < len(chunk := list(itertools.islice(items, PREPARE_CHUNK))):
+        yield from pool.map(prepare_article, chunk)
+
+# Returns the pieces of information of the sample, without the article and
+# sample number
+def sample_information(sample):
+    return [(title, info) for (title, info) in sample.items() if title != 'article' and title != 'sample number']
+
+# Returns the label the sample is mentioned by in the article, see
+# `identify.py`, or None if no piece of information carries one
+def sample_label(sample):
+    return next((info['sample label'] for (_, info) in sample_information(sample)
+                 if info.get('sample label') is not None), None)
+
+# Returns the path, modification time and size of the files of an article in
+# the summary, which changes if any of them is rewritten
+def source_stamp(paths):
+    stamp = ''
+    for path in paths if isinstance(paths, list) else [paths]:
+        stat = os.stat(path) if path is not None and os.path.isfile(path) else None
+        stamp += f'{path}\0{stat and stat.st_mtime_ns}\0{stat and stat.st_size}\0'
+
+    return stamp
+
+# Returns a hash of the paths and contents of the files of an article in the
+# summary
+def source_hash(paths):
+    hash = hashlib.sha256()
+    for path in paths if isinstance(paths, list) else [paths]:
+        hash.update(f'{path}\0'.encode())
+        if path is not None and os.path.isfile(path) and (file := open(path, 'rb')):
+            hash.update(file.read())
+
+    return hash.hexdigest()
+
+# Returns a hash of the stamps of every article, which changes if any article
+# is added, removed or rewritten
+def summary_stamp(summary):
+    stamp = hashlib.sha256()
+    for (article_name, paths) in summary.items():
+        stamp.update(f'{article_name}\0{source_stamp(paths)}'.encode())
+
+    return stamp.hexdigest()
+
+# Updates the aggregate store with the articles of the summary whose files
+# changed since last stored, and removes articles no longer in the summary.
+# Returns the number of updated articles
+def update_store(store, summary, pool=None):
+    stored = store.sources()
+
+    changed, sources = {}, {}
+    for (position, (article_name, paths)) in enumerate(summary.items()):
+        stamp = source_stamp(paths)
+        if article_name in stored and stored[article_name][0] == stamp:
+            store.touch(article_name, position, stamp)
+            continue
+
+        # The files may have been rewritten without changing
+        hash = source_hash(paths)
+        if article_name in stored and stored[article_name][1] == hash:
+            store.touch(article_name, position, stamp)
+            continue
+
+        changed[article_name] = paths
+        sources[article_name] = (position, stamp, hash)
+
+    for prepared in articles_and_samples(changed, pool):
+        store.add(*sources[prepared[0]], prepared)
+
+    store.retain(summary)
+    store.commit()
+
+    return len(changed)
+
+# Collects the schema, the unique article information titles, the unique
+# sample information titles and all internal fields (fields expanded from
+# expanding information), in order of first appearance. Uses the cached schema
+# if no article changed
+def collect_schema(summary, pool=None):
+    stamp = summary_stamp(summary)
+    if os.path.isfile(SCHEMA_PATH) and (file := open(SCHEMA_PATH)):
+        schema = json.load(file)
+        if schema.get('version') == SCHEMA_VERSION and schema.get('stamp') == stamp:
+            return schema
+
+    article_titles, sample_titles, internal_fields = {}, {}, {}
+    for (_, article, samples, expanded) in articles_and_samples(summary, pool):
+        article_titles.update(dict.fromkeys(article))
+
+        for sample in samples:
+            for (title, _) in sample_information(sample):
+                sample_titles[title] = None
+
+                if (sample['sample number'], title) in expanded:
+                    names, _, _, _ = expanded[(sample['sample number'], title)]
+                    internal_fields.update(dict.fromkeys(names))
+
+    schema = {
+        'version': SCHEMA_VERSION,
+        'stamp': stamp,
+        'article titles': list(article_titles),
+        'sample titles': list(sample_titles),
+        'internal fields': list(internal_fields),
+    }
+    if file := open(SCHEMA_PATH, 'w+'):
+        json.dump(schema, file)
+    else:
+        print(f'Failed to open file {SCHEMA_PATH}')
+
+    return schema
+
+# Create the export directory
+os.makedirs(EXPORT_DIRECTORY, exist_ok=True)
+
+summary_path, exporter, store, pool = INTERFACE_RESULT, None, None, None
+arguments = iter(sys.argv[1:])
+for argument in arguments:
+    if argument == 'blind':
+        summary_path = IDENTIFY_RESULT
+    elif argument == 'merge':
+        summary_path = None
+    elif argument == 'parquet':
+        exporter = True
+    elif argument == 'incremental':
+        store = True
+    elif argument == '--jobs':
+        try:
+            jobs = int(next(arguments, None))
+        except (TypeError, ValueError):
+            print(f'The {argument} option requires a number')
+            exit(-1)
+
+        # The workers are forked, as this script is not importable
+        pool = multiprocessing.get_context('fork').Pool(jobs)
+    else:
+        print('unrecognized arguments, exiting')
+        exit(-1)
+
+if summary_path is None:
+    # No article may have been reviewed yet
+    reviewed = load_summary(INTERFACE_RESULT) if os.path.isfile(INTERFACE_RESULT) else {}
+    summary = merge_summaries(load_summary(IDENTIFY_RESULT), reviewed)
 else:
-    print('failed')
-    exit(-1)
+    summary = load_summary(summary_path)
+
+if store is not None:
+    print(f'Updating the aggregate store ... ', flush=True, end='')
+    store = aggregate_store.Store(STORE_PATH)
+    updated = update_store(store, summary, pool)
+    print(f'done, {updated} of {len(summary)} articles updated')
 
-print(f'Exporting in CSV format ... ', flush=True, end='')
-if ((article_file := open(f'{EXPORT_DIRECTORY}/articles.csv', 'w+')) and
-    (samples_file := open(f'{EXPORT_DIRECTORY}/samples.csv', 'w+'))):
+    schema = store.schema()
+    articles = store.articles()
+else:
+    print(f'Collecting the information schema ... ', flush=True, end='')
+    schema = collect_schema(summary, pool)
+    print('done')
+
+    articles = articles_and_samples(summary, pool)
+
+# The Parquet export is optional, as it requires pyarrow
+if exporter is not None:
+    try:
+        import columnar
+    except ImportError:
+        print('The parquet export requires the pyarrow package')
+        exit(-1)
+
+    exporter = columnar.Exporter(EXPORT_DIRECTORY, schema)
+
+print(f'Exporting in {"JSON, CSV and Parquet" if exporter is not None else "JSON and CSV"} format ... ',
+      flush=True, end='')
+if ((article_json := open(f'{EXPORT_DIRECTORY}/articles.json', 'w+')) and
+    (samples_json := open(f'{EXPORT_DIRECTORY}/samples.json', 'w+')) and
+    (article_file := open(f'{EXPORT_DIRECTORY}/articles.csv', 'w+')) and
+    (samples_file := open(f'{EXPORT_DIRECTORY}/samples.csv', 'w+')) and
+    (malformed_file := open(MALFORMED_PATH, 'w+'))):
     article_file = csv.writer(article_file)
+    samples_file = csv.writer(samples_file)
+
+    # Malformed lines of expanding information are skipped and reported
+    malformed_file = csv.writer(malformed_file)
+    malformed_file.writerow(['article id', 'sample number', 'title', 'line number', 'line'])
+    malformed_count = 0
 
     # The header will be the article followed by one field for each unique
     # information title, meaning every row will store one article. The fields
     # specified on the article will be filled out. This will ease information
     # usage in normal spreadsheet programs. In this output format we drop the
     # source, which can be accessed through the JSON export
-    headers = ['article id']
-    headers.extend(list(unique_article_titles))
-    article_file.writerow(headers)
+    article_headers = ['article id'] + schema['article titles']
+    article_file.writerow(article_headers)
+    article_headers_map = dict([(header, i) for (i, header) in enumerate(article_headers)])
+
+    # We then have to do almost the same thing for the samples CSV file.
+    # The main difference is that we expand expanding information for easier
+    # CSV handling
+    sample_headers = ['article id', 'sample number', 'sample label'] + \
+        schema['sample titles'] + schema['internal fields']
+    samples_file.writerow(sample_headers)
+    sample_headers_map = dict([(header, i) for (i, header) in enumerate(sample_headers)])
 
-    # Create a header map
-    headers_map = dict([(header, i) for (i, header) in enumerate(headers)])
+    # The JSON files are written piece by piece, as an object of articles and
+    # a list of samples
+    article_json.write('{')
+    samples_json.write('[')
+    first_article, first_sample = True, True
 
-    for article, article_info in articles.items():
-        row = [None] * len(headers)
+    for (article_name, article, samples, expanded) in articles:
+        article_json.write(f'{"" if first_article else ", "}{json.dumps(article_name)}: {json.dumps(article)}')
+        first_article = False
+
+        row = [None] * len(article_headers)
 
         # Set the data
-        row[headers_map['article id']] = article
-        for (title, info) in article_info.items():
-            row[headers_map[title]] = info['data']
+        row[article_headers_map['article id']] = article_name
+        for (title, info) in article.items():
+            row[article_headers_map[title]] = info['data']
 
         # Save as row
         article_file.writerow(row)
 
-    # We then have to do almost the same thing for the samples CSV file.
-    # The main difference is that we expand expanding information for easier
-    # CSV handling
+        for sample in samples:
+            samples_json.write(f'{"" if first_sample else ", "}{json.dumps(sample)}')
+            first_sample = False
 
-    # Determine all internal fields (fields expanded from expandable infos)
-    internal_fields = set()
-    for sample in samples:
-        for (title, info) in sample.items():
-            if title == 'article' or title == 'sample number':
-                continue
+            row = [None] * len(sample_headers)
 
-            if info['expanding'] and info['data'] is not None:
-                for line in csv.reader(info['data'].split('\n')):
-                    internal_fields.add(line[0].strip().lower())
+            # Set the data
+            row[sample_headers_map['article id']] = sample['article']
+            row[sample_headers_map['sample number']] = sample['sample number']
+            row[sample_headers_map['sample label']] = sample_label(sample)
+            for (title, info) in sample_information(sample):
+                # Expand expanding information
+                if (sample['sample number'], title) in expanded:
+                    names, values, _, malformed = expanded[(sample['sample number'], title)]
+                    for (name, value) in zip(names, values):
+                        row[sample_headers_map[name]] = value
 
-    # Open the CSV file and write header
-    samples_file = csv.writer(samples_file)
-    headers = ['article id', 'sample number']
-    headers.extend(list(unique_sample_titles))
-    headers.extend(list(internal_fields))
-    samples_file.writerow(headers)
+                    for (line_number, line) in malformed:
+                        malformed_file.writerow([article_name, sample['sample number'], title, line_number, line])
+                    malformed_count += len(malformed)
 
-    # Create a header map
-    headers_map = dict([(header, i) for (i, header) in enumerate(headers)])
+                row[sample_headers_map[title]] = info['data']
 
-    for sample in samples:
-        row = [None] * len(headers)
+            # Save as row
+            samples_file.writerow(row)
 
-        # Set the data
-        row[headers_map['article id']] = sample['article']
-        row[headers_map['sample number']] = sample['sample number']
-        for (title, info) in sample.items():
-            if title == 'article' or title == 'sample number':
-                continue
-
-            # Expand expanding information
-            if info['expanding'] and info['data'] is not None:
-                for line in csv.reader(info['data'].split('\n')):
-                    name = line[0].strip().lower()
-                    value = line[1].strip()
-
-                    row[headers_map[name]] = value
+        if exporter is not None:
+            exporter.add(article_name, article, samples, expanded)
 
-            row[headers_map[title]] = info['data']
+    article_json.write('}')
+    samples_json.write(']')
+    if exporter is not None:
+        exporter.close()
+    print('done')
 
-        # Save as row
-        samples_file.writerow(row)
+    if 0 < malformed_count:
+        print(f'Skipped {malformed_count} malformed lines of expanding information, see {MALFORMED_PATH}')
 
-    print('done')
+    if pool is not None:
+        pool.close()
+    if store is not None:
+        store.close()
 else:
     print('failed')
     exit(-1)
@@ -0,0 +1,160 @@
+'''
+A persistent SQLite store of the per-article contributions to the aggregate,
+used by `aggregate.py` when the `incremental` keyword is passed.
+
+Each article is stored as prepared by `aggregate.py`, its article associated
+information, its samples and the parsed tables of its expanding information,
+together with the hash of its source files. Only articles whose source files
+changed are prepared again, and the exports are regenerated from the store.
+
+The titles and expanded fields of each article are also kept in a separate
+table, such that the schema of the exports is a single query instead of a pass
+over all articles.
+'''
+
+import json
+import numpy as np
+import sqlite3
+
+# The schema of the store, the position is the order of the article in the
+# summary
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL,
+    position INTEGER NOT NULL,
+    stamp TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    article TEXT NOT NULL,
+    samples TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS expanded (
+    article INTEGER NOT NULL REFERENCES articles(id) ON DELETE CASCADE,
+    sample INTEGER,
+    title TEXT NOT NULL,
+    names TEXT NOT NULL,
+    vals TEXT NOT NULL,
+    numbers BLOB NOT NULL,
+    malformed TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS expanded_article ON expanded (article);
+CREATE TABLE IF NOT EXISTS fields (
+    article INTEGER NOT NULL REFERENCES articles(id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS fields_article ON fields (article);
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+'''
+
+# The version of the stored contributions, stores of other versions are
+# cleared
+VERSION = 2
+
+# The kinds of fields of the schema, in the keys used by `aggregate.py`
+FIELD_KINDS = ['article titles', 'sample titles', 'internal fields']
+
+class Store:
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        self.connection.executescript(SCHEMA)
+
+        row = self.connection.execute("SELECT value FROM settings WHERE key = 'version'").fetchone()
+        if row is None or int(row[0]) != VERSION:
+            self.connection.execute('DELETE FROM articles')
+            self.connection.execute("INSERT OR REPLACE INTO settings VALUES ('version', ?)", (VERSION,))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def commit(self):
+        self.connection.commit()
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+    # The (stamp, hash) of the source files of every stored article
+    def sources(self):
+        return {name: (stamp, hash) for (name, stamp, hash)
+                in self.connection.execute('SELECT name, stamp, hash FROM articles')}
+
+    # Updates the stamp and position of an article whose source files did not
+    # change
+    def touch(self, name, position, stamp):
+        self.connection.execute('UPDATE articles SET position = ?, stamp = ? WHERE name = ?',
+                                (position, stamp, name))
+
+    # Adds a prepared article, replacing any previous version of it
+    def add(self, position, stamp, hash, prepared):
+        article_name, article, samples, expanded = prepared
+        self.remove(article_name)
+
+        cursor = self.connection.cursor()
+        cursor.execute('INSERT INTO articles (name, position, stamp, hash, article, samples) VALUES (?, ?, ?, ?, ?, ?)',
+                       (article_name, position, stamp, hash, json.dumps(article), json.dumps(samples)))
+        id = cursor.lastrowid
+
+        cursor.executemany('INSERT INTO expanded VALUES (?, ?, ?, ?, ?, ?, ?)',
+                           [(id, sample, title, json.dumps(names), json.dumps(values),
+                             np.asarray(numbers, dtype=np.float64).tobytes(), json.dumps(malformed))
+                            for ((sample, title), (names, values, numbers, malformed)) in expanded.items()])
+
+        # The schema contributions of the article, in order of appearance
+        fields = {kind: {} for kind in FIELD_KINDS}
+        fields['article titles'].update(dict.fromkeys(article))
+        for sample in samples:
+            for title in sample:
+                if title != 'article' and title != 'sample number':
+                    fields['sample titles'][title] = None
+
+                    if (sample['sample number'], title) in expanded:
+                        fields['internal fields'].update(dict.fromkeys(expanded[(sample['sample number'], title)][0]))
+
+        cursor.executemany('INSERT INTO fields VALUES (?, ?, ?, ?)',
+                           [(id, kind, i, name) for (kind, names) in fields.items() for (i, name) in enumerate(names)])
+
+    # Removes an article from the store, if present
+    def remove(self, name):
+        self.connection.execute('DELETE FROM articles WHERE name = ?', (name,))
+
+    # Removes all articles not among the given names
+    def retain(self, names):
+        names = set(names)
+        for stored_name in list(self.sources()):
+            if stored_name not in names:
+                self.remove(stored_name)
+
+    # The schema of the stored articles, each kind of field in order of first
+    # appearance
+    def schema(self):
+        schema = {kind: {} for kind in FIELD_KINDS}
+        rows = self.connection.execute('''
+            SELECT fields.kind, fields.name FROM fields JOIN articles ON articles.id = fields.article
+            ORDER BY articles.position, fields.position''')
+        for (kind, name) in rows:
+            schema[kind][name] = None
+
+        return {kind: list(names) for (kind, names) in schema.items()}
+
+    # Iterates over the stored articles in order, in the form prepared by
+    # `aggregate.py`
+    def articles(self):
+        rows = self.connection.execute('SELECT id, name, article, samples FROM articles ORDER BY position')
+        for (id, article_name, article, samples) in rows:
+            expanded = {}
+            for (sample, title, names, values, numbers, malformed) in self.connection.execute(
+                    'SELECT sample, title, names, vals, numbers, malformed FROM expanded WHERE article = ?', (id,)):
+                expanded[(sample, title)] = (tuple(json.loads(names)), tuple(json.loads(values)),
+                                             np.frombuffer(numbers, dtype=np.float64),
+                                             tuple(tuple(line) for line in json.loads(malformed)))
+
+            yield (article_name, json.loads(article), json.loads(samples), expanded)
@@ -0,0 +1,572 @@
+#!/usr/bin/env python3
+
+'''
+A script for benchmarking stages of the pipeline on synthetic data generated
+locally, meaning no downloaded articles are needed.
+
+The first argument is the benchmark to run, the following arguments are
+benchmark specific options given as `--option value`
+
+`pdf`: Streaming PDF text extraction and JSON export of `extract.py` on
+       generated PDFs of increasing page count. Reports the time and peak RSS
+       for each page count, and fails if the peak RSS grows with the page
+       count. Option `--pages` is a comma separated list of page counts
+       (default 10,100,1000).
+`tables`: PDF table detection of `extract.py` on generated pages containing
+          ruled tables, tables without rulings and table mentions which are
+          not tables, also on two-column pages. Reports the precision, recall
+          and pages per second. Option `--pages` is the page count (default
+          200).
+`matcher`: Keyword filter scanning of `identify.py` on generated text with an
+           increasing number of keyword filters, comparing one regex pass per
+           filter to the combined single pass matcher. The combined scan time
+           should stay constant. Option `--filters` is a comma separated list
+           of filter counts (default 5,50,500) and `--words` the text length in
+           words (default 20000).
+`spans`: Mapping of match locations in reference stripped text back to the
+         original text in `identify.py`, on generated citation-dense method
+         sections. Compares the previous linear offset walk to the binary
+         search and checks that every mapped span covers the matched text.
+         Option `--references` is a comma separated list of reference counts
+         (default 10,100,1000).
+`identify`: Throughput of `identify.py` on a generated corpus. Runs all filters
+            without any cache, then again with the per-filter result cache,
+            and each filter on its own with the preprocessing cached. Reports
+            articles/s, information/s and peak RSS. Options `--articles`
+            (default 200), `--sections` per article (default 8), `--words` per
+            section (default 400), `--citations` per 100 words (default 2),
+            `--figures` (default 4) and `--tables` (default 2) per article.
+
+Each PDF and identify measurement is run in a freshly spawned process to get
+an unbiased peak RSS. The results are printed and exported as JSON to
+`output/benchmark/<benchmark>.json`, to be compared between commits.
+'''
+
+import multiprocessing
+import resource
+import random
+import shutil
+import re
+import tempfile
+import textwrap
+import json
+import time
+import sys
+import os
+
+# The export directory path
+EXPORT_DIRECTORY = './output/benchmark'
+
+# A line of filler text used for generated documents
+FILLER_LINE = 'Samples were collected and the abundance of resistance genes was measured'
+
+# The number of text lines on each generated PDF page
+PDF_LINES_PER_PAGE = 40
+
+# The allowed difference in peak RSS (in MiB) between the PDF page counts
+PDF_RSS_TOLERANCE = 8
+
+# Generates a PDF with a repeated page header, a numbered bold section header
+# every fifth page and filler text. The text of each page is committed as a
+# single content stream, as in typical PDFs, instead of one per line
+def generate_pdf(path, pages):
+    import fitz
+
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        shape = page.new_shape()
+        shape.insert_text((72, 40), f'Journal of Synthetic Results, page {i + 1}', fontsize=8)
+
+        y = 80
+        if i % 5 == 0:
+            shape.insert_text((72, y), f'{i // 5 + 1}. Section {i // 5 + 1}', fontname='hebo', fontsize=12)
+            y += 24
+
+        for _ in range(PDF_LINES_PER_PAGE):
+            shape.insert_text((72, y), FILLER_LINE, fontsize=10)
+            y += 16
+        shape.commit()
+
+    doc.save(path)
+    doc.close()
+
+# The columns and gene names of generated tables
+TABLE_COLUMNS = ['Gene', 'Soil', 'Manure', 'Sewage']
+TABLE_GENES = ['tetM', 'sul1', 'ermB', 'blaTEM', 'qnrS', 'intI1', 'aadA', 'vanA']
+
+# The line length in characters and the line spacing of two-column pages
+TWO_COLUMN_LINE_LENGTH = 40
+TWO_COLUMN_LINE_SPACING = 12
+
+# Generates a PDF where every fourth page contains a table with rulings, a
+# table without rulings, a paragraph starting with a table reference or two
+# columns of paragraphs mentioning tables, none of which are tables. Returns
+# the (title, rows, columns) of each generated table
+def generate_table_pdf(path, pages):
+    import fitz
+
+    doc = fitz.open()
+    tables = []
+    for i in range(pages):
+        page = doc.new_page()
+        y = 60
+        for _ in range(5):
+            page.insert_text((72, y), FILLER_LINE, fontsize=10)
+            y += 16
+
+        if i % 4 in (0, 1):
+            title = f'Table {len(tables) + 1}'
+            rows = 2 + i % 7
+            tables.append((title, rows + 1, len(TABLE_COLUMNS)))
+            ruled = i % 4 == 0
+
+            y += 10
+            page.insert_text((72, y), f'{title}. Abundance of resistance genes per sample type', fontsize=10)
+            y += 8
+            for row in range(rows + 1):
+                if ruled and row < 2:
+                    page.draw_line((72, y), (520, y))
+                y += 14
+
+                cells = TABLE_COLUMNS if row == 0 else \
+                    [TABLE_GENES[row % len(TABLE_GENES)]] + [f'{row * j * 0.013:.3f}' for j in range(1, 4)]
+                for j, cell in enumerate(cells):
+                    page.insert_text((72 + j * 110, y), cell, fontsize=9)
+                y += 4
+            if ruled:
+                page.draw_line((72, y), (520, y))
+        elif i % 4 == 2:
+            page.insert_text((72, y + 10), 'Table 1 summarises the sampling sites of the study', fontsize=10)
+        else:
+            # Two columns of body text lining up row by row. The left column
+            # mentions a table at the start of a line within a paragraph, the
+            # right column starts with a short paragraph referencing a table
+            lines = textwrap.wrap(' '.join([FILLER_LINE + '.'] * 3), TWO_COLUMN_LINE_LENGTH)
+            left = ['', ''] + lines + \
+                ['Table 2 shows the abundance per sample type.'] + lines
+            right = ['Table 2 shows the abundance per site.', ''] + lines + lines[:1] + lines
+            for (left_line, right_line) in zip(left, right):
+                y += TWO_COLUMN_LINE_SPACING
+                page.insert_text((72, y), left_line, fontsize=9)
+                page.insert_text((320, y), right_line, fontsize=9)
+
+        y += 30
+        for _ in range(5):
+            page.insert_text((72, y), FILLER_LINE, fontsize=10)
+            y += 16
+
+    doc.save(path)
+    doc.close()
+
+    return tables
+
+# Returns the peak RSS of the current process in KiB. `VmHWM` is used where
+# available as, unlike `ru_maxrss` on Linux, it is reset when a spawned
+# process executes and thereby excludes the peak of the parent process, which
+# generated the input
+def peak_rss_kb():
+    try:
+        with open('/proc/self/status') as file:
+            for line in file:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+# Extracts the given PDF, exports it as JSON the same way as `extract.py` and
+# reports the time and peak RSS (in the spawned process) through the queue
+def measure_pdf_extraction(path, export_directory, queue):
+    import extract
+    import spool
+    extract.EXPORT_DIRECTORY = export_directory
+
+    start = time.perf_counter()
+    result = extract.extract_from_pdf('benchmark', path)
+    with open(os.path.join(export_directory, 'benchmark.json'), 'w') as file:
+        spool.dump(result, file.write)
+    seconds = time.perf_counter() - start
+
+    queue.put({
+        'seconds': seconds,
+        'peak rss kb': peak_rss_kb(),
+        'sections': len(result['sections']),
+        'characters': sum(len(chunk) for section in result['sections'] for chunk in section['content'].chunks()),
+    })
+
+# Runs the function in a freshly spawned process and returns what it puts in
+# the queue
+def run_spawned(function, *args):
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=function, args=(*args, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+
+    return result
+
+# Detects the tables of the given PDF and reports the detected tables and the
+# time spent through the queue
+def measure_table_detection(path, queue):
+    import extract
+
+    tables = []
+    start = time.perf_counter()
+    for page, page_text in extract.stream_pages(path, 'dict'):
+        tables.extend(extract.detect_page_tables(page, page_text))
+    seconds = time.perf_counter() - start
+
+    queue.put({'seconds': seconds, 'tables': tables})
+
+def benchmark_pdf(options):
+    page_counts = [int(count) for count in options.get('pages', '10,100,1000').split(',')]
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for pages in page_counts:
+            path = os.path.join(directory, f'{pages}.pdf')
+            generate_pdf(path, pages)
+
+            result = run_spawned(measure_pdf_extraction, path, directory)
+            result['pages'] = pages
+
+            # The preface and one section per generated section header
+            assert result['sections'] == 1 + (pages + 4) // 5, f'{result["sections"]} sections extracted'
+            result['pages per second'] = pages / result['seconds']
+            results.append(result)
+
+            print(f'{pages} pages: {result["seconds"]:.2f} s, {result["pages per second"]:.1f} pages/s, '
+                  f'{result["sections"]} sections, peak RSS {result["peak rss kb"] / 1024:.1f} MiB')
+
+    # The peak RSS must not grow with the page count
+    peaks = [result['peak rss kb'] for result in results]
+    growth = (max(peaks) - min(peaks)) / 1024
+    assert growth < PDF_RSS_TOLERANCE, f'peak RSS grew by {growth:.1f} MiB'
+
+    return results
+
+def benchmark_tables(options):
+    pages = int(options.get('pages', '200'))
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'tables.pdf')
+        expected = generate_table_pdf(path, pages)
+        result = run_spawned(measure_table_detection, path)
+
+    # A detected table is correct if a table with the same title was
+    # generated and the number of rows and columns match
+    expected = {title: (rows, columns) for (title, rows, columns) in expected}
+    correct = 0
+    for table in result['tables']:
+        lines = table['content'].strip().split('\n')
+        shape = (len(lines) - 1, lines[0].count('|') - 1)
+        if expected.get(table['title']) == shape:
+            correct += 1
+
+    results = {
+        'pages': pages,
+        'seconds': result['seconds'],
+        'pages per second': pages / result['seconds'],
+        'generated tables': len(expected),
+        'detected tables': len(result['tables']),
+        'precision': correct / max(1, len(result['tables'])),
+        'recall': correct / max(1, len(expected)),
+    }
+
+    print(f'{pages} pages: {results["pages per second"]:.1f} pages/s, '
+          f'precision {results["precision"]:.3f}, recall {results["recall"]:.3f}')
+
+    return results
+
+# The number of keyword filters which actually occur in the generated text,
+# keeping the number of matches the same for all filter counts
+MATCHER_OCCURRING_FILTERS = 5
+
+# Generates keyword filters in the style of the `identify.py` categories, each
+# with a few case-insensitive keywords
+def generate_keyword_filters(count):
+    return {f'filter {i}': re.compile('|'.join([f'keyword{i}', f'keyword{i}s', f'marker{i}']), re.IGNORECASE)
+            for i in range(count)}
+
+# Generates filler text with occurrences of the keywords of the first filters
+def generate_keyword_text(words):
+    filler = FILLER_LINE.split(' ')
+    keywords = [f'Keyword{i}' for i in range(MATCHER_OCCURRING_FILTERS)]
+
+    generator = random.Random(0)
+    return ' '.join(generator.choice(keywords) if i % 50 == 0 else generator.choice(filler)
+                    for i in range(words))
+
+def benchmark_matcher(options):
+    import matcher
+
+    filter_counts = [int(count) for count in options.get('filters', '5,50,500').split(',')]
+    text = generate_keyword_text(int(options.get('words', '20000')))
+
+    results = []
+    for filters in filter_counts:
+        patterns = generate_keyword_filters(filters)
+
+        start = time.perf_counter()
+        separate = {key: [(*match.span(), match.group()) for match in regex.finditer(text)]
+                    for key, regex in patterns.items()}
+        separate_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        combined_matcher = matcher.Matcher(patterns)
+        compile_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        combined = combined_matcher.scan(text)
+        combined_seconds = time.perf_counter() - start
+
+        results.append({
+            'filters': filters,
+            'characters': len(text),
+            'matches': sum(len(matches) for matches in combined.values()),
+            'equal': separate == combined,
+            'separate seconds': separate_seconds,
+            'combined seconds': combined_seconds,
+            'compile seconds': compile_seconds,
+        })
+
+        print(f'{filters} filters: separate {separate_seconds * 1000:.1f} ms, '
+              f'combined {combined_seconds * 1000:.1f} ms (compiled in {compile_seconds * 1000:.1f} ms), '
+              f'equal matches {separate == combined}')
+
+    return results
+
+# Generates a method section where every sentence mentions a sample year and
+# ends with a citation, except for the last sentence
+def generate_cited_text(references):
+    generator = random.Random(0)
+    sentences = [f'Samples were collected in {generator.randint(1990, 2022)} and analysed '
+                 f'(Author{i} et al., {generator.randint(1990, 2022)}).' for i in range(references)]
+    sentences.append(f'The samples were stored until {generator.randint(1990, 2022)}.')
+
+    return ' '.join(sentences)
+
+# The linear offset walk used by `identify.py` before offsets were prefix
+# summed, given offsets as a list of (position, removed length)
+def adjust_span_linear(span, offsets):
+    offset = 0
+    for (modified, local_offset) in offsets:
+        if span[0] < modified:
+            return (span[0] + offset, span[1] + offset)
+
+        offset += local_offset
+
+    return span
+
+def benchmark_spans(options):
+    import identify
+
+    reference_counts = [int(count) for count in options.get('references', '10,100,1000').split(',')]
+    year_regex = identify.FILTERS['sample year']['regex']
+
+    results = []
+    for references in reference_counts:
+        text = generate_cited_text(references)
+        stripped, offsets = identify.exclude_references(text)
+        spans = [match.span() for match in year_regex.finditer(stripped)]
+
+        positions, shifts = offsets
+        linear_offsets = [(position, shift - (shifts[i - 1] if 0 < i else 0))
+                          for i, (position, shift) in enumerate(zip(positions, shifts))]
+
+        start = time.perf_counter()
+        linear = [adjust_span_linear(span, linear_offsets) for span in spans]
+        linear_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        bisected = [identify.adjust_span(span, offsets) for span in spans]
+        bisect_seconds = time.perf_counter() - start
+
+        # A span is correct if it covers the same text in the original
+        correct = lambda adjusted: sum(text[start:end] == stripped[span[0]:span[1]]
+                                       for (start, end), span in zip(adjusted, spans))
+
+        results.append({
+            'references': references,
+            'matches': len(spans),
+            'linear seconds': linear_seconds,
+            'bisect seconds': bisect_seconds,
+            'linear correct': correct(linear),
+            'bisect correct': correct(bisected),
+        })
+
+        print(f'{references} references, {len(spans)} matches: linear {linear_seconds * 1000:.2f} ms '
+              f'({correct(linear)} correct), bisect {bisect_seconds * 1000:.2f} ms ({correct(bisected)} correct)')
+
+    return results
+
+# The names of generated sections, the sampling section is a subsection of the
+# methods section
+IDENTIFY_SECTION_NAMES = ['Abstract', 'Introduction', 'Materials and methods', 'Sampling', 'Results',
+                          'Discussion', 'Acknowledgements', 'References']
+
+# Words of generated text which are matched by the `identify.py` filters
+IDENTIFY_KEYWORDS = ['soil', 'manure', 'sewage', 'polluted', 'contaminated', 'multiplex', 'abundance', 'ARGs',
+                     'site A', 'site B', 'sample 3']
+
+# Generates a section with the given number of words, the given number of
+# citations per 100 words and keywords of the filters
+def generate_section_text(generator, words, citations):
+    filler = FILLER_LINE.split(' ')
+
+    parts = []
+    for i in range(words):
+        if generator.random() < 0.02:
+            parts.append(generator.choice(IDENTIFY_KEYWORDS))
+        elif generator.random() < 0.01:
+            parts.append(str(generator.randint(1990, 2022)))
+        else:
+            parts.append(generator.choice(filler))
+
+        if generator.random() < citations / 100:
+            parts.append(f'(Author{i} et al., {generator.randint(1990, 2022)})')
+        if i % 15 == 14:
+            parts[-1] += '.'
+
+    return ' '.join(parts)
+
+# Generates an article in the format of the `extract.py` output
+def generate_article(generator, sections, words, citations, figures, tables):
+    article_sections = []
+    for i in range(sections):
+        name = IDENTIFY_SECTION_NAMES[i % len(IDENTIFY_SECTION_NAMES)]
+        article_sections.append({
+            'name': name,
+            'content': generate_section_text(generator, words, citations),
+            'parent': 2 if name == 'Sampling' and 2 < sections else None,
+        })
+
+    article_tables = []
+    for i in range(tables):
+        rows = [[generator.choice(TABLE_GENES)] + [f'{generator.random():.3f}' for _ in TABLE_COLUMNS[1:]]
+                for _ in range(6)]
+        article_tables.append({
+            'title': f'Table {i + 1}',
+            'caption': f'Abundance of ARGs per sample type {i + 1}',
+            'content': '\n'.join('| ' + ' | '.join(row) + ' |' for row in [TABLE_COLUMNS, ['---'] * 4] + rows),
+        })
+
+    return {
+        'metadata': {'title': 'A synthetic article', 'publish date': '2023-01-01', 'abstract': None},
+        'sections': article_sections,
+        'section_order': list(range(sections)),
+        'figures': [{'title': f'Figure {i + 1}', 'caption': generate_section_text(generator, 30, 0),
+                     'path': None, 'duplicate': False} for i in range(figures)],
+        'tables': article_tables,
+    }
+
+# Runs `identify_information` over all articles, with the caches in the given
+# directory. Returns the seconds and the number of identified information
+def time_identify(identify, articles, cache_directory):
+    identify.PREPROCESSED_DIRECTORY = f'{cache_directory}/preprocessed'
+    identify.RESULT_CACHE_DIRECTORY = f'{cache_directory}/results'
+    identify.EMBEDDING_PATH = f'{cache_directory}/embeddings.sqlite'
+
+    start = time.perf_counter()
+    count = sum(1 for (name, path) in articles.items() for _ in identify.identify_information(name, path))
+    return (time.perf_counter() - start, count)
+
+# Measures `identify.py` on the generated articles and reports the results
+# through the queue
+def measure_identify(articles, directory, queue):
+    import identify
+
+    results = {}
+
+    # All filters without any cache, then with the result cache of that run
+    for run in ['cold', 'cached']:
+        seconds, count = time_identify(identify, articles, f'{directory}/all')
+        results[run] = {'seconds': seconds, 'information': count}
+
+    # Each filter on its own, sharing the preprocessing of the first run
+    filters = identify.FILTERS
+    results['filters'] = {}
+    for filter_name, filter in filters.items():
+        identify.FILTERS = {filter_name: filter}
+        shutil.rmtree(f'{directory}/all/results', ignore_errors=True)
+
+        seconds, count = time_identify(identify, articles, f'{directory}/all')
+        results['filters'][filter_name] = {'seconds': seconds, 'information': count}
+    identify.FILTERS = filters
+
+    results['peak rss kb'] = peak_rss_kb()
+    queue.put(results)
+
+def benchmark_identify(options):
+    article_count = int(options.get('articles', '200'))
+    shape = [int(options.get(option, default)) for (option, default) in
+             [('sections', '8'), ('words', '400'), ('citations', '2'), ('figures', '4'), ('tables', '2')]]
+
+    generator = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        articles = {}
+        for i in range(article_count):
+            articles[f'article{i}'] = path = os.path.join(directory, f'article{i}.json')
+            if file := open(path, 'w+'):
+                json.dump(generate_article(generator, *shape), file)
+
+                # Flushed before being read by the spawned process
+                file.close()
+            else:
+                print(f'Failed to open file {path}')
+                exit(-1)
+
+        result = run_spawned(measure_identify, articles, directory)
+
+    for run in ['cold', 'cached']:
+        result[run]['articles per second'] = article_count / result[run]['seconds']
+        result[run]['information per second'] = result[run]['information'] / result[run]['seconds']
+        print(f'{run}: {result[run]["articles per second"]:.1f} articles/s, '
+              f'{result[run]["information per second"]:.0f} information/s')
+
+    for filter_name, filter_result in result['filters'].items():
+        filter_result['articles per second'] = article_count / filter_result['seconds']
+        print(f'  {filter_name}: {filter_result["articles per second"]:.1f} articles/s, '
+              f'{filter_result["information"]} information')
+
+    print(f'peak RSS {result["peak rss kb"] / 1024:.1f} MiB')
+
+    result['articles'] = article_count
+    return result
+
+# All available benchmarks
+BENCHMARKS = {
+    'pdf': benchmark_pdf,
+    'tables': benchmark_tables,
+    'matcher': benchmark_matcher,
+    'spans': benchmark_spans,
+    'identify': benchmark_identify,
+}
+
+# Only run if non-library
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print(f'./benchmark.py {"|".join(BENCHMARKS)} [--option value ...]')
+        exit(-1)
+
+    # Parse the '--option value' pairs
+    options = {}
+    arguments = sys.argv[2:]
+    for i in range(0, len(arguments), 2):
+        if not arguments[i].startswith('--') or len(arguments) <= i + 1:
+            print(f'Unrecognized command line argument: {arguments[i]}')
+            exit(-1)
+        options[arguments[i][2:]] = arguments[i + 1]
+
+    results = BENCHMARKS[sys.argv[1]](options)
+
+    # Export the results
+    os.makedirs(EXPORT_DIRECTORY, exist_ok=True)
+    if file := open(file_path := f'{EXPORT_DIRECTORY}/{sys.argv[1]}.json', 'w+'):
+        json.dump({'benchmark': sys.argv[1], 'options': options, 'results': results}, file, indent=2)
+    else:
+        print(f'Failed to open file {file_path}')
+        exit(-1)
@@ -0,0 +1,156 @@
+'''
+Columnar Parquet export of the aggregated information, used by `aggregate.py`
+when the `parquet` keyword is passed. Requires the pyarrow package.
+
+Two tables are written, in row groups as the articles are streamed
+
+'long.parquet': One row per piece of information and per expanded field, with
+                the columns
+    'article': The article name,
+    'sample': The sample number (null for article wide information),
+    'title': The information title,
+    'field': The expanded field name, or the title if not expanded,
+    'value': The data as written,
+    'number': The data as a number (null if not numeric),
+    'unit': The unit of the values (null if not given),
+    'kind': The type of location within the article the information is from,
+    'subtype': The index of the type targeted.
+
+'wide.parquet': One row per sample, with the article name, sample number and
+                sample label followed by one column per sample information title and one
+                numeric column per expanded field. Expanded fields named the
+                same as an information title are only kept in the long table.
+
+Repeated strings, such as the article, title and field, are dictionary encoded
+and numbers are stored as 64 bit floats, so the tables load in a fraction of
+the time and memory of the CSV export.
+'''
+
+import math
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# The number of rows buffered before a row group is written
+BATCH_ROWS = 64 * 1024
+
+# The schema of the long table
+LONG_SCHEMA = pa.schema([
+    ('article', pa.dictionary(pa.int32(), pa.string())),
+    ('sample', pa.int32()),
+    ('title', pa.dictionary(pa.int32(), pa.string())),
+    ('field', pa.dictionary(pa.int32(), pa.string())),
+    ('value', pa.string()),
+    ('number', pa.float64()),
+    ('unit', pa.dictionary(pa.int32(), pa.string())),
+    ('kind', pa.dictionary(pa.int32(), pa.string())),
+    ('subtype', pa.dictionary(pa.int32(), pa.string())),
+])
+
+# Converts a value to a float, or None if not numeric
+def parse_number(value):
+    if value is None:
+        return None
+
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+# Converts parsed numbers to floats, with None for NaN which Arrow keeps as NaN
+# instead of null
+def nullable(numbers):
+    return [None if math.isnan(number) else number for number in numbers.tolist()]
+
+# Buffers rows column by column and writes them to a Parquet file in row
+# groups of `BATCH_ROWS`
+class TableWriter:
+    def __init__(self, path, schema):
+        self.schema = schema
+        self.writer = pq.ParquetWriter(path, schema)
+        self.columns = {name: [] for name in schema.names}
+
+    def append(self, row):
+        for (name, column) in self.columns.items():
+            column.append(row.get(name))
+
+        if BATCH_ROWS <= len(self.columns[self.schema.names[0]]):
+            self.flush()
+
+    def flush(self):
+        if len(self.columns[self.schema.names[0]]) == 0:
+            return
+
+        self.writer.write_table(pa.table(self.columns, schema=self.schema))
+        self.columns = {name: [] for name in self.schema.names}
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+class Exporter:
+    # The schema is the one collected by `aggregate.py`
+    def __init__(self, directory, schema):
+        self.long = TableWriter(f'{directory}/long.parquet', LONG_SCHEMA)
+
+        self.titles = schema['sample titles']
+        self.fields = [name for name in dict.fromkeys(schema['internal fields']) if name not in self.titles]
+        wide_schema = pa.schema([
+            ('article', pa.dictionary(pa.int32(), pa.string())),
+            ('sample', pa.int32()),
+            ('sample label', pa.string()),
+        ] + [(title, pa.dictionary(pa.int32(), pa.string())) for title in self.titles]
+          + [(name, pa.float64()) for name in self.fields])
+        self.wide = TableWriter(f'{directory}/wide.parquet', wide_schema)
+
+    # Adds the long rows of a single piece of information, with the parsed
+    # table of expanding information, see `expansion.py`
+    def add_information(self, article_name, sample, info, table):
+        source = info.get('source') or {}
+        row = {
+            'article': article_name,
+            'sample': sample,
+            'title': info['title'],
+            'unit': info.get('unit'),
+            'kind': source.get('kind'),
+            'subtype': None if source.get('subtype') is None else str(source['subtype']),
+        }
+
+        data = None if info['data'] is None else str(info['data'])
+        self.long.append(row | {'field': info['title'], 'value': data, 'number': parse_number(data)})
+
+        if table is not None:
+            names, values, numbers, _ = table
+            for (name, value, number) in zip(names, values, nullable(numbers)):
+                self.long.append(row | {'field': name, 'value': value, 'number': number})
+
+    # Adds an article and its samples, with the parsed tables of expanding
+    # information, as prepared by `aggregate.py`
+    def add(self, article_name, article, samples, expanded):
+        for (title, info) in article.items():
+            self.add_information(article_name, None, info, expanded.get((None, title)))
+
+        for sample in samples:
+            row = {'article': article_name, 'sample': sample['sample number'], 'sample label': None}
+            for (title, info) in sample.items():
+                if title == 'article' or title == 'sample number':
+                    continue
+
+                if row['sample label'] is None:
+                    row['sample label'] = info.get('sample label')
+
+                table = expanded.get((sample['sample number'], title))
+                self.add_information(article_name, sample['sample number'], info, table)
+
+                if table is not None:
+                    names, _, numbers, _ = table
+                    for (name, number) in zip(names, nullable(numbers)):
+                        if name not in self.titles:
+                            row[name] = number
+
+                row[title] = None if info['data'] is None else str(info['data'])
+
+            self.wide.append(row)
+
+    def close(self):
+        self.long.close()
+        self.wide.close()
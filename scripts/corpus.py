@@ -0,0 +1,237 @@
+'''
+A single-file SQLite store of all articles extracted by `extract.py`.
+
+The store keeps one row per article, section, figure, table and metadata entry,
+indexed by article, which allows listing and opening articles without touching
+the per-article JSON files. Section content together with figure and table
+captions is also indexed in a FTS5 table for full-text queries.
+
+Metadata values are stored as JSON as they are not necessarily strings (the
+abstract may for example be missing).
+
+Each article keeps the stamp of the JSON export it was stored from, see
+`source_stamp`, such that readers only use the stored article if it matches
+the current extract output. The schema version is kept in the SQLite
+`user_version`, and stores of older versions are migrated when opened.
+'''
+
+import json
+import os
+import spool
+import sqlite3
+
+# Spooled section content, see `spool.py`, is stored as a string. Rows are
+# inserted one at a time, meaning only one section is read back at once
+sqlite3.register_adapter(spool.Text, str)
+
+# The version of the schema, stored as the SQLite `user_version`
+SCHEMA_VERSION = 1
+
+# The schema of the store, tables are indexed by their article and index
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL,
+    section_order TEXT NOT NULL,
+    source TEXT
+);
+CREATE TABLE IF NOT EXISTS metadata (
+    article INTEGER NOT NULL REFERENCES articles(id) ON DELETE CASCADE,
+    key TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (article, key)
+);
+CREATE TABLE IF NOT EXISTS sections (
+    article INTEGER NOT NULL REFERENCES articles(id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    name TEXT,
+    content TEXT NOT NULL,
+    parent INTEGER,
+    PRIMARY KEY (article, idx)
+);
+CREATE TABLE IF NOT EXISTS figures (
+    article INTEGER NOT NULL REFERENCES articles(id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    title TEXT,
+    caption TEXT,
+    path TEXT,
+    duplicate INTEGER,
+    PRIMARY KEY (article, idx)
+);
+CREATE TABLE IF NOT EXISTS tables (
+    article INTEGER NOT NULL REFERENCES articles(id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    title TEXT,
+    caption TEXT,
+    content TEXT,
+    PRIMARY KEY (article, idx)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS passages USING fts5 (
+    text,
+    article UNINDEXED,
+    kind UNINDEXED,
+    idx UNINDEXED
+);
+'''
+
+# The columns added to the tables of stores without a schema version, with
+# their type
+ADDED_COLUMNS = {
+    'articles': {'source': 'TEXT'},
+    'figures': {'duplicate': 'INTEGER'},
+}
+
+# The columns of each record kind, in the order of the extract output
+COLUMNS = {
+    'sections': ['name', 'content', 'parent'],
+    'figures': ['title', 'caption', 'path', 'duplicate'],
+    'tables': ['title', 'caption', 'content'],
+}
+
+# The column indexed in the full-text table for each record kind, and the
+# source kind it corresponds to in `identify.py`
+PASSAGES = {
+    'sections': ('content', 'section'),
+    'figures': ('caption', 'figure caption'),
+    'tables': ('caption', 'table caption'),
+}
+
+# The columns stored as integers which are booleans in the extract output
+BOOLEAN_COLUMNS = {'duplicate'}
+
+# Returns a stamp identifying the version of a JSON export of an article
+def source_stamp(json_path):
+    stat = os.stat(json_path)
+    return f'{stat.st_mtime_ns}:{stat.st_size}'
+
+# Returns a record from a row of the given columns
+def row_record(columns, row):
+    return {column: bool(value) if column in BOOLEAN_COLUMNS and value is not None else value
+            for (column, value) in zip(columns, row)}
+
+class Store:
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        self.connection.executescript(SCHEMA)
+        self.migrate(path)
+
+    # Migrates a store of an older schema version by adding the missing
+    # columns. Raises ValueError for stores of newer versions
+    def migrate(self, path):
+        version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+        if SCHEMA_VERSION < version:
+            self.connection.close()
+            raise ValueError(f'{path} is a version {version} corpus store, newer than version {SCHEMA_VERSION}')
+
+        if version < SCHEMA_VERSION:
+            for table, columns in ADDED_COLUMNS.items():
+                existing = {row[1] for row in self.connection.execute(f'PRAGMA table_info({table})')}
+                for column, type in columns.items():
+                    if column not in existing:
+                        self.connection.execute(f'ALTER TABLE {table} ADD COLUMN {column} {type}')
+
+            self.connection.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+            self.connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def commit(self):
+        self.connection.commit()
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+    # Adds an article to the store, replacing any previous version of it. The
+    # source is the stamp of the JSON export of the article, see
+    # `source_stamp`
+    def add(self, name, article, source=None):
+        cursor = self.connection.cursor()
+        self.remove(name)
+
+        cursor.execute('INSERT INTO articles (name, section_order, source) VALUES (?, ?, ?)',
+                       (name, json.dumps(article['section_order']), source))
+        id = cursor.lastrowid
+
+        cursor.executemany('INSERT INTO metadata VALUES (?, ?, ?)',
+                           [(id, key, json.dumps(value)) for key, value in article['metadata'].items()])
+
+        for kind, columns in COLUMNS.items():
+            cursor.executemany(f'INSERT INTO {kind} VALUES (?, ?, {", ".join("?" * len(columns))})',
+                               ((id, i, *(record[column] for column in columns))
+                                for i, record in enumerate(article[kind])))
+
+            column, source_kind = PASSAGES[kind]
+            cursor.executemany('INSERT INTO passages VALUES (?, ?, ?, ?)',
+                               ((record[column], name, source_kind, i)
+                                for i, record in enumerate(article[kind])
+                                if record[column] is not None))
+
+    # Removes an article from the store, if present
+    def remove(self, name):
+        self.connection.execute('DELETE FROM passages WHERE article = ?', (name,))
+        self.connection.execute('DELETE FROM articles WHERE name = ?', (name,))
+
+    # The names of all stored articles, in insertion order
+    def names(self):
+        return [name for (name,) in self.connection.execute('SELECT name FROM articles ORDER BY id')]
+
+    # Returns True if the article is stored from the JSON export at the given
+    # path, in its current version
+    def fresh(self, name, json_path):
+        row = self.connection.execute('SELECT source FROM articles WHERE name = ?', (name,)).fetchone()
+        try:
+            return row is not None and row[0] == source_stamp(json_path)
+        except OSError:
+            return False
+
+    def article_id(self, name):
+        row = self.connection.execute('SELECT id FROM articles WHERE name = ?', (name,)).fetchone()
+        if row is None:
+            raise KeyError(name)
+
+        return row[0]
+
+    def metadata(self, name):
+        rows = self.connection.execute('SELECT key, value FROM metadata WHERE article = ?',
+                                       (self.article_id(name),))
+        return {key: json.loads(value) for (key, value) in rows}
+
+    # Reads a single section, figure or table
+    def record(self, name, kind, index):
+        columns = COLUMNS[kind]
+        row = self.connection.execute(f'SELECT {", ".join(columns)} FROM {kind} WHERE article = ? AND idx = ?',
+                                      (self.article_id(name), index)).fetchone()
+        if row is None:
+            raise IndexError(f'{kind} index {index} out of range')
+
+        return row_record(columns, row)
+
+    # Loads an entire article, equal to the JSON export
+    def load(self, name):
+        id = self.article_id(name)
+
+        article = {}
+        for kind, columns in COLUMNS.items():
+            rows = self.connection.execute(f'SELECT {", ".join(columns)} FROM {kind} WHERE article = ? ORDER BY idx',
+                                           (id,))
+            article[kind] = [row_record(columns, row) for row in rows]
+
+        order = self.connection.execute('SELECT section_order FROM articles WHERE id = ?', (id,)).fetchone()[0]
+        article['section_order'] = json.loads(order)
+        article['metadata'] = self.metadata(name)
+
+        return article
+
+    # Performs a FTS5 query over section content and captions. Returns a list
+    # of (article, kind, index, snippet) tuples ordered by relevance
+    def search(self, query, limit=20):
+        rows = self.connection.execute(
+            '''SELECT article, kind, idx, snippet(passages, 0, '[', ']', '...', 16)
+               FROM passages WHERE passages MATCH ? ORDER BY rank LIMIT ?''', (query, limit))
+        return rows.fetchall()
@@ -0,0 +1,62 @@
+'''
+Parsing of the data of expanding information, CSV with two columns (name and
+value) per line, used by `aggregate.py` and `columnar.py`.
+
+Each piece of data is parsed in a single pass into a table
+
+(names, values, numbers, malformed)
+
+where the names are stripped and lower cased, the values are the stripped
+strings as written, the numbers are the values as a float64 NumPy array (NaN
+if not numeric) and malformed holds the (line number, line) of every line
+without both a name and a value. Malformed lines are skipped instead of
+raising, blank lines are ignored.
+
+Parsed tables are cached by their data, as the same data is expanded for the
+schema, the CSV and the Parquet export, and identical tables are common
+between samples.
+'''
+
+import csv
+import functools
+import numpy as np
+
+# The number of parsed tables kept in the cache
+CACHE_SIZE = 4096
+
+# Converts the value strings to floats, in bulk if all are numeric and
+# otherwise one at a time with NaN for non-numeric values
+def to_numbers(values):
+    try:
+        return np.array(values, dtype=np.float64)
+    except ValueError:
+        pass
+
+    numbers = np.full(len(values), np.nan)
+    for (i, value) in enumerate(values):
+        try:
+            numbers[i] = float(value)
+        except ValueError:
+            pass
+
+    return numbers
+
+# Parses the data of expanding information into a table. The returned table is
+# shared through the cache and must not be modified
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def parse(data):
+    names, values, malformed = [], [], []
+    for (number, line) in enumerate(csv.reader(data.split('\n')), 1):
+        if len(line) == 0:
+            continue
+
+        if len(line) < 2 or line[0].strip() == '':
+            malformed.append((number, ','.join(line)))
+            continue
+
+        names.append(line[0].strip().lower())
+        values.append(line[1].strip())
+
+    numbers = to_numbers(values)
+    numbers.flags.writeable = False
+    return (tuple(names), tuple(values), numbers, tuple(malformed))
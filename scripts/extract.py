@@ -12,22 +12,64 @@ exports a list containing the path to all extracted articles to `results.json`.
 If no XML file is found, PDF extraction is invoked. For figure identification
 adjacent figures are merged, the document is rendered and a "screenshot" is
 taken around each figure. This includes data superimposed on the image itself,
-such as labels.
-
-The script optionally takes one argument which can be `mix`. If such an argument
-is given, all images, including in cases of an existing XML file, is extracted
-from the PDF. Note that the rest of the information is still extracted from the
-XML file, if available.
+such as labels. Tables are located by their 'Table x' caption and the ruling
+lines or column aligned text below it.
+
+The script optionally takes the following arguments
+
+`mix`: All images, including in cases of an existing XML file, are extracted
+       from the PDF. Note that the rest of the information is still extracted
+       from the XML file, if available.
+`pack`: Each article is additionally exported to a compact indexed container
+        such as `PMC9745798.pack`, see `pack.py`. Single sections, figures and
+        tables can be read from it without parsing the entire article.
+`sqlite`: All articles are additionally stored in a single SQLite database,
+          `corpus.sqlite`, with a full-text index over sections and captions.
+          See `corpus.py`.
+`index`: An inverted full-text index over section content and captions is
+         written to `index.bin`, see `text_index.py`. It is queried through the
+         `/search?q=` endpoint of `interface.py`.
+`dedupe`: Figures which are near-duplicates of an already extracted figure
+          of another article are replaced by a hard link to that figure and
+          marked as duplicate. Uses a perceptual hash index stored in
+          `figures.json`, see `figure_index.py`.
+`profile`: The time of each extraction phase (such as html2text, image
+           conversion and PDF rendering) is measured per article. A summary
+           with the slowest articles is written to `profile.json`.
+`--profiler cprofile|pyinstrument`: Implies `profile` and additionally runs the
+           extraction under the given profiler, writing `profile.prof` or
+           `profile.html` respectively. Only the main process is profiled.
+`--jobs N`: Articles are extracted in N parallel worker processes.
+`--timeout S`: Articles taking longer than S seconds to extract are aborted.
+`--memory M`: Articles using more than M MiB of memory are aborted.
+
+If any of `--jobs`, `--timeout` and `--memory` is given, each article is
+extracted in a separate worker process watched by the main process. Aborted
+articles, and articles raising errors, are listed with the reason in
+`quarantine.json` while the rest of the corpus continues to be extracted.
 '''
 
 from PIL import Image
 import xml.etree.ElementTree as ET
 import Levenshtein
+import corpus
+import figure_index
 import html2text
+import multiprocessing.connection
+import multiprocessing
+import resource
 import json
 import os
+import profiler
+import re
+import shutil
+import spool
 import sys
+import tempfile
+import time
 import fitz
+import pack
+import text_index
 
 # The path to the articles
 ARTICLES_PATH = './output/download'
@@ -49,6 +91,32 @@ IMAGE_PX_MULT = 4
 # The Levenshtein distance ratio used for page header similarity
 PAGE_HEADER_MIN_RATIO = 0.9
 
+# The number of pages after which a PDF is reopened during PDF extraction. The
+# document keeps every loaded page object, which otherwise grows the memory
+# usage with the page count
+PDF_REOPEN_PAGES = 100
+
+# The pattern of table captions, used for PDF table detection
+TABLE_CAPTION_REGEX = re.compile(r'^\s*(Table\s+[A-Z]?[0-9]+[A-Za-z]?)\b', re.IGNORECASE)
+
+# The maximum thickness and minimum width of a line to be considered a table
+# ruling, for PDF table detection
+TABLE_RULING_MAX_THICKNESS = 2
+TABLE_RULING_MIN_WIDTH = 50
+
+# The maximum vertical distance between words on the same table row and the
+# minimum horizontal gap between table columns, for PDF table detection
+TABLE_ROW_TOLERANCE = 3
+TABLE_MIN_COLUMN_GAP = 8
+
+# The maximum number of lines of a table caption block, longer blocks are body
+# paragraphs mentioning a table, for PDF table detection
+TABLE_CAPTION_MAX_LINES = 6
+
+# The maximum average number of words per cell of a table without rulings,
+# rows of body text columns have more, for PDF table detection
+TABLE_MAX_CELL_WORDS = 5
+
 # A list of file extensions in order of priority, from highest to lowest. Is
 # used to determine the source of figure images in XML extraction
 IMAGE_EXTENSION_PRIORITY = ['eps', 'tif', 'tiff', 'png', 'jpg', 'gif']
@@ -56,8 +124,37 @@ IMAGE_EXTENSION_PRIORITY = ['eps', 'tif', 'tiff', 'png', 'jpg', 'gif']
 # The image format that all extracted images should be in
 IMAGE_TARGET_FORMAT = 'png'
 
-# Extracts all figures from a PDF
-def extract_pdf_figures(name, doc):
+# The number of slowest articles listed in the profile report
+PROFILE_TOP_ARTICLES = 20
+
+# The per-article phase timers, only enabled by the 'profile' argument
+PROFILER = profiler.Profiler(enabled=False)
+
+# The interval (in seconds) at which the watchdog checks the worker processes
+WATCHDOG_INTERVAL = 0.1
+
+# The address space limit of worker processes relative to the memory limit.
+# Virtual memory is larger than the resident memory, which is the actual limit
+WATCHDOG_ADDRESS_SPACE_FACTOR = 4
+
+# Saves a figure using the given save function. The figure is saved to a
+# temporary file which then replaces the figure path, as the path may be a
+# hard link to the canonical figure of `dedupe`, which must not be written
+# through
+def save_figure(save, path):
+    root, extension = os.path.splitext(path)
+    temporary = f'{root}.tmp{extension}'
+    try:
+        save(temporary)
+    except:
+        if os.path.lexists(temporary):
+            os.remove(temporary)
+        raise
+
+    os.replace(temporary, path)
+
+# Extracts all figures from the PDF at the given path
+def extract_pdf_figures(name, path):
     # To be able to handle images which are overlaid with information
     # we render the region around the images and then extract the images
     # instead of only taking the images
@@ -70,7 +167,7 @@ def extract_pdf_figures(name, doc):
     figures = []
     figure_hashes = {}
     zoom = fitz.Matrix(IMAGE_PX_MULT, IMAGE_PX_MULT)
-    for page in doc.pages():
+    for page in iterate_pages(path):
         images = page.get_image_info(hashes=True)
 
         # Join adjacent images
@@ -134,68 +231,292 @@ def extract_pdf_figures(name, doc):
                              image['bbox'][1] - IMAGE_PX_MARGIN[0],
                              image['bbox'][2] + IMAGE_PX_MARGIN[1],
                              image['bbox'][3] + IMAGE_PX_MARGIN[1])
-            pixmap = page.get_pixmap(matrix=zoom, clip=clip)
+            with PROFILER.phase('pdf figure rendering'):
+                pixmap = page.get_pixmap(matrix=zoom, clip=clip)
 
             # Save the map to a file, may fail if faulty image, continue anyways
             try:
                 path = f'{EXPORT_DIRECTORY}/{name}-figure-{len(figures)}.png'
-                pixmap.save(path)
+                with PROFILER.phase('image conversion'):
+                    save_figure(pixmap.save, path)
                 figures.append({
                     'title': f'Fig {len(figures)} (generated)',
                     'caption': '',
                     'path': path,
+                    'duplicate': False,
                 })
             except:
                 pass
 
     return figures
 
-# Extracts information from a given PDF file
-def extract_from_pdf(name, path):
+# Replaces the figure file with a hard link to the canonical figure, keeping
+# the figure path valid. The file is kept as is if hard links are not
+# supported, such as across file systems
+def link_figure(canonical, path):
+    try:
+        os.link(canonical, f'{path}.link')
+        os.replace(f'{path}.link', path)
+    except OSError:
+        if os.path.lexists(f'{path}.link'):
+            os.remove(f'{path}.link')
+
+# Returns the horizontal ruling lines of the page as (x0, y, x1) tuples sorted
+# by y. Both stroked lines and thin filled rectangles are considered
+def find_page_rulings(page):
+    rulings = []
+    for drawing in page.get_drawings():
+        for item in drawing['items']:
+            if item[0] == 'l':
+                a, b = item[1], item[2]
+                if abs(a.y - b.y) < TABLE_RULING_MAX_THICKNESS and TABLE_RULING_MIN_WIDTH < abs(a.x - b.x):
+                    rulings.append((min(a.x, b.x), (a.y + b.y) / 2, max(a.x, b.x)))
+            elif item[0] == 're':
+                rect = item[1]
+                if rect.height < TABLE_RULING_MAX_THICKNESS and TABLE_RULING_MIN_WIDTH < rect.width:
+                    rulings.append((rect.x0, (rect.y0 + rect.y1) / 2, rect.x1))
+
+    return sorted(rulings, key=lambda ruling: ruling[1])
+
+# Groups words, as given by `get_text('words')`, into rows of words sorted by
+# their x coordinate
+def group_table_rows(words):
+    rows = []
+    row_center = None
+    for word in sorted(words, key=lambda word: (word[1] + word[3]) / 2):
+        center = (word[1] + word[3]) / 2
+        if row_center is None or TABLE_ROW_TOLERANCE < abs(center - row_center):
+            rows.append([])
+            row_center = center
+        rows[-1].append(word)
+
+    return [sorted(row, key=lambda word: word[0]) for row in rows]
+
+# Returns the (x0, x1) extents of the column separated groups of words in the
+# row
+def row_segments(row):
+    segments = [[row[0][0], row[0][2]]]
+    for previous, word in zip(row, row[1:]):
+        if TABLE_MIN_COLUMN_GAP < word[0] - previous[2]:
+            segments.append([word[0], word[2]])
+        else:
+            segments[-1][1] = word[2]
+
+    return segments
+
+# Returns True if every segment of the row overlaps exactly one of the
+# columns, and no two segments overlap the same column
+def segments_aligned(segments, columns):
+    used = set()
+    for (x0, x1) in segments:
+        overlapping = [i for i, column in enumerate(columns) if x0 < column[1] and column[0] < x1]
+        if len(overlapping) != 1 or overlapping[0] in used:
+            return False
+        used.add(overlapping[0])
+
+    return True
+
+# Splits the rows into cells. The columns are the x ranges which are covered
+# by words in any row, meaning columns are separated by vertical whitespace
+# running through the entire table
+def split_table_cells(rows):
+    intervals = sorted((word[0], word[2]) for row in rows for word in row)
+    columns = [list(intervals[0])]
+    for (x0, x1) in intervals[1:]:
+        if x0 - columns[-1][1] <= TABLE_MIN_COLUMN_GAP:
+            columns[-1][1] = max(columns[-1][1], x1)
+        else:
+            columns.append([x0, x1])
+
+    cells = []
+    for row in rows:
+        cell_words = [[] for _ in columns]
+        for word in row:
+            center = (word[0] + word[2]) / 2
+            for i, (x0, x1) in enumerate(columns):
+                if center <= x1 or i == len(columns) - 1:
+                    cell_words[i].append(word[4])
+                    break
+        cells.append([' '.join(words) for words in cell_words])
+
+    return cells
+
+# Formats the cells in the same way as the tables extracted from XML using
+# html2text, the first row is treated as header
+def format_table(cells):
+    widths = [max(len(row[i]) for row in cells) for i in range(len(cells[0]))]
+
+    lines = []
+    for i, row in enumerate(cells):
+        lines.append('| ' + ' | '.join(cell.ljust(width) for cell, width in zip(row, widths)) + ' |')
+        if i == 0:
+            lines.append('|' + '|'.join('-' * (width + 2) for width in widths) + '|')
+
+    return '\n'.join(lines) + '\n'
+
+# Detects the tables of a single page
+#
+# Tables are located using their caption, a separate short block starting with
+# 'Table x', such that body paragraphs mentioning a table are not captions. The
+# table body is then taken to be the region below the caption which is
+# enclosed by horizontal ruling lines, as is common for scientific tables. If
+# there are less than two rulings we instead rely on text alignment and take
+# the consecutive rows below the caption whose column separated groups of
+# words line up with those of the first row. Text columns of the page also
+# line up, so such tables are rejected if the cells are as long as body text
+def detect_page_tables(page, page_text):
+    captions = []
+    for block in page_text['blocks']:
+        if len(block['lines']) == 0 or TABLE_CAPTION_MAX_LINES < len(block['lines']):
+            continue
+
+        text = ''.join(span['text'] for span in block['lines'][0]['spans'])
+        if match := TABLE_CAPTION_REGEX.match(text):
+            caption = ' '.join(''.join(span['text'] for span in line['spans']) for line in block['lines']).strip()
+            captions.append((match.group(1), caption, block['bbox'][1], block['bbox'][3]))
+
+    # Most pages contain no tables, skip the more expensive layout lookups
+    if len(captions) == 0:
+        return []
+
+    rulings = find_page_rulings(page)
+    words = page.get_text('words', flags=0)
+
+    tables = []
+    for i, (title, caption, _, top) in enumerate(captions):
+        bottom = captions[i + 1][2] if i + 1 < len(captions) else page.rect.height
+
+        # Keep the rulings below the caption which horizontally overlap the
+        # first of them, other rulings may for example be footnote separators
+        table_rulings = [ruling for ruling in rulings if top < ruling[1] < bottom]
+        if 0 < len(table_rulings):
+            first = table_rulings[0]
+            table_rulings = [ruling for ruling in table_rulings
+                             if ruling[0] < first[2] and first[0] < ruling[2]]
+
+        if 2 <= len(table_rulings):
+            region = [word for word in words
+                      if table_rulings[0][1] < (word[1] + word[3]) / 2 < table_rulings[-1][1]]
+            rows = group_table_rows(region)
+        else:
+            region = [word for word in words if top < (word[1] + word[3]) / 2 < bottom]
+            rows = []
+            columns = None
+            for row in group_table_rows(region):
+                segments = row_segments(row)
+                if len(segments) < 2 or (columns is not None and not segments_aligned(segments, columns)):
+                    break
+
+                if columns is None:
+                    columns = segments
+                else:
+                    for (x0, x1) in segments:
+                        column = next(column for column in columns if x0 < column[1] and column[0] < x1)
+                        column[0], column[1] = min(column[0], x0), max(column[1], x1)
+                rows.append(row)
+
+            cell_count = sum(len(row_segments(row)) for row in rows)
+            if TABLE_MAX_CELL_WORDS * cell_count < sum(len(row) for row in rows):
+                continue
+
+        if len(rows) < 2:
+            continue
+
+        cells = split_table_cells(rows)
+        if len(cells[0]) < 2:
+            continue
+
+        tables.append({
+            'title': title,
+            'caption': caption,
+            'content': format_table(cells),
+        })
+
+    return tables
+
+# Yields the pages of the PDF at the given path one at a time. The document is
+# reopened every `PDF_REOPEN_PAGES` pages, such that memory usage does not
+# grow with the page count. A page is only valid until the next one is yielded
+def iterate_pages(path, start=0):
     doc = fitz.open(path)
+    try:
+        for i in range(start, doc.page_count):
+            if i != start and (i - start) % PDF_REOPEN_PAGES == 0:
+                doc.close()
+                doc = fitz.open(path)
+            yield doc[i]
+    finally:
+        doc.close()
+
+# Yields each page together with its text, one page at a time, using the
+# given `get_text` output format. Only one page is kept in memory at once
+def stream_pages(path, output, start=0):
+    for page in iterate_pages(path, start):
+        # We sort the text by natural reading order. The flag parameter
+        # doesn't preserve images, ligatures nor whitespace
+        with PROFILER.phase('pdf page text'):
+            text = page.get_text(output, flags=0, sort=True)
+
+        PROFILER.count('pages')
+        yield page, text
+
+# Identify page header
+#
+# This is done by comparing the first lines of each page and finding how
+# similar they are. If they are similar enough, below a certain threshold,
+# they are classified as a page header and ignored.
+#
+# The almost equal is important to adjust for page numbers or other
+# discrepancies. We also skip the first page as there is often a custom
+# first page header. Each page is compared to the second page, meaning the
+# number of header lines is the shortest run of similar leading lines. Empty
+# lines separating the text blocks are not counted, as they are not lines of
+# the page dict the header lines are skipped in
+def identify_page_header_lines(path):
+    reference = None
+    header_lines = None
+    for _, text in stream_pages(path, 'text', start=1):
+        lines = [line.strip() for line in text.split('\n') if line.strip()]
+        if reference is None:
+            reference = lines
+            continue
+
+        count = 0
+        limit = min(len(lines), len(reference) if header_lines is None else header_lines)
+        while count < limit and PAGE_HEADER_MIN_RATIO < Levenshtein.ratio(reference[count], lines[count]):
+            count += 1
+        header_lines = count
+
+    # With less than two pages to compare no header can be identified
+    return 0 if header_lines is None else header_lines
 
+# Extracts information from a given PDF file
+#
+# The pages are streamed twice, first to identify the page header and then
+# to extract the text and tables. The section content is accumulated on
+# disk and returned as spooled text, see `spool.py`, meaning memory usage does
+# not grow with the number of pages
+def extract_from_pdf(name, path):
     # Extract figures
-    figures = extract_pdf_figures(name, doc)
+    figures = extract_pdf_figures(name, path)
 
-    # Identify page header
-    #
-    # This is done by comparing the first line of each page and finding how
-    # similar they are. If they are similar enough, below a certain threshold,
-    # they are classified as a page header and ignored.
-    #
-    # The almost equal is important to adjust for page numbers or other
-    # discrepancies. We also skip the first page as there is often a custom
-    # first page header
-    almost_equal_lines = 0
-    similar = True
-    while similar:
-        lines = []
-        for page in list(doc.pages())[1:]:
-            lines.append(page.get_text('text', flags=0, sort=True)
-                            .split('\n')[almost_equal_lines].strip())
-
-        for line in lines:
-            if not (PAGE_HEADER_MIN_RATIO < Levenshtein.ratio(lines[0], line)):
-                similar = False
-                break
-
-        if similar:
-            almost_equal_lines += 1
+    with PROFILER.phase('pdf header detection'):
+        almost_equal_lines = identify_page_header_lines(path)
 
     # Extract all the text in the article, explicitly in the correct reading
     # order as that may not always be the implicit case
-    order = [0]
+    section_spool = spool.Spool()
+    order = [section_spool.add_section()]
     current_header = 0
     sections = [{
         'name': 'preface',
-        'content': '',
         'parent': None
     }]
     header_nr_map = {'': None}
-    for page in doc.pages():
-        # We sort the text by natural reading order. The flag parameter
-        # doesn't preserve images, ligatures nor whitespace
-        page_text = page.get_text('dict', flags=0, sort=True)
+    tables = []
+    for page, page_text in stream_pages(path, 'dict'):
+        with PROFILER.phase('pdf table detection'):
+            tables.extend(detect_page_tables(page, page_text))
 
         # Try to identify headers
         #
@@ -257,7 +578,7 @@ def extract_from_pdf(name, path):
 
                     # If a header was found, add all content new content to it
                     if header:
-                        sections[current_header]['content'] = sections[current_header]['content'].strip()
+                        section_spool.strip(current_header)
 
                         # If an exact (whitespace removed) header match is
                         # found, use that instead. This is to work for
@@ -270,32 +591,39 @@ def extract_from_pdf(name, path):
                         if current_header:
                             # When continuing already created text start on
                             # new paragraph
-                            sections[current_header]['content'] += '\n\n'
+                            section_spool.append(current_header, '\n\n')
                         else:
                             if 0 < len(parts):
                                 header_nr_map['-'.join(map(str, parts))] = len(sections)
 
-                            current_header = len(sections)
+                            current_header = section_spool.add_section()
                             sections.append({
                                 'name': header,
-                                'content': '',
                                 'parent': parent
                             })
                             order.append(current_header)
                     else:
-                        sections[current_header]['content'] += text + ' '
-            sections[current_header]['content'] += '\n\n'
+                        section_spool.append(current_header, text + ' ')
+            section_spool.append(current_header, '\n\n')
+
+    # The section content is read back from the spool when exported
+    sections = [{
+        'name': section['name'],
+        'content': section_spool.text(i),
+        'parent': section['parent']
+    } for i, section in enumerate(sections)]
 
     return {
         'figures': figures,
-        'tables': {},
+        'tables': tables,
         'sections': sections,
         'section_order': order
     }
 
 # Extract information from XML article
 def extract_from_xml(name, path, fig_path, figures_pdf_path=None):
-    xml_article = ET.parse(path)
+    with PROFILER.phase('xml parsing'):
+        xml_article = ET.parse(path)
 
     # Extract all figures (either from XML or PDF)
     if figures_pdf_path is None:
@@ -303,7 +631,8 @@ def extract_from_xml(name, path, fig_path, figures_pdf_path=None):
         for xml_figure in xml_article.findall('.//fig'):
             caption = xml_figure.find('caption')
             if caption is not None:
-                caption = html2text.html2text(ET.tostring(caption).decode())
+                with PROFILER.phase('html2text'):
+                    caption = html2text.html2text(ET.tostring(caption).decode())
 
             # Get the first graphic hrefs
             href = None
@@ -321,28 +650,31 @@ def extract_from_xml(name, path, fig_path, figures_pdf_path=None):
             for ext in IMAGE_EXTENSION_PRIORITY:
                 path = f'{base_path}.{ext}'
                 if os.path.isfile(path):
-                    Image.open(path).save(figure_path)
+                    with PROFILER.phase('image conversion'):
+                        save_figure(Image.open(path).save, figure_path)
                     break
 
             figures.append({
                 'title': xml_figure.findtext('label'),
                 'caption': caption,
                 'path': figure_path,
+                'duplicate': False,
             })
     else:
-        doc = fitz.open(figures_pdf_path)
-        figures = extract_pdf_figures(name, doc)
+        figures = extract_pdf_figures(name, figures_pdf_path)
 
     # Extract all tables
     tables = []
     for xml_table in xml_article.findall('.//table-wrap'):
         caption = xml_table.find('caption')
         if caption is not None:
-            caption = html2text.html2text(ET.tostring(caption).decode())
+            with PROFILER.phase('html2text'):
+                caption = html2text.html2text(ET.tostring(caption).decode())
 
         content = 'Failed to parse table content'
         if table := xml_table.find('.//table'):
-            content = html2text.html2text(ET.tostring(table).decode())
+            with PROFILER.phase('html2text'):
+                content = html2text.html2text(ET.tostring(table).decode())
 
         tables.append({
             'title': xml_table.findtext('label'),
@@ -397,7 +729,8 @@ def extract_from_xml(name, path, fig_path, figures_pdf_path=None):
                 content += ET.tostring(p).decode()
 
             # Convert to simple text
-            content = html2text.html2text(content)
+            with PROFILER.phase('html2text'):
+                content = html2text.html2text(content)
 
             # Keep track of parent to be able to reconstruct hierarchy, if the uid is not a section, ignore it
             if 2 < len(uid_stack):
@@ -443,34 +776,10 @@ def extract_metadata(path):
         'abstract': abstract,
     }
 
-# Create the export directory
-os.makedirs(EXPORT_DIRECTORY, exist_ok=True)
-
-# Configure HTML to text
-html2text.config.PAD_TABLES = True
-html2text.config.BODY_WIDTH = 0
-
-# Load the download results
-if os.path.isfile(path := f'{ARTICLES_PATH}/results.json') and (file := open(path)):
-    download_summary = json.load(file)
-else:
-    print('Failed to load download results, are you sure you have ran the `download.py` script?')
-    exit(-1)
-
-# Check for 'mix' argument
-force_pdf_figures = False
-if 1 < len(sys.argv):
-    if sys.argv[1] == 'mix':
-        force_pdf_figures = True
-    else:
-        print(f'Unrecognized command line argument: {sys.argv[1]}')
-        exit(-1)
-
-# Extract information from all articles
-article_paths = {}
-for (name, path) in download_summary['articles'].items():
-    print(f'Parsing {name} ', flush=True, end='')
-
+# Extracts a single article from its download directory. Returns the format
+# used ('XML', 'PDF' or None if neither is available) and the extract result
+# with metadata, None if the extraction failed
+def extract_article(name, path, force_pdf_figures):
     # Find the first available PDF file
     pdf_path = None
     for filename in os.listdir(path):
@@ -480,48 +789,331 @@ for (name, path) in download_summary['articles'].items():
 
     # Parse XML if available, otherwise default to PDF parsing
     xml_article_path = os.path.join(path, 'article.xml')
-    result = None
-    found = False
     if os.path.isfile(xml_article_path):
-        print(f'as XML ... ', flush=True, end='')
-        found = True
+        kind = 'XML'
         result = extract_from_xml(name, xml_article_path, path, pdf_path if force_pdf_figures else None)
     elif pdf_path is not None:
-        print(f'as PDF ... ', flush=True, end='')
-        found = True
+        kind = 'PDF'
         result = extract_from_pdf(name, pdf_path)
+    else:
+        return None, None
 
-    # Skip if not found
-    if not found:
-        print('... skipped')
-        continue
+    # Extract the metadata
+    if result is not None:
+        result['metadata'] = extract_metadata(path)
+
+    return kind, result
+
+# Extracts the articles one after another in this process. Yields the name,
+# path, quarantine reason (always None), format, result and profile (always
+# None, as the profiled article is still the current one) of each article
+def extract_serial(articles, force_pdf_figures):
+    for (name, path) in articles.items():
+        PROFILER.start(name)
+        kind, result = extract_article(name, path, force_pdf_figures)
+        yield name, path, None, kind, result, None
+
+# The worker process of `extract_guarded`, sends the extraction outcome of the
+# article through the connection
+def extract_worker(name, path, force_pdf_figures, memory, connection):
+    # The address space limit is a backstop for allocations growing faster
+    # than the watchdog polls the resident memory. It is relative to the
+    # address space inherited from the main process, which holds the indexes
+    # and stores of the whole run
+    if memory is not None:
+        limit = process_memory(os.getpid(), 0) + memory * WATCHDOG_ADDRESS_SPACE_FACTOR
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    PROFILER.start(name)
+    try:
+        kind, result = extract_article(name, path, force_pdf_figures)
+        reason = None
+    except MemoryError:
+        kind, result, reason = None, None, 'exceeded the memory limit'
+    except Exception as error:
+        kind, result, reason = None, None, f'raised {error!r}'
+    PROFILER.finish()
+
+    profile = PROFILER.articles[-1] if PROFILER.enabled else None
+    connection.send((reason, kind, result, profile))
+    connection.close()
+
+# Returns a field of the memory usage of the process in bytes, zero if
+# unavailable. The field is 0 for the address space size and 1 for the
+# resident memory
+def process_memory(pid, field):
+    try:
+        with open(f'/proc/{pid}/statm') as file:
+            return int(file.read().split()[field]) * resource.getpagesize()
+    except (OSError, IndexError, ValueError):
+        return 0
+
+# Extracts the articles in up to `jobs` concurrent worker processes, one
+# process per article. A watchdog kills workers running longer than `timeout`
+# seconds or using more than `memory` bytes of resident memory, the article is
+# then reported with a quarantine reason. A worker starts out with the
+# resident memory of this process, as it is forked, so only its growth since
+# the fork is counted towards the memory limit. Yields the same values as
+# `extract_serial`, in order of completion
+def extract_guarded(articles, force_pdf_figures, jobs, timeout, memory):
+    context = multiprocessing.get_context('fork')
+    pending = iter(articles.items())
+    running = {}
+    while True:
+        # Keep all workers busy
+        while len(running) < jobs and (article := next(pending, None)) is not None:
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(target=extract_worker,
+                                      args=(*article, force_pdf_figures, memory, sender))
+            baseline = process_memory(os.getpid(), 1)
+            process.start()
+            sender.close()
+            running[receiver] = (*article, process, time.monotonic(), baseline)
+
+        if len(running) == 0:
+            break
 
-    # Ignore on fail
-    if result is None:
-        print('... failed')
-        continue
+        for receiver in multiprocessing.connection.wait(list(running), timeout=WATCHDOG_INTERVAL):
+            name, path, process, _, _ = running.pop(receiver)
+            try:
+                reason, kind, result, profile = receiver.recv()
+            except EOFError:
+                reason, kind, result, profile = 'worker crashed', None, None, None
+            receiver.close()
+            process.join()
+
+            # Resource limits may kill the worker before it could report
+            if reason is None and process.exitcode != 0:
+                reason = f'worker exited with code {process.exitcode}'
+
+            yield name, path, reason, kind, result, profile
+
+        # Kill the workers exceeding the time or memory limits
+        now = time.monotonic()
+        for receiver, (name, path, process, start, baseline) in list(running.items()):
+            reason = None
+            if timeout is not None and timeout < now - start:
+                reason = f'exceeded the {timeout} s timeout'
+            elif memory is not None and memory < process_memory(process.pid, 1) - baseline:
+                reason = f'exceeded the {memory // 2 ** 20} MiB memory limit'
+
+            if reason is not None:
+                process.kill()
+                process.join()
+                receiver.close()
+                del running[receiver]
+                yield name, path, reason, None, None, None
 
-    # Extract the metadata
-    result['metadata'] = extract_metadata(path)
+# Configure HTML to text
+html2text.config.PAD_TABLES = True
+html2text.config.BODY_WIDTH = 0
 
-    # Export each article in a separate JSON file
-    path = f'{EXPORT_DIRECTORY}/{name}.json'
-    if file := open(path, 'w+'):
-        json.dump(result, file)
+# Only run if non-library
+if __name__ == '__main__':
+    # Create the export directory
+    os.makedirs(EXPORT_DIRECTORY, exist_ok=True)
+
+    # Load the download results
+    if os.path.isfile(path := f'{ARTICLES_PATH}/results.json') and (file := open(path)):
+        download_summary = json.load(file)
     else:
-        print(f'Failed to open file {path}')
+        print('Failed to load download results, are you sure you have ran the `download.py` script?')
         exit(-1)
 
-    article_paths[name] = path
+    # Check for the 'mix', 'pack', 'sqlite', 'index', 'dedupe' and 'profile'
+    # arguments, and the '--profiler', '--jobs', '--timeout' and '--memory'
+    # options
+    force_pdf_figures = False
+    export_pack = False
+    store = None
+    index = None
+    figures = None
+    hook = None
+    jobs = None
+    timeout = None
+    memory = None
+    arguments = iter(sys.argv[1:])
+    for argument in arguments:
+        if argument == 'mix':
+            force_pdf_figures = True
+        elif argument == 'pack':
+            export_pack = True
+        elif argument == 'sqlite':
+            store = corpus.Store(f'{EXPORT_DIRECTORY}/corpus.sqlite')
+        elif argument == 'index':
+            index = text_index.Builder()
+        elif argument == 'dedupe':
+            figures = figure_index.FigureIndex(f'{EXPORT_DIRECTORY}/figures.json')
+        elif argument == 'profile':
+            PROFILER.enabled = True
+        elif argument == '--profiler':
+            PROFILER.enabled = True
+            hook = next(arguments, None)
+            if hook == 'cprofile':
+                import cProfile
+                hook_profiler = cProfile.Profile()
+            elif hook == 'pyinstrument':
+                try:
+                    import pyinstrument
+                except ImportError:
+                    print('The pyinstrument profiler requires the pyinstrument package')
+                    exit(-1)
+                hook_profiler = pyinstrument.Profiler()
+            else:
+                print(f'Unrecognized profiler: {hook}')
+                exit(-1)
+        elif argument in ['--jobs', '--timeout', '--memory']:
+            try:
+                value = int(next(arguments, None))
+            except (TypeError, ValueError):
+                value = 0
+
+            if value < 1:
+                print(f'The {argument} option requires a positive integer')
+                exit(-1)
+
+            if argument == '--jobs':
+                jobs = value
+            elif argument == '--timeout':
+                timeout = value
+            else:
+                memory = value * 2 ** 20
+        else:
+            print(f'Unrecognized command line argument: {argument}')
+            exit(-1)
+
+    if hook == 'cprofile':
+        hook_profiler.enable()
+    elif hook == 'pyinstrument':
+        hook_profiler.start()
+
+    # Spool the section content of PDFs in a directory of this run, removed
+    # at the end such that the files of killed workers do not linger
+    spool.DIRECTORY = tempfile.mkdtemp(prefix='extract-')
+
+    # Extract information from all articles, guarded by worker processes if
+    # any limit is given
+    if jobs is None and timeout is None and memory is None:
+        extracted = extract_serial(download_summary['articles'], force_pdf_figures)
+    else:
+        extracted = extract_guarded(download_summary['articles'], force_pdf_figures,
+                                    jobs or 1, timeout, memory)
+
+    article_paths = {}
+    quarantine = []
+    for (name, path, reason, kind, result, profile) in extracted:
+        if profile is not None:
+            PROFILER.resume(profile)
+
+        # Quarantine aborted articles
+        if reason is not None:
+            print(f'Parsing {name} ... quarantined, {reason}')
+            quarantine.append({'article': name, 'path': path, 'reason': reason})
+            PROFILER.finish()
+            continue
+
+        # Skip if not found
+        if kind is None:
+            print(f'Parsing {name} ... skipped')
+            PROFILER.finish()
+            continue
+
+        # Ignore on fail
+        if result is None:
+            print(f'Parsing {name} as {kind} ... failed')
+            PROFILER.finish()
+            continue
+
+        # Link near-duplicate figures to their canonical image
+        if figures is not None:
+            with PROFILER.phase('dedupe'):
+                for figure in result['figures']:
+                    if not os.path.isfile(figure['path']):
+                        continue
+
+                    canonical = figures.canonical(figure['path'], name)
+                    if canonical != figure['path']:
+                        link_figure(canonical, figure['path'])
+                        figure['duplicate'] = True
+
+        # Export each article in a separate JSON file
+        path = f'{EXPORT_DIRECTORY}/{name}.json'
+        if file := open(path, 'w+'):
+            with PROFILER.phase('export'):
+                spool.dump(result, file.write)
+        else:
+            print(f'Failed to open file {path}')
+            exit(-1)
+
+        article_paths[name] = path
+
+        # Export the compact container next to the JSON file
+        if export_pack:
+            pack.write(f'{EXPORT_DIRECTORY}/{name}.pack', result)
+
+        # Add the article to the corpus store, committing each article to not
+        # lose progress on interruption. The stamp of the JSON export lets
+        # readers detect a store older than the extract output
+        if store is not None:
+            store.add(name, result, corpus.source_stamp(path))
+            store.commit()
+
+        if index is not None:
+            index.add(name, result)
+
+        figure_count = len(result['figures'])
+        table_count = len(result['tables'])
+        section_count = len(result['sections'])
+
+        PROFILER.count('figures', figure_count)
+        PROFILER.count('tables', table_count)
+        PROFILER.count('sections', section_count)
+        PROFILER.finish()
+        print(f'Parsing {name} as {kind} ... done, {figure_count} figures, {table_count} tables '
+              f'and {section_count} sections')
+
+    # Export the profiling results
+    if hook == 'cprofile':
+        hook_profiler.disable()
+        hook_profiler.dump_stats(f'{EXPORT_DIRECTORY}/profile.prof')
+    elif hook == 'pyinstrument':
+        hook_profiler.stop()
+        if file := open(file_path := f'{EXPORT_DIRECTORY}/profile.html', 'w+'):
+            file.write(hook_profiler.output_html())
+        else:
+            print(f'Failed to open file {file_path}')
+            exit(-1)
+
+    if PROFILER.enabled:
+        PROFILER.write(f'{EXPORT_DIRECTORY}/profile.json', PROFILE_TOP_ARTICLES)
+
+    # Export JSON containing extraction information, in download order as
+    # guarded articles finish in any order
+    article_paths = {name: article_paths[name] for name in download_summary['articles']
+                     if name in article_paths}
+    if file := open(file_path:=f'{EXPORT_DIRECTORY}/results.json', 'w+'):
+        json.dump(article_paths, file)
+    else:
+        print(f'Failed to open file {file_path}')
+        exit(-1)
+
+    # Export the list of quarantined articles
+    if file := open(file_path:=f'{EXPORT_DIRECTORY}/quarantine.json', 'w+'):
+        json.dump(quarantine, file)
+    else:
+        print(f'Failed to open file {file_path}')
+        exit(-1)
+
+    if store is not None:
+        store.close()
+
+    if figures is not None:
+        figures.write()
 
-    figure_count = len(result['figures'])
-    table_count = len(result['tables'])
-    section_count = len(result['sections'])
-    print(f' done, {figure_count} figures, {table_count} tables and {section_count} sections')
+    # Export the full-text index
+    if index is not None:
+        print('Writing full-text index ... ', flush=True, end='')
+        index.write(f'{EXPORT_DIRECTORY}/index.bin')
+        print('done')
 
-# Export JSON containing extraction information
-if file := open(file_path:=f'{EXPORT_DIRECTORY}/results.json', 'w+'):
-    json.dump(article_paths, file)
-else:
-    print(f'Failed to open file {file_path}')
-    exit(-1)
+    shutil.rmtree(spool.DIRECTORY, ignore_errors=True)
@@ -0,0 +1,123 @@
+'''
+A corpus-wide index of figure perceptual hashes, used by `extract.py` to find
+near-duplicate figures.
+
+Each figure is reduced to a 64-bit difference hash (dHash), which is robust to
+rescaling and re-rendering of the same image. The hashes are stored in a
+BK-tree, allowing all figures within a small Hamming distance to be found
+without comparing against every figure in the corpus. The index is persisted
+as a JSON list of (hash, path, article) triples, such that figures are never
+duplicates of figures of their own article, such as similar panels.
+'''
+
+from PIL import Image
+import json
+import os
+
+# The maximum Hamming distance between two hashes of the same figure
+MAX_DISTANCE = 5
+
+# The width and height of the downscaled image used for hashing, the width is
+# one larger as adjacent pixels are compared horizontally
+HASH_SIZE = 8
+
+# Returns the difference hash of the image at the given path
+def dhash(path):
+    image = Image.open(path).convert('L').resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS)
+    pixels = image.tobytes()
+
+    value = 0
+    for y in range(HASH_SIZE):
+        row = pixels[y * (HASH_SIZE + 1):(y + 1) * (HASH_SIZE + 1)]
+        for left, right in zip(row, row[1:]):
+            value = (value << 1) | (left < right)
+
+    return value
+
+# A BK-tree over hashes using the Hamming distance. Each node is a list of
+# [hash, item, {distance: child node}]
+class BKTree:
+    def __init__(self):
+        self.root = None
+
+    def add(self, value, item):
+        if self.root is None:
+            self.root = [value, item, {}]
+            return
+
+        node = self.root
+        while True:
+            distance = (node[0] ^ value).bit_count()
+            if distance not in node[2]:
+                node[2][distance] = [value, item, {}]
+                return
+            node = node[2][distance]
+
+    # Returns the (distance, item) of all hashes within the given distance,
+    # sorted by distance
+    def query(self, value, max_distance):
+        matches = []
+        nodes = [] if self.root is None else [self.root]
+        while 0 < len(nodes):
+            node = nodes.pop()
+            distance = (node[0] ^ value).bit_count()
+            if distance <= max_distance:
+                matches.append((distance, node[1]))
+
+            # By the triangle inequality only children within the distance
+            # range can contain matches
+            for child_distance, child in node[2].items():
+                if abs(child_distance - distance) <= max_distance:
+                    nodes.append(child)
+
+        return sorted(matches, key=lambda match: match[0])
+
+class FigureIndex:
+    def __init__(self, path):
+        self.path = path
+
+        # The hash and article of each canonical figure path, the tree may
+        # also hold earlier hashes of figures which have since changed
+        self.figures = {}
+        self.tree = BKTree()
+
+        if os.path.isfile(path) and (file := open(path)):
+            for entry in json.load(file):
+                # Indices written before articles were stored have none
+                value, figure_path, article = entry if len(entry) == 3 else (*entry, None)
+                self.figures[figure_path] = (value, article)
+                self.tree.add(value, (value, figure_path))
+
+    # Returns the path of the canonical figure of another article which the
+    # given figure is a near-duplicate of. If there is none the figure is
+    # added to the index as a new canonical figure and its own path is
+    # returned
+    def canonical(self, figure_path, article):
+        value = dhash(figure_path)
+
+        # The figure was already indexed by an earlier extraction, unless it
+        # changed since
+        if figure_path in self.figures:
+            if self.figures[figure_path][0] == value:
+                return figure_path
+            del self.figures[figure_path]
+
+        for (_, (path_value, path)) in self.tree.query(value, MAX_DISTANCE):
+            # Skip the stale hashes of changed figures, and figures which may
+            # have been removed since the index was written
+            if path not in self.figures or self.figures[path][0] != path_value:
+                continue
+
+            if self.figures[path][1] != article and os.path.isfile(path):
+                return path
+
+        self.figures[figure_path] = (value, article)
+        self.tree.add(value, (value, figure_path))
+        return figure_path
+
+    def write(self):
+        if file := open(self.path, 'w+'):
+            json.dump([(value, path, article) for (path, (value, article)) in self.figures.items()], file)
+        else:
+            print(f'Failed to open file {self.path}')
+            exit(-1)
@@ -0,0 +1,158 @@
+'''
+Loading of `identify.py` filters from declarative filter files and plugins,
+and the version hashes used to cache filter results.
+
+A filter file is a JSON, TOML (requires Python 3.11 or the tomli package) or
+YAML (requires PyYAML) mapping of filter names to definitions. A definition has the same keys as the filters in
+`identify.py`, except that patterns are given as strings
+
+'targets': The targeted parts of the article, as in `identify.py`,
+'regex': A pattern string, every match is a piece of information,
+'source': A pattern string, the first match marks the source of information,
+'categories': A mapping of category names to either a pattern string, a list
+              of literal keywords or null/false for the default category,
+'semantic': A list of prompts, see `identify.py`, with the optional
+            'threshold' and 'top',
+'flags': An optional list of regex flag names applied to all patterns, such as
+         ["IGNORECASE", "DOTALL"],
+'sample associated': As in `identify.py`,
+'expanding': As in `identify.py`,
+'description': As in `identify.py`.
+
+For example, in TOML
+
+["sample type"]
+targets = { sections = ["method"] }
+"sample associated" = true
+flags = ["IGNORECASE"]
+categories = { soil = ["soil", "soils", "Clay"], sewage = ["sewage", "waste water"] }
+description = { info = "The type of sample", data = '"soil" or "sewage"' }
+
+Plugins are installed packages registering an entry point in the
+'exuberanter.filters' group, which loads to either a dict of filters (in the
+form of `identify.py`) or a function returning one.
+'''
+
+from importlib.metadata import entry_points
+import hashlib
+import json
+import re
+
+# TOML is only in the standard library from Python 3.11
+try:
+    import tomllib
+except ImportError:
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+# The entry point group of filter plugins
+PLUGIN_GROUP = 'exuberanter.filters'
+
+# The keys which hold patterns in a filter
+PATTERN_KEYS = ['regex', 'source']
+
+# The keys of a filter which affect the identified information, the version
+# hash only changes with these. The description is written to the header of
+# each export instead, see `identify.py`
+VERSIONED_KEYS = ['targets', 'regex', 'source', 'categories', 'semantic', 'threshold', 'top', 'fancy', 'openai',
+                  'values', 'sample associated', 'expanding']
+
+# Compiles a single declarative filter definition to the form used by
+# `identify.py`
+def compile_filter(filter_name, definition):
+    if 'targets' not in definition or 'description' not in definition:
+        raise ValueError(f'filter "{filter_name}" requires "targets" and "description"')
+
+    flags = 0
+    for flag in definition.get('flags', []):
+        if not isinstance(getattr(re, flag, None), re.RegexFlag):
+            raise ValueError(f'filter "{filter_name}" has unknown flag "{flag}"')
+        flags |= getattr(re, flag)
+
+    filter = {key: value for key, value in definition.items() if key != 'flags'}
+    for key in PATTERN_KEYS:
+        if key in definition:
+            filter[key] = re.compile(definition[key], flags)
+
+    if 'categories' in definition:
+        filter['categories'] = {}
+        for (category_name, pattern) in definition['categories'].items():
+            # TOML has no null, the default category is given as false
+            if pattern is None or pattern is False:
+                filter['categories'][category_name] = None
+            elif isinstance(pattern, list):
+                filter['categories'][category_name] = re.compile('|'.join(map(re.escape, pattern)), flags)
+            else:
+                filter['categories'][category_name] = re.compile(pattern, flags)
+
+    if 'semantic' in filter and (not isinstance(filter['semantic'], list) or len(filter['semantic']) == 0):
+        raise ValueError(f'filter "{filter_name}" requires a non-empty list of "semantic" prompts')
+
+    if not any(key in filter for key in PATTERN_KEYS + ['categories', 'semantic', 'fancy']):
+        raise ValueError(f'filter "{filter_name}" has no "regex", "source", "categories" or "semantic"')
+
+    return filter
+
+# Loads the filters of the given JSON, TOML or YAML file
+def load_file(path):
+    if path.endswith('.json'):
+        with open(path) as file:
+            definitions = json.load(file)
+    elif path.endswith('.toml'):
+        if tomllib is None:
+            raise ValueError('TOML filter files require Python 3.11 or the tomli package')
+
+        with open(path, 'rb') as file:
+            definitions = tomllib.load(file)
+    elif path.endswith('.yaml') or path.endswith('.yml'):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError('YAML filter files require the PyYAML package')
+
+        with open(path) as file:
+            try:
+                definitions = yaml.safe_load(file)
+            except yaml.YAMLError as error:
+                raise ValueError(str(error))
+    else:
+        raise ValueError(f'unknown filter file type of {path}')
+
+    if not isinstance(definitions, dict):
+        raise ValueError(f'{path} is not a mapping of filter names to definitions')
+
+    return {filter_name: compile_filter(filter_name, definition)
+            for (filter_name, definition) in definitions.items()}
+
+# Loads the filters of all installed plugins
+def load_plugins():
+    loaded = {}
+    for entry_point in entry_points(group=PLUGIN_GROUP):
+        plugin = entry_point.load()
+        loaded.update(plugin() if callable(plugin) else plugin)
+
+    return loaded
+
+# Converts the parts of a filter which are not JSON serializable, compiled
+# patterns and functions, for hashing
+def serializable(value):
+    if isinstance(value, re.Pattern):
+        return {'pattern': value.pattern, 'flags': int(value.flags)}
+    elif callable(value):
+        code = getattr(value, '__code__', None)
+        return {
+            'function': f'{value.__module__}.{value.__qualname__}',
+            'code': code.co_code.hex() if code is not None else None,
+            'constants': repr(code.co_consts) if code is not None else None,
+        }
+
+    raise TypeError(f'cannot hash {type(value)}')
+
+# Returns the version hash of a filter, which changes with any change to the
+# parts of its definition affecting the identified information
+def version(filter):
+    versioned = {key: value for key, value in filter.items() if key in VERSIONED_KEYS}
+    definition = json.dumps(versioned, default=serializable, sort_keys=True)
+    return hashlib.sha256(definition.encode('utf-8')).hexdigest()[:16]
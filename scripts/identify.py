@@ -5,23 +5,63 @@ A script for identifiying relevant information from the articles outputed by
 `extract.py`.
 
 This is done using a series of filters. Each filter can currently either be a
-regex or a function (fancy). Each filter also specifies which sections it
-applies to, for example 'method' is written for the method sections.
+regex, a set of keyword categories, a function (fancy) or semantic. Each filter
+also specifies which sections it applies to, for example 'method' is written
+for the method sections.
+
+Information of filters marked 'sample associated' is attributed to a sample
+when the sentence (or otherwise the paragraph) it was found in mentions exactly
+one sample, such as 'site A', 'sample 3' or a named sampling location. See
+`segments.py`.
+
+A semantic filter gives a list of natural language prompts as 'semantic' and
+matches the sentences most similar to any of them, compared locally using TF-IDF
+vectors (see `semantic.py`). The optional 'threshold' is the minimum cosine
+similarity (default 0.3) and 'top' the maximum number of sentences per text
+(default 3). The IDF is fitted once over the first articles and kept with the
+vectors in `embeddings.sqlite`. For example
+
+'sampling': {
+    'targets': { 'sections': ['method'] },
+    'semantic': ['samples were collected from the site', 'sampling was performed'],
+    'description': { 'info': 'The sampling procedure', 'data': 'a sentence' },
+}
 
-The script has a single possible argument that can be either 'web' (default) or
+The script takes an optional argument that can be either 'web' (default) or
 'native'. If native, it turns the location (start and end) to TKinter offsets
-instead of simple byte offsets.
-
-The script exports one JSON file per article containing all the related pieces
-of information and their source. Each piece of information contains the
-following information
+instead of simple byte offsets. If the 'sqlite' argument is given the articles
+are read from the corpus store written by `extract.py sqlite` instead of the
+per-article JSON files. With `--jobs N` the articles are identified in N
+parallel worker processes, each article being exported as soon as it is done.
+
+Additional filters are loaded from installed plugins and from the JSON, TOML or
+YAML files given with `--filters PATH` (which may be repeated), replacing
+filters of the same name. See `filters.py` for the file format. The results of
+each filter are cached per article, only filters whose definition changed (other
+than the description) are run again.
+
+The script exports one NDJSON file per article containing all the related
+pieces of information and their source, written as they are identified. The
+time of the run and the description of each filter are stored once in the
+header line of the file, see `ndjson.py`. Each piece of information contains
+the following information
 
 'title': The information title,
 'data': The data contained within the information,
 'sample': The sample associated with the information (None for article wide data and -1 for indeterminate sample association),
+          samples are numbered by order of first mention (such as 'site A' or 'sample 3') in the article,
+          followed by the table value columns not naming a known sample,
+'sample label': The label the sample is mentioned by in the article (such as 'site A') or the header of its table value
+                column, None if the sample is None or -1,
 'expanding': If true, treat the data as a CSV file with two columns (header and data) which will later get expanded
-'stamp': The time of information creation,
-'uuid': A unique id assoicated with each piece of information,
+'unit': The unit of the values, only given for data parsed from tables,
+'column': The header of the table column the values are parsed from, only given for data parsed from tables,
+'stamp': The time of the run creating the information, kept by cached information of unchanged filters such that
+         it only changes when the information may have changed,
+'uuid': A unique id assoicated with each piece of information, derived from the article, filter, source kind,
+        subtype and span (and the value column for table values) so that unchanged information keeps its id
+        across runs. Information stored in the interfaces is given a random id and keeps the id it was stored
+        from as 'origin',
 'source': {
   'article': The name of the article,
   'kind': The type of location within article ('figure caption', 'table caption', 'metadata' or 'section'),
@@ -38,10 +78,20 @@ following information
 '''
 
 from datetime import datetime
+import bisect
+import corpus
+import filters
+import itertools
 import json
+import matcher
+import multiprocessing
+import ndjson
 import os
 import re
+import segments
+import semantic
 import sys
+import table_values
 import uuid
 
 # Setup openAI (if key is requested)
@@ -61,9 +111,60 @@ if 'OPENAI_API_KEY' in os.environ:
 # The path to the extracted data
 EXTRACTED_PATH = './output/extract'
 
+# The path to the corpus store, used if the 'sqlite' argument is given
+CORPUS_PATH = f'{EXTRACTED_PATH}/corpus.sqlite'
+
 # The export directory path
 EXPORT_DIRECTORY = './output/identify'
 
+# The directory of the cached per-article preprocessing (reference stripped
+# sections and section ancestry), kept next to the extract output as it only
+# depends on the extracted article
+PREPROCESSED_DIRECTORY = f'{EXTRACTED_PATH}/preprocessed'
+
+# The version of the preprocessing, caches of other versions are recomputed
+PREPROCESSED_VERSION = 4
+
+# The directory of the cached information of each filter per article, filters
+# are only rerun if their definition (version hash) or the article changed
+RESULT_CACHE_DIRECTORY = f'{EXPORT_DIRECTORY}/cache'
+
+# The version of the cached information format, caches of other versions are
+# ignored
+RESULT_CACHE_VERSION = 7
+
+# The time of this run, the stamp of all information identified (not cached)
+# in it
+RUN_STAMP = datetime.now().isoformat()
+
+# The namespace of the ids of identified information
+ID_NAMESPACE = uuid.UUID('7c10cf0d-1094-4a6c-a09d-44eb1007ff6d')
+
+# Returns the deterministic id of a piece of information, the part separates
+# several pieces of information identified from the same span
+def information_id(article_name, filter_name, kind, subtype, span, part=None):
+    return str(uuid.uuid5(ID_NAMESPACE, f'{article_name}\0{filter_name}\0{kind}\0{subtype}\0'
+                                        f'{span[0]}\0{span[1]}\0{part}'))
+
+# The path of the store of the sentence embeddings of the semantic filters,
+# keyed by text hash, see `semantic.py`
+EMBEDDING_PATH = f'{EXTRACTED_PATH}/embeddings.sqlite'
+
+# The number of articles the IDF of the semantic filters is fitted over
+IDF_ARTICLES = 1000
+
+# The default minimum cosine similarity and the default maximum number of
+# sentences per text of semantic filters
+SEMANTIC_THRESHOLD = 0.3
+SEMANTIC_TOP = 3
+
+# The opened corpus store, if articles are read from it
+CORPUS = None
+
+# If locations are TKinter offsets instead of character offsets, set by the
+# 'native' argument
+TKINTER_OFFSETS = False
+
 # All the filters used for identifying information
 FILTERS = {
     # The title of the article. Extracted from the article metadata
@@ -151,9 +252,14 @@ FILTERS = {
     #
     # This is in the same format exported by the bar chart mode in
     # WebPlotDigitizer
+    #
+    # The item is also marked with 'values', which causes the gene names and
+    # numeric values of targeted tables to be parsed into this format (see
+    # `table_values.py`), one piece of information per value column
     'gene abundance': {
         'sample associated': True,
         'expanding': True,
+        'values': True,
         'targets': { 'figures': True, 'tables': True },
         'source': re.compile('|'.join(map(lambda str: f'\\b{str}\\b', [
             'abundance', 'Abundance', 'ARG', 'ARGs'
@@ -188,16 +294,24 @@ def create_location_span(span):
             'end': span[1],
         }
 
-# Adjusts the span using the list of offsets
+# The offsets of text without any removed references
+NO_OFFSETS = ([], [])
+
+# Adjusts the span of a match in text with removed references to the original
+# text. The offsets are the positions (in the modified text) where references
+# were removed and the prefix sums of the removed lengths. A reference removed
+# at the start of the span shifts it, while one removed at the end does not,
+# unless the span is empty
 def adjust_span(span, offsets):
-    offset = 0
-    for (modified, local_offset) in offsets:
-        if span[0] < modified:
-            return (span[0] + offset, span[1] + offset)
+    positions, shifts = offsets
 
-        offset += local_offset
+    start_references = bisect.bisect_right(positions, span[0])
+    end_references = max(start_references, bisect.bisect_left(positions, span[1]))
 
-    return span
+    start = span[0] + (shifts[start_references - 1] if 0 < start_references else 0)
+    end = span[1] + (shifts[end_references - 1] if 0 < end_references else 0)
+
+    return (start, end)
 
 # Identify the id of common sections which may be used in the filters
 # 'sections' list
@@ -217,70 +331,305 @@ def identify_sections(article):
 
     return section_map
 
+# Matches a reference, text enclosed in parenthesis
+REFERENCE_REGEX = re.compile(r'\([^()]*\)')
+
 # Removes all the references, text enclosed in parenthesis, from the given
-# text. Returns the filtered text and offset markers to keep track of original
-# offset
+# text. Returns the filtered text and offsets to keep track of original offset,
+# see `adjust_span`
 def exclude_references(text):
     previous_end = 0
-    without_parenthesis = ''
-    offsets = []
-    for match in re.compile(r'\([^()]*\)').finditer(text):
+    length = 0
+    parts = []
+    positions = []
+    shifts = []
+    for match in REFERENCE_REGEX.finditer(text):
         span = match.span()
 
-        without_parenthesis += text[previous_end:span[0]]
+        parts.append(text[previous_end:span[0]])
+        length += span[0] - previous_end
         previous_end = span[1]
 
         # Keep track of the offset between the two strings
-        offsets.append((len(without_parenthesis), span[1] - span[0]))
+        positions.append(length)
+        shifts.append((shifts[-1] if 0 < len(shifts) else 0) + span[1] - span[0])
+
+    parts.append(text[previous_end:])
+
+    return (''.join(parts), (positions, shifts))
+
+# Returns the names of the common sections (see `identify_sections`) each
+# section belongs to, either directly or through any of its ancestors
+def identify_ancestry(article, section_map):
+    names = {}
+    for (name, id) in section_map.items():
+        if id is not None:
+            names.setdefault(id, []).append(name)
+
+    ancestry = []
+    for id in range(len(article['sections'])):
+        section_names = []
+
+        ancestor_id = id
+        while ancestor_id is not None:
+            section_names.extend(names.get(ancestor_id, []))
+            ancestor_id = article['sections'][ancestor_id]['parent']
+
+        ancestry.append(section_names)
+
+    return ancestry
+
+# Returns a stamp identifying the version of the extracted article, used to
+# invalidate the preprocessing cache
+def source_stamp(json_path):
+    stat = os.stat(CORPUS_PATH if CORPUS is not None else json_path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+# Returns the distinct sample labels mentioned in the article, in order of
+# first mention in the sections followed by the captions. The sample number of
+# a label is its index
+def identify_samples(article):
+    texts = [section['content'] for section in article['sections']]
+    texts.extend(record['caption'] for kind in ['figures', 'tables'] for record in article[kind]
+                 if record['caption'] is not None)
+
+    return list(dict.fromkeys(label for text in texts for (_, label) in segments.detect_mentions(text)))
+
+# Loads the cached preprocessing of the article, or computes the section map,
+# ancestry and samples if there is no valid cache. The reference stripped
+# section texts and segment indices are added lazily by `stripped_section` and
+# `section_segments`
+def load_preprocessed(name, json_path, article):
+    path = f'{PREPROCESSED_DIRECTORY}/{name}.json'
+    stamp = source_stamp(json_path)
+
+    if os.path.isfile(path) and (file := open(path)):
+        preprocessed = json.load(file)
+        if preprocessed['version'] == PREPROCESSED_VERSION and preprocessed['source'] == stamp:
+            preprocessed['modified'] = False
+            return preprocessed
+
+    section_map = identify_sections(article)
+    return {
+        'version': PREPROCESSED_VERSION,
+        'source': stamp,
+        'sections': section_map,
+        'ancestry': identify_ancestry(article, section_map),
+        'samples': identify_samples(article),
+        'references': {},
+        'segments': {},
+        'modified': True,
+    }
 
-    return (without_parenthesis, offsets)
+# Returns the (text, offsets) of the section with its references removed,
+# computing and caching it if needed
+def stripped_section(preprocessed, article, id):
+    # JSON object keys are strings
+    key = str(id)
+    if key not in preprocessed['references']:
+        preprocessed['references'][key] = exclude_references(article['sections'][id]['content'])
+        preprocessed['modified'] = True
+
+    return preprocessed['references'][key]
+
+# Returns the label of the sample number, or None for article wide and
+# indeterminate samples
+def sample_label(preprocessed, sample):
+    return None if sample is None or sample < 0 else preprocessed['samples'][sample]
+
+# Returns the sentence, paragraph and sample mention index of the section (see
+# `segments.py`), computing and caching it if needed
+def section_segments(preprocessed, article, id):
+    # JSON object keys are strings
+    key = str(id)
+    if key not in preprocessed['segments']:
+        preprocessed['segments'][key] = segments.index(article['sections'][id]['content'])
+        preprocessed['modified'] = True
+
+    return preprocessed['segments'][key]
+
+# Returns a function attributing a span of the given section or caption to a
+# sample number, or -1 if the sample is ambiguous. Returns None for other kinds
+# of text
+def sample_assigner(preprocessed, article, kind, subtype):
+    if kind == 'section':
+        text_index = section_segments(preprocessed, article, subtype)
+    elif kind == 'figure caption':
+        text_index = segments.index(article['figures'][subtype]['caption'])
+    elif kind == 'table caption':
+        text_index = segments.index(article['tables'][subtype]['caption'])
+    else:
+        return None
+
+    def assign(span):
+        label = segments.sample_at(text_index, span[0])
+        return -1 if label is None else preprocessed['samples'].index(label)
+
+    return assign
+
+# Returns the parsed values of each table of the article as a list of (CSV
+# data, unit, sample number, column header) for each value column, see
+# `table_values.py`. A column naming exactly one known sample is attributed to
+# it. Other columns become samples of their own, labelled by their header and
+# table, so that the columns of a table (and the tables of an article) do not
+# override each other. The exception is a single value column in a table whose
+# caption names exactly one known sample, where the sample is None and left to
+# the caption
+def table_abundances(preprocessed, article):
+    if 'abundances' not in preprocessed:
+        contents = [table['content'] or '' for table in article['tables']]
+
+        preprocessed['abundances'] = []
+        for (i, columns) in enumerate(table_values.extract_abundances(contents)):
+            caption_labels = {label for (_, label) in segments.detect_mentions(article['tables'][i]['caption'] or '')
+                              if label in preprocessed['samples']}
+
+            table = []
+            for (j, (header, data, unit)) in enumerate(columns):
+                labels = {label for (_, label) in segments.detect_mentions(header)}
+                label = labels.pop() if len(labels) == 1 else None
+                if label not in preprocessed['samples']:
+                    label = None
+                    if len(columns) != 1 or len(caption_labels) != 1:
+                        label = f'{header or f"column {j + 1}"} (table {i + 1})'
+                        if label not in preprocessed['samples']:
+                            preprocessed['samples'].append(label)
+
+                column_sample = None if label is None else preprocessed['samples'].index(label)
+                table.append((data, unit, column_sample, header))
+
+            preprocessed['abundances'].append(table)
+        preprocessed['modified'] = True
+
+    return preprocessed['abundances']
+
+# Writes the preprocessing cache of the article, if anything was added to it
+def write_preprocessed(name, preprocessed):
+    if not preprocessed.pop('modified'):
+        return
+
+    os.makedirs(PREPROCESSED_DIRECTORY, exist_ok=True)
+    if file := open(path := f'{PREPROCESSED_DIRECTORY}/{name}.json', 'w+'):
+        json.dump(preprocessed, file)
+    else:
+        print(f'Failed to open file {path}')
+
+# The sentence encoder of the semantic filters, created when first needed
+ENCODER = None
+def semantic_encoder():
+    global ENCODER
+
+    if ENCODER is None:
+        ENCODER = semantic.Encoder(EMBEDDING_PATH)
+
+    return ENCODER
+
+# Fits the IDF of the semantic filters over the section content and captions
+# of the first `IDF_ARTICLES` articles of the summary, unless fitted before.
+# The IDF is persisted, see `semantic.py`
+def fit_semantic(summary):
+    def texts():
+        for (name, json_path) in itertools.islice(summary.items(), IDF_ARTICLES):
+            if CORPUS is not None:
+                article = CORPUS.load(name)
+            elif file := open(json_path):
+                article = json.load(file)
+            else:
+                print(f'Failed to open file {json_path}')
+                exit(-1)
+
+            yield from (section['content'] for section in article['sections'])
+            yield from (item['caption'] for item in article['figures'] + article['tables']
+                        if item['caption'] is not None)
+
+    encoder = semantic.Encoder(EMBEDDING_PATH)
+    if not encoder.fitted():
+        encoder.fit(texts())
+    encoder.close()
+
+# Returns the patterns of the given filter keyed by (filter name, category),
+# where the category is None for filters without categories
+def filter_patterns(filter_name, filter):
+    if 'regex' in filter:
+        return {(filter_name, None): filter['regex']}
+    elif 'source' in filter:
+        return {(filter_name, None): filter['source']}
+    elif 'categories' in filter:
+        return {(filter_name, category_name): regex
+                for (category_name, regex) in filter['categories'].items() if regex is not None}
+
+    return {}
 
-# Returns information given on the text by the given filter
-def filter_text(filter_name, filter, text, text_offsets, article_name, kind,
-                subtype, sample, expanding):
+# The matchers of each combination of filters targeting a text, created when
+# first needed
+MATCHERS = {}
+
+# Scans the text once for the patterns of all the given filters. Returns the
+# matches of each pattern keyed as in `filter_patterns`
+def scan_text(filter_names, text):
+    if filter_names not in MATCHERS:
+        patterns = {}
+        for filter_name in filter_names:
+            patterns.update(filter_patterns(filter_name, FILTERS[filter_name]))
+
+        MATCHERS[filter_names] = matcher.Matcher(patterns)
+
+    return MATCHERS[filter_names].scan(text)
+
+# Returns information given on the text by the given filter, using the matches
+# of the text found by `scan_text`
+def filter_text(filter_name, filter, text, text_offsets, matches, article_name,
+                kind, subtype, sample, expanding, assign_sample=None, values=None):
     information = []
 
-    if 'regex' in filter:
-        for match in filter['regex'].finditer(text):
+    if 'regex' in filter or 'semantic' in filter:
+        for (start, end, data) in matches[(filter_name, None)]:
             # We adjust for removed text using a offset
-            span = adjust_span(match.span(), text_offsets)
+            span = adjust_span((start, end), text_offsets)
 
             information.append({
                 'title': filter_name,
-                'data': match.group(),
-                'sample': sample,
+                'data': data,
+                'sample': sample if assign_sample is None else assign_sample(span),
                 'expanding': expanding,
-                'stamp': datetime.now().isoformat(),
-                'uuid': str(uuid.uuid4()),
+                'uuid': information_id(article_name, filter_name, kind, subtype, span),
                 'source': {
                   'article': article_name,
                   'kind': kind,
                   'subtype': subtype,
                   'location': create_location_span(span),
                 },
-                'description': filter['description'],
             })
     elif 'source' in filter:
         # We only care about the first match for each section
-        if (match := filter['source'].search(text)) is not None:
+        for (start, end, _) in matches[(filter_name, None)][:1]:
             # We adjust for removed text using a offset
-            span = adjust_span(match.span(), text_offsets)
-
-            information.append({
-                'title': filter_name,
-                'data': None,
-                'sample': sample,
-                'expanding': expanding,
-                'stamp': datetime.now().isoformat(),
-                'uuid': str(uuid.uuid4()),
-                'source': {
-                  'article': article_name,
-                  'kind': kind,
-                  'subtype': subtype,
-                  'location': create_location_span(span),
-                },
-                'description': filter['description'],
-            })
+            span = adjust_span((start, end), text_offsets)
+            span_sample = sample if assign_sample is None else assign_sample(span)
+
+            # Tables with parsed values give one piece of information per
+            # value column, each column is its own sample unless it names a
+            # known sample, see `table_abundances`
+            for (column, (data, unit, column_sample, header)) in enumerate(values or [(None, None, None, None)]):
+                info = {
+                    'title': filter_name,
+                    'data': data,
+                    'sample': span_sample if column_sample is None or sample is None else column_sample,
+                    'expanding': expanding,
+                    'uuid': information_id(article_name, filter_name, kind, subtype, span, column),
+                    'source': {
+                      'article': article_name,
+                      'kind': kind,
+                      'subtype': subtype,
+                      'location': create_location_span(span),
+                    },
+                }
+                if unit is not None:
+                    info['unit'] = unit
+                if header is not None:
+                    info['column'] = header
+
+                information.append(info)
     elif 'categories' in filter:
         possible_categories = []
         default_category = None
@@ -288,20 +637,22 @@ def filter_text(filter_name, filter, text, text_offsets, article_name, kind,
         for (category_name, regex) in filter['categories'].items():
             if regex is None:
                 default_category = category_name
-            elif match := regex.search(text):
+            elif 0 < len(category_matches := matches[(filter_name, category_name)]):
                 # We adjust for removed text using a offset
-                span = adjust_span(match.span(), text_offsets)
+                span = adjust_span(category_matches[0][:2], text_offsets)
 
                 possible_categories.append(category_name)
                 spans.append(span)
 
-        data, location = None, None
+        data, span = None, None
         if 0 < len(possible_categories):
             data = '/'.join(possible_categories)
-            location = create_location_span(spans[0])
+            span = spans[0]
+            if assign_sample is not None:
+                sample = assign_sample(spans[0])
         elif default_category is not None:
             data = default_category
-            location = create_location_span([0, 0])
+            span = [0, 0]
 
         if data is not None:
             information.append({
@@ -309,22 +660,20 @@ def filter_text(filter_name, filter, text, text_offsets, article_name, kind,
                 'data': data,
                 'sample': sample,
                 'expanding': expanding,
-                'stamp': datetime.now().isoformat(),
-                'uuid': str(uuid.uuid4()),
+                'uuid': information_id(article_name, filter_name, kind, subtype, span),
                 'source': {
                   'article': article_name,
                   'kind': kind,
                   'subtype': subtype,
-                  'location': location,
+                  'location': create_location_span(span),
                 },
-                'description': filter['description'],
             })
 
     elif 'fancy' in filter:
         information = filter['fancy'](filter_name, text, text_offsets,
                                       article_name, kind, subtype)
 
-    elif 'openai':
+    elif 'openai' in filter:
         # Only run openAI filter if API is enabled
         if OPENAI_ENABLED:
             print('OpenAI filters are unfortunetely not yet implemented')
@@ -335,126 +684,287 @@ def filter_text(filter_name, filter, text, text_offsets, article_name, kind,
 
     return information
 
-# Identifies and extract relevant information from article
+# The version hash of each filter, computed when first needed
+FILTER_VERSIONS = {}
+def filter_version(filter_name):
+    if filter_name not in FILTER_VERSIONS:
+        FILTER_VERSIONS[filter_name] = filters.version(FILTERS[filter_name])
+
+    return FILTER_VERSIONS[filter_name]
+
+# Loads the cached information of each filter for the article. Only the
+# results of filters with unchanged versions, for the same version of the
+# article and location format, are kept
+def load_cached_results(name, json_path):
+    path = f'{RESULT_CACHE_DIRECTORY}/{name}.json'
+    if not os.path.isfile(path) or not (file := open(path)):
+        return {}
+
+    cache = json.load(file)
+    if cache.get('version') != RESULT_CACHE_VERSION or cache['source'] != source_stamp(json_path) or \
+       cache['native'] != TKINTER_OFFSETS:
+        return {}
+
+    return {filter_name: results['information'] for (filter_name, results) in cache['filters'].items()
+            if filter_name in FILTERS and results['version'] == filter_version(filter_name)}
+
+# Writes the information of each filter for the article to the cache
+def write_cached_results(name, json_path, results):
+    os.makedirs(RESULT_CACHE_DIRECTORY, exist_ok=True)
+    if file := open(path := f'{RESULT_CACHE_DIRECTORY}/{name}.json', 'w+'):
+        json.dump({
+            'version': RESULT_CACHE_VERSION,
+            'source': source_stamp(json_path),
+            'native': TKINTER_OFFSETS,
+            'filters': {filter_name: {'version': filter_version(filter_name), 'information': information}
+                        for (filter_name, information) in results.items()},
+        }, file)
+    else:
+        print(f'Failed to open file {path}')
+
+# Identifies and extract relevant information from article. The information is
+# yielded filter by filter as soon as it is identified
 def identify_information(name, json_path):
-    # Load the article
-    if file := open(json_path):
+    # The information of each filter, reusing the cached results of filters
+    # which have not changed since the last run
+    results = load_cached_results(name, json_path)
+    pending = [filter_name for filter_name in FILTERS if filter_name not in results]
+    if len(pending) == 0:
+        for filter_name in FILTERS:
+            yield from results[filter_name]
+        return
+
+    # Load the article, from the corpus store if opened
+    if CORPUS is not None:
+        article = CORPUS.load(name)
+    elif file := open(json_path):
         article = json.load(file)
     else:
         print(f'Failed to open file {json_path}')
         exit(-1)
 
-    # All the information identified from the article
-    information = []
+    # The common sections (such as the methods section) and the sections
+    # belonging to them, from the cache if the article has not changed
+    preprocessed = load_preprocessed(name, json_path, article)
 
-    # Find the methods section using keywords in the section title
-    sections = identify_sections(article)
+    # The texts targeted by each filter as (kind, subtype) tuples, and the
+    # (text, offsets) and targeting filters of each of these texts
+    targeted = {filter_name: [] for filter_name in pending}
+    texts = {}
+    text_filters = {}
+    def target(filter_name, kind, subtype, text, offsets):
+        targeted[filter_name].append((kind, subtype))
+        texts[(kind, subtype)] = (text, offsets)
+        text_filters.setdefault((kind, subtype), []).append(filter_name)
 
-    # Remove references from each section
-    without_references = {}
-    for id, section in enumerate(article['sections']):
-        # Get the text without references, useful for example extracting years
-        no_ref, no_ref_offsets = exclude_references(section['content'])
-        without_references[id] = (no_ref, no_ref_offsets)
+    for filter_name in pending:
+        filter = FILTERS[filter_name]
 
-    for filter_name, filter in FILTERS.items():
-        # The sample associated with filter, either unkown or article wide
-        sample = -1 if 'sample associated' in filter and filter['sample associated'] else None
-
-        # The expanding flag. If enabled the item can contain a CSV table that
-        # will be expanded in `aggregate.py`. It may be displayed as a table
-        # in user-facing interfaces
-        expanding = True if 'expanding' in filter and filter['expanding'] else False
-
-        # Find all figure caption information
+        # Find all figure captions
         if 'figures' in filter['targets'] and filter['targets']['figures']:
             for id, figure in enumerate(article['figures']):
                 if figure['caption'] is None:
                     continue
 
-                information.extend(filter_text(filter_name, filter, figure['caption'],
-                                               [], name, 'figure caption', id, sample, expanding))
+                target(filter_name, 'figure caption', id, figure['caption'], NO_OFFSETS)
 
-        # Find all table caption information
+        # Find all table captions
         if 'tables' in filter['targets'] and filter['targets']['tables']:
             for id, table in enumerate(article['tables']):
                 if table['caption'] is None:
                     continue
 
-                information.extend(filter_text(filter_name, filter, table['caption'],
-                                               [], name, 'table caption', id, sample, expanding))
+                target(filter_name, 'table caption', id, table['caption'], NO_OFFSETS)
 
-        # Find all metadata information
+        # Find all metadata
         if 'metadata' in filter['targets']:
             # Check if current metadata is any of the metadata given
             for metadata_name in filter['targets']['metadata']:
-                information.extend(filter_text(filter_name, filter, article['metadata'][metadata_name],
-                                               [], name, 'metadata', metadata_name, sample, expanding))
+                target(filter_name, 'metadata', metadata_name, article['metadata'][metadata_name], NO_OFFSETS)
 
-        # Find all text section information
+        # Find all text sections
         if 'sections' in filter['targets']:
-            for id, section in enumerate(article['sections']):
+            for id, section_names in enumerate(preprocessed['ancestry']):
                 # Check if current section or any of it's ancestors is one of the
                 # required sections
-                section_ids = map(lambda x: sections[x], filter['targets']['sections'])
+                if not any(section_name in section_names for section_name in filter['targets']['sections']):
+                    continue
 
-                ancestor_id = id
-                match = False
-                while ancestor_id is not None:
-                    if ancestor_id in section_ids:
-                        match = True
-                        break
+                # Use the text without references, useful for example
+                # extracting years
+                target(filter_name, 'section', id, *stripped_section(preprocessed, article, id))
 
-                    ancestor_id = article['sections'][ancestor_id]['parent']
+    # Scan each text once for the patterns of all filters targeting it
+    scans = {}
+    for key, (text, _) in texts.items():
+        scans[key] = scan_text(tuple(text_filters[key]), text)
 
-                # The section is not targeted by the filter
-                if not match:
-                    continue
+    # Rank the sentences of all texts targeted by each semantic filter in one
+    # batch
+    for filter_name in pending:
+        filter = FILTERS[filter_name]
+        if 'semantic' not in filter or len(targeted[filter_name]) == 0:
+            continue
 
-                # Match using the filter
-                information.extend(filter_text(filter_name, filter, without_references[id][0],
-                                               without_references[id][1], name, 'section', id,
-                                               sample, expanding))
+        ranked = semantic_encoder().rank([texts[key][0] for key in targeted[filter_name]], filter['semantic'],
+                                         filter.get('threshold', SEMANTIC_THRESHOLD),
+                                         filter.get('top', SEMANTIC_TOP))
+        for key, matches in zip(targeted[filter_name], ranked):
+            scans[key][(filter_name, None)] = matches
 
-    return information
+    # The sample assigner of each targeted text, created when first needed
+    assigners = {}
+
+    for filter_name, filter in FILTERS.items():
+        # Use the cached information of unchanged filters
+        if filter_name not in pending:
+            yield from results[filter_name]
+            continue
+
+        information = []
 
-# Create the export directory
-os.makedirs(EXPORT_DIRECTORY, exist_ok=True)
-
-# Look for 'web' argument
-if len(sys.argv) == 1 or sys.argv[1] == 'web':
-    TKINTER_OFFSETS = False
-elif sys.argv[1] == 'native':
-    TKINTER_OFFSETS = True
-else:
-    print('unrecognized arguments, exiting')
-    exit(-1)
-
-# Load the extract summary
-if os.path.isfile(path := f'{EXTRACTED_PATH}/results.json') and (file := open(path)):
-    extract_summary = json.load(file)
-else:
-    print('Failed to load extract results, are you sure you have ran the `extract.py` script?')
-    exit(-1)
-
-# Parse each article separately
-article_paths = {}
-for (name, path) in extract_summary.items():
-    print(f'Identifiying information from {name} ... ', flush=True, end='')
-    result = identify_information(name, path)
-    print('done')
-
-    # Export each article in a separate JSON file
-    path = f'{EXPORT_DIRECTORY}/{name}.json'
-    if file := open(path, 'w+'):
-        json.dump(result, file)
+        # The sample associated with filter, either unkown or article wide
+        sample = -1 if 'sample associated' in filter and filter['sample associated'] else None
+
+        # The expanding flag. If enabled the item can contain a CSV table that
+        # will be expanded in `aggregate.py`. It may be displayed as a table
+        # in user-facing interfaces
+        expanding = True if 'expanding' in filter and filter['expanding'] else False
+
+        # Match using the filter, sample associated information is attributed
+        # to the sample mentioned around it where unambiguous
+        for (kind, subtype) in targeted[filter_name]:
+            text, offsets = texts[(kind, subtype)]
+            assign_sample = None
+            if sample is not None:
+                if (kind, subtype) not in assigners:
+                    assigners[(kind, subtype)] = sample_assigner(preprocessed, article, kind, subtype)
+                assign_sample = assigners[(kind, subtype)]
+
+            values = None
+            if kind == 'table caption' and 'values' in filter and filter['values']:
+                values = table_abundances(preprocessed, article)[subtype]
+
+            information.extend(filter_text(filter_name, filter, text, offsets, scans[(kind, subtype)],
+                                           name, kind, subtype, sample, expanding, assign_sample, values))
+
+        # Stamp the information with this run, kept while it is cached, and
+        # label it with the sample it is attributed to
+        for info in information:
+            info['stamp'] = RUN_STAMP
+            info['sample label'] = sample_label(preprocessed, info['sample'])
+
+        results[filter_name] = information
+        yield from information
+
+    write_preprocessed(name, preprocessed)
+    write_cached_results(name, json_path, results)
+
+# Identifies the information of a single article, given as a (name, path)
+# tuple, and streams it to a separate NDJSON file. Returns the name and path of
+# the export
+def identify_article(article):
+    name, json_path = article
+
+    # Export each article in a separate NDJSON file, with the descriptions
+    # interned in the header
+    path = f'{EXPORT_DIRECTORY}/{name}.ndjson'
+    descriptions = {filter_name: filter['description'] for (filter_name, filter) in FILTERS.items()}
+    with ndjson.Writer(path, RUN_STAMP, descriptions) as writer:
+        for info in identify_information(name, json_path):
+            writer.write(info)
+
+    return (name, path)
+
+# Opens a separate connection to the corpus store in each worker process, as
+# SQLite connections may not be shared across a fork
+def initialize_worker():
+    global CORPUS
+
+    if CORPUS is not None:
+        CORPUS = corpus.Store(CORPUS_PATH)
+
+# Only run if non-library
+if __name__ == '__main__':
+    # Create the export directory
+    os.makedirs(EXPORT_DIRECTORY, exist_ok=True)
+
+    # Add the filters of installed plugins
+    FILTERS.update(filters.load_plugins())
+
+    # Look for the 'web', 'native' and 'sqlite' arguments and the '--jobs' and
+    # '--filters' options
+    jobs = None
+    arguments = iter(sys.argv[1:])
+    for argument in arguments:
+        if argument == 'web':
+            TKINTER_OFFSETS = False
+        elif argument == 'native':
+            TKINTER_OFFSETS = True
+        elif argument == 'sqlite':
+            if not os.path.isfile(CORPUS_PATH):
+                print('Failed to load corpus store, are you sure you have ran `extract.py sqlite`?')
+                exit(-1)
+            CORPUS = corpus.Store(CORPUS_PATH)
+        elif argument == '--jobs':
+            try:
+                jobs = int(next(arguments, None))
+            except (TypeError, ValueError):
+                jobs = 0
+
+            if jobs < 1:
+                print('The --jobs option requires a positive integer')
+                exit(-1)
+        elif argument == '--filters':
+            if (path := next(arguments, None)) is None:
+                print('The --filters option requires a path')
+                exit(-1)
+
+            try:
+                FILTERS.update(filters.load_file(path))
+            except (OSError, ValueError, re.error) as error:
+                print(f'Failed to load filters from {path}: {error}')
+                exit(-1)
+        else:
+            print('unrecognized arguments, exiting')
+            exit(-1)
+
+    # Load the extract summary, the store has no paths but the names suffice
+    if CORPUS is not None:
+        extract_summary = dict.fromkeys(CORPUS.names())
+    elif os.path.isfile(path := f'{EXTRACTED_PATH}/results.json') and (file := open(path)):
+        extract_summary = json.load(file)
     else:
-        print(f'Failed to open file {path}')
+        print('Failed to load extract results, are you sure you have ran the `extract.py` script?')
+        exit(-1)
+
+    # Fit the IDF of the semantic filters once over the corpus, before any
+    # worker encodes a sentence
+    if any('semantic' in filter for filter in FILTERS.values()):
+        fit_semantic(extract_summary)
 
-    article_paths[name] = path
+    # Parse each article separately
+    export_paths = {}
+    if jobs is None:
+        for article in extract_summary.items():
+            print(f'Identifiying information from {article[0]} ... ', flush=True, end='')
+            name, path = identify_article(article)
+            print('done')
 
-# Export JSON containing identified information
-if file := open(file_path:=f'{EXPORT_DIRECTORY}/results.json', 'w+'):
-    json.dump(article_paths, file)
-else:
-    print(f'Failed to open file {file_path}')
+            export_paths[name] = path
+    else:
+        # The workers are forked, sharing the compiled filters
+        with multiprocessing.get_context('fork').Pool(jobs, initializer=initialize_worker) as pool:
+            for (name, path) in pool.imap_unordered(identify_article, extract_summary.items()):
+                print(f'Identified information from {name}')
+                export_paths[name] = path
+
+    # Keep the order of the extract results, regardless of the order the
+    # articles finished in
+    article_paths = {name: export_paths[name] for name in extract_summary}
+
+    # Export JSON containing identified information
+    if file := open(file_path:=f'{EXPORT_DIRECTORY}/results.json', 'w+'):
+        json.dump(article_paths, file)
+    else:
+        print(f'Failed to open file {file_path}')
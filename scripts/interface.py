@@ -5,10 +5,15 @@ A web-based graphical interface for interacting with the data extracted from
 articles by `extract.py` and `identify.py`.
 '''
 
-from bottle import run, template, get, redirect, static_file, response, post, request
+from bottle import run, template, get, redirect, static_file, response, post, request, abort
+import corpus
 import json
+import ndjson
 import os
+import pack
 import shutil
+import text_index
+import time
 
 # Resource prefix
 RES_PREFIX = os.path.dirname(__file__)
@@ -16,6 +21,17 @@ RES_PREFIX = os.path.dirname(__file__)
 # The path of the extract results file
 EXTRACT_FILE = './output/extract/results.json'
 
+# The path of the corpus store, used instead of the extract output for the
+# articles stored from their current extract output
+CORPUS_FILE = './output/extract/corpus.sqlite'
+
+# The path of the full-text index, written by `extract.py index`
+INDEX_FILE = './output/extract/index.bin'
+
+# The default and maximum number of hits returned by a search
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 200
+
 # The path of the identifed results file
 IDENTIFY_FILE = './output/identify/results.json'
 
@@ -30,8 +46,16 @@ EXPORT_SUMMARY_PATH = f'{EXPORT_DIRECTORY}/results.json'
 EXTRACT_PATHS = {}
 IDENTIFY_PATHS = {}
 RESULT_PATHS = {}
+CORPUS = None
+INDEX = None
+
+# Returns True if the article is in the corpus store, stored from its current
+# extract output
+def stored(article_id):
+    return CORPUS is not None and CORPUS.fresh(article_id, EXTRACT_PATHS[article_id])
 
-# Load the given article (cached)
+# Load the given article (cached), from the corpus store if stored from the
+# current extract output and otherwise from its JSON export
 ARTICLE_CACHE = None
 def load_article(article_id):
     global ARTICLE_CACHE
@@ -39,19 +63,39 @@ def load_article(article_id):
     if ARTICLE_CACHE is not None and ARTICLE_CACHE[0] == article_id:
         return ARTICLE_CACHE[1]
 
-    ARTICLE_CACHE = [article_id, json.load(open(EXTRACT_PATHS[article_id]))]
-    return ARTICLE_CACHE[1]
-
-# Load the info associated with the given article (cached)
-ARTICLE_INFO_CACHE = None
-def load_article_info(article_id):
-    global ARTICLE_INFO_CACHE
+    if article_id not in EXTRACT_PATHS:
+        abort(404, f'No article {article_id}')
 
-    if ARTICLE_INFO_CACHE is not None and ARTICLE_INFO_CACHE[0] == article_id:
-        return ARTICLE_INFO_CACHE[1]
+    if stored(article_id):
+        ARTICLE_CACHE = [article_id, CORPUS.load(article_id)]
+    else:
+        ARTICLE_CACHE = [article_id, json.load(open(EXTRACT_PATHS[article_id]))]
+    return ARTICLE_CACHE[1]
 
-    ARTICLE_INFO_CACHE = [article_id, json.load(open(IDENTIFY_PATHS[article_id]))]
-    return ARTICLE_INFO_CACHE[1]
+# Load a single section, figure or table of the given article. If the article
+# is in the corpus store or was exported with `extract.py pack` only the record
+# itself is read, otherwise the entire article is loaded from its JSON export
+def load_record(article_id, kind, index):
+    if article_id not in EXTRACT_PATHS:
+        abort(404, f'No article {article_id}')
+
+    if ARTICLE_CACHE is None or ARTICLE_CACHE[0] != article_id:
+        if stored(article_id):
+            return CORPUS.metadata(article_id) if kind == 'metadata' else CORPUS.record(article_id, kind, index)
+
+        # Only use a pack file written from the current extract output, and
+        # fall back to the JSON export if it is of another format version
+        json_path = EXTRACT_PATHS[article_id]
+        pack_path = json_path.removesuffix('.json') + '.pack'
+        if pack.fresh(pack_path, json_path):
+            try:
+                with pack.Reader(pack_path) as reader:
+                    return reader.metadata() if kind == 'metadata' else reader.record(kind, index)
+            except ValueError:
+                pass
+
+    article = load_article(article_id)
+    return article['metadata'] if kind == 'metadata' else article[kind][index]
 
 # Redirect the index to the first article
 @get('/')
@@ -64,6 +108,24 @@ def favicon():
     response.status = 404
     return 'No favicon'
 
+# Search the full-text index, returns the ranked hits and the query time
+@get('/search')
+def search():
+    if INDEX is None:
+        response.status = 404
+        return 'No full-text index, run `extract.py index`'
+
+    try:
+        limit = int(request.query.limit or SEARCH_DEFAULT_LIMIT)
+    except ValueError:
+        response.status = 400
+        return 'The limit must be an integer'
+
+    start = time.perf_counter()
+    hits = INDEX.search(request.query.q, limit=min(max(1, limit), SEARCH_MAX_LIMIT))
+
+    return {'hits': hits, 'milliseconds': (time.perf_counter() - start) * 1000}
+
 # Load a article
 @get('/<article_id>')
 def article(article_id):
@@ -94,16 +156,16 @@ def wpd(article_id, figure):
     else:
         print(f'Failed to open file {file_path}')
 
-# Load identified information
+# Load identified information, streamed from the identify output
 @get('/<article_id>/identified/<index:int>')
 def identified(article_id, index):
-    return load_article_info(article_id)[index]
+    return ndjson.record(IDENTIFY_PATHS[article_id], index)
 
 # Load the number of identified info, the number of pieces of info identified
 # for the article
 @get('/<article_id>/identified')
 def identified_count(article_id):
-    return {'length': len(load_article_info(article_id))}
+    return {'length': ndjson.count(IDENTIFY_PATHS[article_id])}
 
 # Returns (or creates) the stored information for the given article
 def init_info_store(article_id):
@@ -151,7 +213,7 @@ def update_info(article_id, uuid):
         # Update the info with the form data
         info['title'] = request.forms.get('title')
         info['data'] = request.forms.get('data')
-        info['timestamp'] = request.forms.get('timestamp')
+        info['stamp'] = request.forms.get('stamp')
 
         if (sample := request.forms.get('sample')).strip() != '':
             info['sample'] = int(sample)
@@ -179,12 +241,12 @@ def info_count(article_id):
 # Load article data (metadata)
 @get('/<article_id>/metadata/<data>')
 def metadata(article_id, data):
-    return load_article(article_id)['metadata'][data]
+    return load_record(article_id, 'metadata', None)[data]
 
 # Load article data
 @get('/<article_id>/<kind>/<index:int>')
 def data(article_id, kind, index):
-    return load_article(article_id)[kind][index]
+    return load_record(article_id, kind, index)
 
 # Load static files
 @get('/res/<path:path>')
@@ -220,6 +282,20 @@ if __name__ == '__main__':
         print('Failed to load extract results, are you sure you have ran the `extract.py` script?')
         exit(-1)
 
+    # Open the corpus store, if written by `extract.py sqlite`
+    if os.path.isfile(CORPUS_FILE):
+        try:
+            CORPUS = corpus.Store(CORPUS_FILE)
+        except ValueError as error:
+            print(f'{error}, the extract output is used instead')
+
+    # Open the full-text index, if written by `extract.py index`
+    if os.path.isfile(INDEX_FILE):
+        try:
+            INDEX = text_index.Index(INDEX_FILE)
+        except ValueError as error:
+            print(f'{error}, run `extract.py index` again to enable search')
+
     # Load the identify results
     if os.path.isfile(IDENTIFY_FILE) and (file := open(IDENTIFY_FILE)):
         IDENTIFY_PATHS = json.load(file)
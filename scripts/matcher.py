@@ -0,0 +1,169 @@
+'''
+A multi-pattern matcher scanning a text once for many regex patterns, used by
+`identify.py` to run all filters targeting a text in a single pass.
+
+Patterns consisting of literal alternatives, optionally enclosed in word
+boundaries (such as 'soil|soils|Clay' or '\\bARG\\b|\\bARGs\\b'), are the
+common case for filters. Their keywords are combined into one prefix trie,
+compiled into a single regex, which finds keyword occurrences in one pass with
+a cost independent of the number of keywords. Each occurrence is then
+dispatched to the patterns containing the keyword. Other patterns are scanned
+separately with their own regex.
+
+The matches of each pattern are the same as those of `finditer`, meaning
+non-overlapping and, at each position, the first alternative of the pattern
+that matches.
+'''
+
+import re
+
+# The regex metacharacters, a pattern alternative containing any of them (except
+# for enclosing word boundaries) is not a literal keyword
+METACHARACTERS = set('\\.^$*+?{}[]|()')
+
+# The flags which are allowed for patterns combined into the trie
+TRIE_FLAGS = re.IGNORECASE | re.UNICODE
+
+# Matches a single word character, used to check word boundaries
+WORD_CHAR_REGEX = re.compile(r'\w')
+
+# Splits a pattern into its literal alternatives. Returns a list of
+# (keyword, start boundary, end boundary) tuples, or None if the pattern is not
+# an alternation of literals
+def literal_alternatives(regex):
+    if regex.flags & ~TRIE_FLAGS:
+        return None
+
+    alternatives = []
+    for part in regex.pattern.split('|'):
+        start = part.startswith('\\b')
+        end = part.endswith('\\b') and not part.endswith('\\\\b')
+        keyword = part[2 if start else 0:len(part) - 2 if end else len(part)]
+
+        if keyword == '' or any(c in METACHARACTERS for c in keyword):
+            return None
+
+        if regex.flags & re.IGNORECASE:
+            keyword = keyword.lower()
+        alternatives.append((keyword, start, end))
+
+    return alternatives
+
+# Compiles a set of keywords into a regex shaped like a prefix trie, such that
+# a match at a position is the longest keyword starting there
+def trie_regex(keywords):
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for c in keyword:
+            node = node.setdefault(c, {})
+        node[None] = None
+
+    def build(node):
+        branches = [re.escape(c) + build(child) for c, child in sorted(node.items(), key=str)
+                    if c is not None]
+        if len(branches) == 0:
+            return ''
+
+        body = branches[0] if len(branches) == 1 else f'(?:{"|".join(branches)})'
+        if None in node:
+            return body + '?' if len(branches) == 1 and len(branches[0]) == 1 else f'(?:{body})?'
+
+        return body
+
+    return re.compile(build(trie))
+
+class Matcher:
+    # Creates a matcher for the given patterns, a dict of any keys to compiled
+    # regexes
+    def __init__(self, patterns):
+        self.keys = list(patterns)
+        self.separate = {}
+
+        # Keyword to [(key, alternative index, start boundary, end boundary)],
+        # one table for case sensitive and one for case insensitive patterns
+        self.keywords = [{}, {}]
+        for key, regex in patterns.items():
+            alternatives = literal_alternatives(regex)
+            if alternatives is None:
+                self.separate[key] = regex
+                continue
+
+            table = self.keywords[1 if regex.flags & re.IGNORECASE else 0]
+            for i, (keyword, start, end) in enumerate(alternatives):
+                table.setdefault(keyword, []).append((key, i, start, end))
+
+        self.tries = [trie_regex(table) if 0 < len(table) else None for table in self.keywords]
+
+    # Returns True if there is a word boundary at the given position
+    @staticmethod
+    def boundary(text, position):
+        before = 0 < position and WORD_CHAR_REGEX.match(text, position - 1) is not None
+        after = position < len(text) and WORD_CHAR_REGEX.match(text, position) is not None
+        return before != after
+
+    # Returns the matches of each pattern in the text, as a dict of keys to
+    # lists of (start, end, matched text) tuples
+    def scan(self, text):
+        matches = {key: [] for key in self.keys}
+
+        for key, regex in self.separate.items():
+            matches[key] = [(*match.span(), match.group()) for match in regex.finditer(text)]
+
+        for table, trie, case_insensitive in zip(self.keywords, self.tries, [False, True]):
+            if trie is None:
+                continue
+
+            searched = text
+            if case_insensitive:
+                searched = text.lower()
+
+                # Lowercasing may change the length of some characters, the
+                # offsets are then not valid for the original text
+                if len(searched) != len(text):
+                    for key in {key for entries in table.values() for (key, _, _, _) in entries}:
+                        regex = re.compile('|'.join(self.alternative_patterns(table, key)), re.IGNORECASE)
+                        matches[key] = [(*match.span(), match.group()) for match in regex.finditer(text)]
+                    continue
+
+            self.scan_trie(text, searched, table, trie, matches)
+
+        return matches
+
+    # Reconstructs the regex alternatives of a pattern from the keyword table
+    @staticmethod
+    def alternative_patterns(table, key):
+        alternatives = sorted((i, keyword, start, end) for keyword, entries in table.items()
+                              for (entry_key, i, start, end) in entries if entry_key == key)
+        return [('\\b' if start else '') + re.escape(keyword) + ('\\b' if end else '')
+                for (_, keyword, start, end) in alternatives]
+
+    def scan_trie(self, text, searched, table, trie, matches):
+        # The end of the previous match of each pattern, matches may not overlap
+        previous_ends = {}
+
+        position = 0
+        while (match := trie.search(searched, position)) is not None:
+            start = match.start()
+
+            # All keywords starting at this position are prefixes of the
+            # longest one. For each pattern we keep the first alternative
+            best = {}
+            for end in range(start + 1, match.end() + 1):
+                for (key, i, start_boundary, end_boundary) in table.get(searched[start:end], []):
+                    if (start_boundary and not Matcher.boundary(text, start)) or \
+                       (end_boundary and not Matcher.boundary(text, end)):
+                        continue
+
+                    if previous_ends.get(key, 0) <= start and (key not in best or i < best[key][0]):
+                        best[key] = (i, end)
+
+            for key, (_, end) in best.items():
+                matches[key].append((start, end, text[start:end]))
+                previous_ends[key] = end
+
+            # Keywords of other patterns may start within this match
+            position = start + 1
+
+        # Matches were found in order of position for each pattern
+        return matches
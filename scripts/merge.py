@@ -0,0 +1,114 @@
+'''
+Merging of the information identified by `identify.py` with the information
+reviewed in `interface.py` (or `native_interface.py`), used by `aggregate.py`
+when the `merge` keyword is passed.
+
+Identified information has a deterministic id, see `identify.py`, and reviewed
+information stored from identified information keeps that id as its 'origin'.
+A reviewed piece of information is merged with the identified piece of the
+same id field by field, according to `PRECEDENCE`
+
+'interface': The reviewed value is used, if given,
+'identify': The identified value is used, if given,
+'newest': The value of the piece with the newest stamp is used.
+
+Identified information without a reviewed counterpart is kept if the article
+was never reviewed, or if it was identified after the last review of the
+article and no reviewed information of the article has the same title. The
+stamp of identified information is that of the run first identifying it,
+kept while the filter result is cached by `identify.py`, meaning rerunning
+identify does not bring back information the reviewer chose not to store,
+while filters added or changed after a review contribute.
+
+The reviewed information is ordered after the identified information, such
+that it takes precedence when `aggregate.py` picks the latest piece of
+information of each sample and title.
+'''
+
+from datetime import datetime
+
+# The precedence rule of each field, fields without a rule use 'newest'
+PRECEDENCE = {
+    'title': 'interface',
+    'data': 'interface',
+    'sample': 'interface',
+    'expanding': 'interface',
+    'source': 'interface',
+    'uuid': 'interface',
+    'origin': 'interface',
+    'description': 'identify',
+}
+
+# The rule of fields not in `PRECEDENCE`
+DEFAULT_PRECEDENCE = 'newest'
+
+# Parses a stamp, either the local time of `identify.py` or the UTC time of
+# `interface.py`. Returns None if missing or invalid, such as after a manual
+# edit in the interface
+def parse_stamp(stamp):
+    try:
+        parsed = datetime.fromisoformat(stamp)
+    except (TypeError, ValueError):
+        return None
+
+    # Stamps without a timezone are in local time
+    return parsed.astimezone() if parsed.tzinfo is None else parsed
+
+# Returns True if the first stamp is newer than the second, a missing stamp is
+# older than any other
+def newer(first, second):
+    if first is None or second is None:
+        return first is not None
+
+    return second < first
+
+# Merges a reviewed piece of information with the identified piece it was
+# stored from, field by field
+def merge_information(identified, reviewed):
+    reviewed_newer = newer(parse_stamp(reviewed.get('stamp')), parse_stamp(identified.get('stamp')))
+
+    merged = {}
+    for key in list(identified) + [key for key in reviewed if key not in identified]:
+        rule = PRECEDENCE.get(key, DEFAULT_PRECEDENCE)
+        if key not in reviewed:
+            merged[key] = identified[key]
+        elif key not in identified:
+            merged[key] = reviewed[key]
+        elif rule == 'interface' or (rule == 'newest' and reviewed_newer):
+            merged[key] = reviewed[key]
+        else:
+            merged[key] = identified[key]
+
+    return merged
+
+# Merges the identified and reviewed information of an article, either of
+# which may be None if the article was not identified or not reviewed
+def merge(identified, reviewed):
+    identified = list(identified or [])
+    if reviewed is None:
+        return identified
+    reviewed = list(reviewed)
+
+    by_id = {info['uuid']: info for info in identified}
+
+    # The time of the last review and the titles stored by the reviewer
+    last_review = None
+    reviewed_titles = set()
+    for info in reviewed:
+        if newer(stamp := parse_stamp(info.get('stamp')), last_review):
+            last_review = stamp
+        reviewed_titles.add(info['title'])
+
+    merged_reviewed, merged_ids = [], set()
+    for info in reviewed:
+        origin = info.get('origin')
+        if origin in by_id:
+            merged_reviewed.append(merge_information(by_id[origin], info))
+            merged_ids.add(origin)
+        else:
+            merged_reviewed.append(info)
+
+    kept = [info for info in identified if info['uuid'] not in merged_ids and info['title'] not in reviewed_titles
+            and newer(parse_stamp(info.get('stamp')), last_review)]
+
+    return kept + merged_reviewed
@@ -16,6 +16,7 @@ from PIL import Image
 import customtkinter as ctk
 import shutil
 import json
+import ndjson
 import os
 import uuid
 
@@ -508,8 +509,8 @@ class InformationBox(ctk.CTkFrame):
             print(f'Failed to load unrecognized article identification data {id}, skipping')
             return
 
-        if file := open(path):
-            self.identified_information = json.load(file)
+        if os.path.isfile(path):
+            self.identified_information = list(ndjson.read(path))
 
             # Load the first piece of information
             self.information_index = None
@@ -541,6 +542,11 @@ class InformationBox(ctk.CTkFrame):
         self.current_info['stamp'] = datetime.now().isoformat()
         self.current_info['title'] = self.var_result_title.get()
         self.current_info['data'] = self.result_textbox.get('1.0', ctk.END).strip()
+
+        # Keep the id of the identified information the info was stored from,
+        # used to merge with later identify runs
+        if 'uuid' in self.current_info and 'origin' not in self.current_info:
+            self.current_info['origin'] = self.current_info['uuid']
         self.current_info['uuid'] = str(uuid.uuid4())
 
         if self.current_info['sample'] is not None:
@@ -0,0 +1,119 @@
+'''
+Streaming reading and writing of the per-article information written by
+`identify.py`, as newline delimited JSON.
+
+The first line of a file is a header holding the run timestamp and the
+description of each filter
+
+{"stamp": The time of the identify run, "descriptions": {filter title: description}}
+
+followed by one piece of information per line, without its 'description' and
+without its 'stamp' if equal to that of the run, which are instead restored
+from the header when reading. Information reused from an earlier run keeps its
+own stamp on its line. Files
+can therefore be written as information is identified, and read one piece of
+information at a time.
+
+Single pieces of information are read by seeking to their line, using an index
+of the line offsets of each file built on first access and rebuilt when the
+file is modified.
+
+Reading also accepts the JSON arrays of full pieces of information written by
+`interface.py` (and earlier versions of `identify.py`), based on the file
+extension.
+'''
+
+from array import array
+import itertools
+import json
+import os
+
+# The keys of each piece of information which are stored in the header
+INTERNED_KEYS = ['stamp', 'description']
+
+# The line offset index of each read file, path to ((modification time, size),
+# header, offsets)
+LINE_OFFSETS = {}
+
+class Writer:
+    def __init__(self, path, stamp, descriptions):
+        self.file = open(path, 'w+')
+        self.stamp = stamp
+        self.file.write(json.dumps({'stamp': stamp, 'descriptions': descriptions}) + '\n')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    # Writes a piece of information, a stamp other than that of the run is
+    # kept on its line
+    def write(self, info):
+        self.file.write(json.dumps({key: value for (key, value) in info.items()
+                                    if key not in INTERNED_KEYS or (key == 'stamp' and value != self.stamp)}) + '\n')
+
+    def close(self):
+        self.file.close()
+
+# Reads the pieces of information of the file one at a time, with their stamp
+# and description restored
+def read(path):
+    if not path.endswith('.ndjson'):
+        with open(path) as file:
+            yield from json.load(file)
+        return
+
+    with open(path) as file:
+        header = json.loads(file.readline())
+        for line in file:
+            yield restore(json.loads(line), header)
+
+# Restores the stamp and description of a piece of information from the header
+def restore(info, header):
+    info.setdefault('stamp', header['stamp'])
+    info['description'] = header['descriptions'].get(info['title'])
+    return info
+
+# Returns the header and the byte offset of every information line of the
+# file, reusing the index of earlier calls unless the file was modified
+def line_offsets(path):
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    if path in LINE_OFFSETS and LINE_OFFSETS[path][0] == version:
+        return LINE_OFFSETS[path][1:]
+
+    offsets = array('Q')
+    with open(path, 'rb') as file:
+        header = json.loads(file.readline())
+        offset = file.tell()
+        for line in file:
+            offsets.append(offset)
+            offset += len(line)
+
+    LINE_OFFSETS[path] = (version, header, offsets)
+    return (header, offsets)
+
+# Reads a single piece of information, seeking directly to its line. Raises an
+# IndexError if there is no such piece of information
+def record(path, index):
+    if not path.endswith('.ndjson'):
+        if (info := next(itertools.islice(read(path), index, None), None)) is None:
+            raise IndexError(f'information index {index} out of range')
+        return info
+
+    header, offsets = line_offsets(path)
+    if not 0 <= index < len(offsets):
+        raise IndexError(f'information index {index} out of range')
+
+    with open(path, 'rb') as file:
+        file.seek(offsets[index])
+        return restore(json.loads(file.readline()), header)
+
+# Counts the pieces of information of the file without parsing them
+def count(path):
+    if not path.endswith('.ndjson'):
+        with open(path) as file:
+            return len(json.load(file))
+
+    return len(line_offsets(path)[1])
@@ -0,0 +1,140 @@
+'''
+A compact, indexed container format for articles extracted by `extract.py`.
+
+A pack file stores the same information as the per-article JSON export but
+splits it into individually addressable records. The file starts with a fixed
+size header followed by an offset table, which allows any single section,
+figure or table to be read in constant time by memory mapping the file instead
+of parsing the entire article.
+
+The layout of a pack file is the following (all integers little-endian)
+
+header: magic (4 bytes), version (u16), reserved (u16), section count (u32),
+        figure count (u32), table count (u32)
+table:  one (offset, length) pair (u64, u64) per record, in the order
+        metadata, section order, sections, figures and tables
+data:   the records themselves, each a UTF-8 encoded JSON document
+'''
+
+import json
+import mmap
+import os
+import spool
+import struct
+
+# The magic bytes identifying a pack file
+MAGIC = b'EXPK'
+
+# The current version of the format
+VERSION = 1
+
+# The struct formats of the header and of a single offset table entry
+HEADER_FORMAT = struct.Struct('<4sHHIII')
+ENTRY_FORMAT = struct.Struct('<QQ')
+
+# The record kinds stored in the container, in offset table order
+KINDS = ['sections', 'figures', 'tables']
+
+# Writes the given article (as returned by `extract.py`) to a pack file. The
+# records are written one at a time, streaming spooled section content, and
+# the offset table is filled in afterwards
+def write(path, article):
+    records = [article['metadata'], article['section_order']]
+    for kind in KINDS:
+        records.extend(article[kind])
+
+    with open(path, 'wb') as file:
+        file.write(HEADER_FORMAT.pack(MAGIC, VERSION, 0, len(article['sections']),
+                                      len(article['figures']), len(article['tables'])))
+
+        # Reserve the offset table, the data starts directly after it
+        table_offset = file.tell()
+        file.write(bytes(ENTRY_FORMAT.size * len(records)))
+
+        entries = []
+        for record in records:
+            offset = file.tell()
+            spool.dump(record, lambda text: file.write(text.encode()))
+            entries.append(ENTRY_FORMAT.pack(offset, file.tell() - offset))
+
+        file.seek(table_offset)
+        file.write(b''.join(entries))
+
+# A memory mapped reader of a pack file
+class Reader:
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, _, *counts = HEADER_FORMAT.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f'{path} is not a version {VERSION} pack file')
+
+        self.counts = dict(zip(KINDS, counts))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        if not self.map.closed:
+            self.map.close()
+        self.file.close()
+
+    # Reads the record with the given index in the offset table
+    def read(self, entry):
+        offset, length = ENTRY_FORMAT.unpack_from(self.map, HEADER_FORMAT.size + ENTRY_FORMAT.size * entry)
+        return json.loads(self.map[offset:offset + length])
+
+    # The number of records of the given kind ('sections', 'figures' or 'tables')
+    def count(self, kind):
+        return self.counts[kind]
+
+    # Reads a single section, figure or table
+    def record(self, kind, index):
+        if not (0 <= index < self.counts[kind]):
+            raise IndexError(f'{kind} index {index} out of range')
+
+        # Skip the metadata and section order entries, followed by all
+        # entries of the preceding kinds
+        entry = 2 + index
+        for previous in KINDS[:KINDS.index(kind)]:
+            entry += self.counts[previous]
+
+        return self.read(entry)
+
+    def metadata(self):
+        return self.read(0)
+
+    def section_order(self):
+        return self.read(1)
+
+    # Reads the entire article, equal to the JSON export
+    def to_dict(self):
+        article = {kind: [self.record(kind, i) for i in range(self.counts[kind])] for kind in KINDS}
+        article['section_order'] = self.section_order()
+        article['metadata'] = self.metadata()
+
+        return article
+
+# Returns True if the pack file exists and was written from the current JSON
+# export of the article, which `extract.py` writes right before the pack file.
+# A JSON export written after the pack file, such as by extracting again
+# without the 'pack' argument, makes the pack file stale
+def fresh(path, json_path):
+    try:
+        return os.stat(json_path).st_mtime_ns <= os.stat(path).st_mtime_ns
+    except OSError:
+        return False
+
+# Loads an entire article from either a pack file or a JSON export
+def load(path):
+    if path.endswith('.pack'):
+        with Reader(path) as reader:
+            return reader.to_dict()
+
+    with open(path) as file:
+        return json.load(file)
@@ -0,0 +1,116 @@
+'''
+Per-article phase timers and counters, used by `extract.py` to find where the
+extraction time is spent.
+
+Phases are timed exclusively, meaning the time of a nested phase is not also
+counted towards the phase enclosing it. The phase times of an article
+therefore sum up to (at most) the total time of the article. Time spent outside
+of any phase is reported as 'other'.
+'''
+
+from contextlib import contextmanager
+import json
+import time
+
+class Profiler:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.articles = []
+        self.current = None
+        self.current_start = None
+
+        # The stack of [phase name, start time] of currently running phases
+        self.stack = []
+
+    # Starts profiling a new article
+    def start(self, name):
+        if not self.enabled:
+            return
+
+        self.current = {'name': name, 'seconds': 0, 'phases': {}, 'counters': {}}
+        self.current_start = time.perf_counter()
+        self.stack = []
+
+    # Continues profiling an article which was finished elsewhere, such as
+    # in a worker process
+    def resume(self, article):
+        if not self.enabled:
+            return
+
+        del article['phases']['other']
+        self.current = article
+        self.current_start = time.perf_counter() - article['seconds']
+        self.stack = []
+
+    # Stops profiling the current article
+    def finish(self):
+        if not self.enabled or self.current is None:
+            return
+
+        self.current['seconds'] = time.perf_counter() - self.current_start
+        other = self.current['seconds'] - sum(self.current['phases'].values())
+        self.current['phases']['other'] = max(0, other)
+
+        self.articles.append(self.current)
+        self.current = None
+
+    # Adds the time since the last start of the innermost phase to it
+    def pause(self, now):
+        name, start = self.stack[-1]
+        self.current['phases'][name] = self.current['phases'].get(name, 0) + now - start
+
+    # Times the enclosed code as the given phase
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled or self.current is None:
+            yield
+            return
+
+        now = time.perf_counter()
+        if 0 < len(self.stack):
+            self.pause(now)
+        self.stack.append([name, now])
+
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self.pause(now)
+            self.stack.pop()
+
+            # Resume the enclosing phase
+            if 0 < len(self.stack):
+                self.stack[-1][1] = now
+
+    # Increments the given counter of the current article
+    def count(self, name, amount=1):
+        if not self.enabled or self.current is None:
+            return
+
+        self.current['counters'][name] = self.current['counters'].get(name, 0) + amount
+
+    # Summarizes all profiled articles, with the total time of each phase and
+    # the `top` slowest articles with their phase breakdowns
+    def report(self, top):
+        phases = {}
+        counters = {}
+        for article in self.articles:
+            for name, seconds in article['phases'].items():
+                phases[name] = phases.get(name, 0) + seconds
+            for name, amount in article['counters'].items():
+                counters[name] = counters.get(name, 0) + amount
+
+        return {
+            'articles': len(self.articles),
+            'seconds': sum(article['seconds'] for article in self.articles),
+            'phases': dict(sorted(phases.items(), key=lambda item: -item[1])),
+            'counters': counters,
+            'slowest': sorted(self.articles, key=lambda article: -article['seconds'])[:top],
+        }
+
+    def write(self, path, top):
+        if file := open(path, 'w+'):
+            json.dump(self.report(top), file, indent=2)
+        else:
+            print(f'Failed to open file {path}')
+            exit(-1)
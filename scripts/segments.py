@@ -0,0 +1,84 @@
+'''
+Sentence and paragraph boundaries of article text together with the sample
+mentions within it, used by `identify.py` to assign identified information to
+samples.
+
+The index of a text is a dict of sorted offset arrays
+
+'sentences': The start offset of each sentence,
+'paragraphs': The start offset of each paragraph,
+'mentions': The start offset of each sample mention,
+'labels': The sample label of each mention, such as 'site A' or 'sample 3'.
+
+A position is attributed to a sample if its sentence mentions exactly one
+sample, or otherwise if its sentence mentions none and its paragraph mentions
+exactly one. Any other position is ambiguous.
+'''
+
+import bisect
+import re
+
+# Matches the end of a sentence, punctuation followed by whitespace and the
+# (possibly quoted or parenthesised) start of the next sentence
+SENTENCE_BOUNDARY_REGEX = re.compile(r'[.!?][")\]]*\s+(?=["(\[]?[A-Z0-9])')
+
+# Matches the blank lines between paragraphs
+PARAGRAPH_BOUNDARY_REGEX = re.compile(r'\n\s*\n')
+
+# Matches a labelled sample, such as 'site A', 'Sample 3', 'station B2' or
+# 'plot no. 4'. Only the noun is case-insensitive, to avoid labels such as 'in'
+MENTION_REGEX = re.compile(r'\b((?i:site|sample|station|location|plot|farm|pond|well|lake|river))s?\s+'
+                           r'(?:(?i:no)\.\s*)?([A-Z]{1,2}[0-9]{0,2}|[0-9]{1,3})\b')
+
+# Matches a named sampling location, such as 'collected from Lake Victoria'.
+# Month names are excluded as they usually give the sampling date
+LOCATION_REGEX = re.compile(r'\b(?:collected|sampled|obtained|taken)\s+(?:from|at|in)\s+(?:the\s+)?'
+                            r'(?!(?:January|February|March|April|May|June|July|August|September|'
+                            r'October|November|December)\b)([A-Z][a-z]+(?:\s+[A-Z][a-z]+){0,2})')
+
+# Returns the boundaries of the segments separated by the regex matches
+def segment_starts(regex, text):
+    return [0] + [match.end() for match in regex.finditer(text)]
+
+# Returns the (start, label) of each sample mention in the text, sorted by
+# position
+def detect_mentions(text):
+    mentions = [(match.start(), f'{match.group(1).lower()} {match.group(2)}')
+                for match in MENTION_REGEX.finditer(text)]
+    mentions.extend((match.start(1), match.group(1)) for match in LOCATION_REGEX.finditer(text))
+
+    return sorted(mentions)
+
+# Builds the sentence, paragraph and mention index of the text
+def index(text):
+    mentions = detect_mentions(text)
+    return {
+        'sentences': segment_starts(SENTENCE_BOUNDARY_REGEX, text),
+        'paragraphs': segment_starts(PARAGRAPH_BOUNDARY_REGEX, text),
+        'mentions': [start for (start, _) in mentions],
+        'labels': [label for (_, label) in mentions],
+    }
+
+# Returns the distinct labels mentioned in the segment containing the position
+def segment_labels(text_index, kind, position):
+    starts = text_index[kind]
+    i = bisect.bisect_right(starts, position) - 1
+    start = starts[max(i, 0)]
+    end = starts[i + 1] if i + 1 < len(starts) else None
+
+    first = bisect.bisect_left(text_index['mentions'], start)
+    last = len(text_index['mentions']) if end is None else bisect.bisect_left(text_index['mentions'], end)
+
+    return set(text_index['labels'][first:last])
+
+# Returns the label of the sample the position is attributed to, or None if
+# ambiguous
+def sample_at(text_index, position):
+    for kind in ['sentences', 'paragraphs']:
+        labels = segment_labels(text_index, kind, position)
+        if len(labels) == 1:
+            return labels.pop()
+        elif 1 < len(labels):
+            return None
+
+    return None
@@ -0,0 +1,213 @@
+'''
+Local semantic matching of sentences against natural language prompts, used
+by the 'semantic' filters of `identify.py`. No network access or model
+download is needed.
+
+Sentences are embedded as TF-IDF vectors over hashed word unigrams and
+bigrams. The inverse document frequency is fitted once, over the sentences of
+a sample of the corpus (see `Encoder.fit`), and persisted, such that every
+sentence is weighted the same regardless of the texts it is ranked with or the
+run it was encoded in. Deleting the store fits it again.
+
+The final vectors of each text are kept in a single SQLite store together with
+the IDF, keyed by a hash of the text, as sparse (sentence, term, weight)
+triplets normalized to unit length. When ranking, the triplets of all texts
+targeted by a filter are stacked and compared to the prompts by cosine
+similarity, with vectorised sums over the nonzero terms only.
+'''
+
+import hashlib
+import numpy as np
+import re
+import sqlite3
+import zlib
+
+# The number of hashed term dimensions
+DIMENSIONS = 2 ** 12
+
+# The version of the embedding, stored as the SQLite `user_version`. Stores of
+# other versions are emptied
+VERSION = 2
+
+# The schema of the store, the arrays are stored as raw bytes
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS idf (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    sentences INTEGER NOT NULL,
+    weights BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS vectors (
+    key TEXT PRIMARY KEY,
+    spans BLOB NOT NULL,
+    sentences BLOB NOT NULL,
+    terms BLOB NOT NULL,
+    weights BLOB NOT NULL
+);
+'''
+
+# The types of the stored arrays
+SPAN_TYPE = np.dtype('<i8')
+SENTENCE_TYPE = np.dtype('<i4')
+TERM_TYPE = np.dtype('<i4')
+WEIGHT_TYPE = np.dtype('<f4')
+
+# The seconds to wait for other processes writing to the store
+STORE_TIMEOUT = 60
+
+# Splits text into sentences, a sentence ends with a period, question mark or
+# exclamation mark followed by whitespace
+SENTENCE_REGEX = re.compile(r'[^\s].*?(?:[.!?](?=\s)|$)', re.DOTALL)
+
+# Matches a single word
+WORD_REGEX = re.compile(r'\w+')
+
+# Common words which carry no meaning for matching
+STOP_WORDS = set('''a an and are as at be been by for from had has have in is it its of on or that the
+their then there these this to was were which with we our'''.split())
+
+# Returns the hashed term of each unigram and bigram of the sentence. The CRC
+# is used as the builtin hash is randomized per process
+def terms(sentence):
+    words = [word for word in WORD_REGEX.findall(sentence.lower()) if word not in STOP_WORDS]
+    grams = words + [f'{first} {second}' for first, second in zip(words, words[1:])]
+    return [zlib.crc32(gram.encode('utf-8')) % DIMENSIONS for gram in grams]
+
+# Returns the distinct terms and their counts of the sentence
+def term_counts(sentence):
+    return np.unique(np.array(terms(sentence), dtype=TERM_TYPE), return_counts=True)
+
+# Returns the unit length sublinear TF-IDF weights of the term counts
+def normalize(counts, idf):
+    weights = np.log1p(counts) * idf
+    norm = np.linalg.norm(weights)
+    return weights / (norm if 0 < norm else 1)
+
+class Encoder:
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path, timeout=STORE_TIMEOUT)
+        with self.connection:
+            self.connection.execute('BEGIN IMMEDIATE')
+            if self.connection.execute('PRAGMA user_version').fetchone()[0] != VERSION:
+                self.connection.execute('DROP TABLE IF EXISTS idf')
+                self.connection.execute('DROP TABLE IF EXISTS vectors')
+                self.connection.execute(f'PRAGMA user_version = {VERSION}')
+            for statement in SCHEMA.split(';'):
+                self.connection.execute(statement)
+
+        # The persisted IDF, loaded when first needed
+        self.idf = None
+
+        # Encoded texts of this process, keyed by text hash
+        self.encoded = {}
+
+    def close(self):
+        self.connection.close()
+
+    # Returns True if the IDF is fitted
+    def fitted(self):
+        return self.load_idf() is not None
+
+    # Returns the persisted IDF, or None if not fitted yet
+    def load_idf(self):
+        if self.idf is None:
+            row = self.connection.execute('SELECT weights FROM idf WHERE id = 0').fetchone()
+            if row is not None:
+                self.idf = np.frombuffer(row[0], dtype=WEIGHT_TYPE)
+
+        return self.idf
+
+    # Fits the IDF over the sentences of the given texts and persists it, each
+    # term occurring once per sentence. An IDF fitted before, possibly by
+    # another process, is kept
+    def fit(self, texts):
+        sentences = 0
+        document_frequency = np.zeros(DIMENSIONS, dtype=np.int64)
+        for text in texts:
+            for match in SENTENCE_REGEX.finditer(text):
+                sentences += 1
+                document_frequency[term_counts(match.group())[0]] += 1
+
+        # The smoothed IDF, unseen terms have the highest weight
+        idf = (np.log((1 + sentences) / (1 + document_frequency)) + 1).astype(WEIGHT_TYPE)
+        with self.connection:
+            self.connection.execute('INSERT OR IGNORE INTO idf VALUES (0, ?, ?)', (sentences, idf.tobytes()))
+
+        return self.load_idf()
+
+    # Returns the sentence spans and the sparse unit length vectors, as
+    # (sentence, term, weight) arrays, of the text. Loaded from the store if
+    # available, otherwise stored without committing
+    def encode(self, text):
+        key = hashlib.sha1(f'{VERSION} {DIMENSIONS} {text}'.encode('utf-8')).hexdigest()
+        if key in self.encoded:
+            return self.encoded[key]
+
+        row = self.connection.execute('SELECT spans, sentences, terms, weights FROM vectors WHERE key = ?',
+                                      (key,)).fetchone()
+        if row is not None:
+            encoded = tuple(np.frombuffer(data, dtype=type) for (data, type) in
+                            zip(row, [SPAN_TYPE, SENTENCE_TYPE, TERM_TYPE, WEIGHT_TYPE]))
+            encoded = (encoded[0].reshape(-1, 2), *encoded[1:])
+        else:
+            idf = self.load_idf()
+            spans, sentences, term_ids, weights = [], [], [], []
+            for i, match in enumerate(SENTENCE_REGEX.finditer(text)):
+                spans.append(match.span())
+
+                sentence_terms, sentence_counts = term_counts(match.group())
+                sentences.extend([i] * len(sentence_terms))
+                term_ids.extend(sentence_terms)
+                weights.extend(normalize(sentence_counts, idf[sentence_terms]))
+
+            encoded = (np.array(spans, dtype=SPAN_TYPE).reshape(-1, 2), np.array(sentences, dtype=SENTENCE_TYPE),
+                       np.array(term_ids, dtype=TERM_TYPE), np.array(weights, dtype=WEIGHT_TYPE))
+
+            # Parallel workers may encode the same text, which gives the same
+            # vectors
+            self.connection.execute('INSERT OR REPLACE INTO vectors VALUES (?, ?, ?, ?, ?)',
+                                    (key, *(array.tobytes() for array in encoded)))
+
+        self.encoded[key] = encoded
+        return encoded
+
+    # Ranks the sentences of each text by their highest cosine similarity to
+    # any of the prompts. Returns, for each text, the (start, end, sentence)
+    # of the `top` most similar sentences scoring at least the threshold, in
+    # order of position. The IDF is fitted over the texts if not fitted yet
+    def rank(self, texts, prompts, threshold, top):
+        idf = self.load_idf()
+        if idf is None:
+            idf = self.fit(texts)
+
+        encoded = [self.encode(text) for text in texts]
+        self.connection.commit()
+
+        sentence_counts = [len(spans) for (spans, _, _, _) in encoded]
+        offsets = np.cumsum([0] + sentence_counts)
+
+        # Stack the sparse vectors of all sentences, with the row of each
+        # sentence in the batch
+        rows = np.concatenate([sentences + offset for (_, sentences, _, _), offset in zip(encoded, offsets)])
+        term_ids = np.concatenate([term_ids for (_, _, term_ids, _) in encoded])
+        weights = np.concatenate([weights for (_, _, _, weights) in encoded])
+
+        # The prompts are few, and are kept as dense rows
+        prompt_matrix = np.zeros((len(prompts), DIMENSIONS), dtype=np.float32)
+        for i, prompt in enumerate(prompts):
+            prompt_terms, prompt_counts = term_counts(prompt)
+            prompt_matrix[i, prompt_terms] = normalize(prompt_counts, idf[prompt_terms])
+
+        # The dot product of every sentence with every prompt, summed over the
+        # nonzero terms of the sentences
+        scores = np.stack([np.bincount(rows, weights=weights * prompt_matrix[i, term_ids], minlength=offsets[-1])
+                           for i in range(len(prompts))]).max(axis=0)
+
+        ranked = []
+        for text, (spans, _, _, _), start, end in zip(texts, encoded, offsets, offsets[1:]):
+            text_scores = scores[start:end]
+
+            best = np.argsort(-text_scores, kind='stable')[:top]
+            best = np.sort(best[text_scores[best] >= threshold])
+            ranked.append([(int(spans[i][0]), int(spans[i][1]), text[spans[i][0]:spans[i][1]]) for i in best])
+
+        return ranked
@@ -0,0 +1,170 @@
+'''
+Spooling of text to a temporary file, used by `extract.py` to accumulate the
+section content of PDFs without holding it in memory.
+
+Text is appended to numbered sections of a `Spool`, and each section is then
+exported as a `Text` value which is read back one fragment at a time. `dump`
+writes JSON in the same format as `json.dump`, streaming the `Text` values
+from their spool, meaning the content of an article is never held in memory
+at once. Consumers which need a section as a string, such as the SQLite store,
+can use `str` on it, holding only that section in memory.
+
+A spool can be sent to another process, such as from the worker processes of
+`extract.py`. The temporary file is then handed over by path, and is removed
+by the receiving process.
+'''
+
+import json
+import os
+import tempfile
+
+# The number of characters buffered before content is written to the file
+BUFFER_SIZE = 64 * 1024
+
+# The directory of the temporary files, the default temporary directory if
+# None
+DIRECTORY = None
+
+class Spool:
+    def __init__(self):
+        descriptor, self.path = tempfile.mkstemp(prefix='spool-', dir=DIRECTORY)
+        self.file = os.fdopen(descriptor, 'w+b')
+
+        # The (offset, length) fragments of each section
+        self.fragments = []
+
+        self.pending_section = None
+        self.pending = []
+        self.pending_size = 0
+
+    def __del__(self):
+        self.close()
+
+    # Hands the file over by path when sent to another process, see `attach`
+    def __reduce__(self):
+        self.flush()
+        self.file.flush()
+        path, self.path = self.path, None
+        return (attach, (path, self.fragments))
+
+    # Adds a new empty section, returns its index
+    def add_section(self):
+        self.fragments.append([])
+        return len(self.fragments) - 1
+
+    def append(self, section, text):
+        if section != self.pending_section:
+            self.flush()
+            self.pending_section = section
+
+        self.pending.append(text)
+        self.pending_size += len(text)
+        if BUFFER_SIZE < self.pending_size:
+            self.flush()
+
+    # Strips the whitespace around the current content of the section, by
+    # shortening or dropping its first and last fragments
+    def strip(self, section):
+        self.flush()
+
+        fragments = self.fragments[section]
+        while 0 < len(fragments):
+            offset, length = fragments[0]
+            if data := self.fragment(fragments[0]).lstrip().encode():
+                fragments[0] = (offset + length - len(data), len(data))
+                break
+            fragments.pop(0)
+
+        while 0 < len(fragments):
+            if data := self.fragment(fragments[-1]).rstrip().encode():
+                fragments[-1] = (fragments[-1][0], len(data))
+                break
+            fragments.pop()
+
+    # Writes the buffered text to the end of the file
+    def flush(self):
+        if 0 < len(self.pending):
+            data = ''.join(self.pending).encode()
+            self.file.seek(0, os.SEEK_END)
+            self.fragments[self.pending_section].append((self.file.tell(), len(data)))
+            self.file.write(data)
+
+        self.pending = []
+        self.pending_size = 0
+
+    # Reads a single fragment
+    def fragment(self, fragment):
+        self.file.seek(fragment[0])
+        return self.file.read(fragment[1]).decode()
+
+    # Yields the content of a section one fragment at a time
+    def chunks(self, section):
+        self.flush()
+        for fragment in self.fragments[section]:
+            yield self.fragment(fragment)
+
+    # Reads back the entire content of a section
+    def read(self, section):
+        return ''.join(self.chunks(section))
+
+    # Returns the content of a section as a `Text` value
+    def text(self, section):
+        return Text(self, section)
+
+    # Closes and removes the file, unless it was handed over
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+        if self.path is not None:
+            os.remove(self.path)
+            self.path = None
+
+# Opens a spool handed over by another process. The file is removed right
+# away, it stays readable for as long as it is open
+def attach(path, fragments):
+    spool = Spool.__new__(Spool)
+    spool.file = open(path, 'r+b')
+    spool.path = None
+    os.remove(path)
+
+    spool.fragments = fragments
+    spool.pending_section = None
+    spool.pending = []
+    spool.pending_size = 0
+    return spool
+
+# The content of a spooled section
+class Text:
+    def __init__(self, spool, section):
+        self.spool = spool
+        self.section = section
+
+    def __str__(self):
+        return self.spool.read(self.section)
+
+    def chunks(self):
+        return self.spool.chunks(self.section)
+
+# Writes the value as JSON using the given write function, with the same
+# output as `json.dump`. `Text` values are written one fragment at a time
+def dump(value, write):
+    if isinstance(value, Text):
+        write('"')
+        for chunk in value.chunks():
+            write(json.dumps(chunk)[1:-1])
+        write('"')
+    elif isinstance(value, dict):
+        write('{')
+        for i, (key, item) in enumerate(value.items()):
+            write(f'{", " if 0 < i else ""}{json.dumps(key)}: ')
+            dump(item, write)
+        write('}')
+    elif isinstance(value, (list, tuple)):
+        write('[')
+        for i, item in enumerate(value):
+            if 0 < i:
+                write(', ')
+            dump(item, write)
+        write(']')
+    else:
+        write(json.dumps(value))
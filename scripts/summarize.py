@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+
+'''
+A script that summarizes the output of `aggregate.py` into compact statistics
+tables, without loading the aggregated CSV into other tools.
+
+The expanded values of every sample, such as gene abundances, are grouped by
+field (gene) and unit together with the sample type, pollution and sampling
+year of their sample, and the following statistics are computed per group
+
+'count': The number of values,
+'articles': The number of articles the values come from,
+'mean', 'std': The mean and standard deviation,
+'min', 'q25', 'median', 'q75', 'max': The quantiles, linearly interpolated.
+
+Each table of `SUMMARIES` groups by a different set of columns and is written
+as `<name>.csv` to the export directory. The number of samples and articles
+per sample type and pollution is also written, as `sample_types.csv`. Samples
+missing a grouping value are grouped under 'NA'.
+
+The statistics are computed for all groups at once with NumPy, by sorting the
+values by group and value and reading the quantiles at the group offsets.
+
+The `--input` option gives the path of the `aggregate.py` samples JSON, by
+default that of the latest `aggregate.py` run.
+'''
+
+import csv
+import expansion
+import json
+import numpy as np
+import os
+import sys
+
+# The path of the aggregated samples
+SAMPLES_PATH = './output/aggregate/samples.json'
+
+# The export directory path
+EXPORT_DIRECTORY = './output/summarize'
+
+# The information titles the values are grouped by, in addition to the field
+# and unit
+GROUP_TITLES = ['sample type', 'polluted', 'sample year']
+
+# The grouping value of samples missing a title
+MISSING = 'NA'
+
+# The columns grouped by in each summary table
+SUMMARIES = {
+    'genes': ['field', 'unit'],
+    'genes_by_sample_type': ['field', 'unit', 'sample type'],
+    'genes_by_group': ['field', 'unit', 'sample type', 'polluted', 'sample year'],
+}
+
+# The quantiles of each summary table
+QUANTILES = {'min': 0.0, 'q25': 0.25, 'median': 0.5, 'q75': 0.75, 'max': 1.0}
+
+# Collects the numeric expanded values of all samples. Returns the columns of
+# the values, the string columns of `SUMMARIES` and 'article', and the values
+def collect_values(samples):
+    columns = {column: [] for column in ['article', 'field', 'unit'] + GROUP_TITLES}
+    values = []
+    for sample in samples:
+        groups = {title: MISSING if sample.get(title, {}).get('data') is None else str(sample[title]['data'])
+                  for title in GROUP_TITLES}
+
+        for (title, info) in sample.items():
+            if title == 'article' or title == 'sample number':
+                continue
+
+            if not info['expanding'] or info['data'] is None:
+                continue
+
+            names, _, numbers, _ = expansion.parse(info['data'])
+            numeric = ~np.isnan(numbers)
+            count = int(numeric.sum())
+
+            columns['article'].extend([sample['article']] * count)
+            columns['field'].extend(name for (name, is_numeric) in zip(names, numeric) if is_numeric)
+            columns['unit'].extend([info.get('unit') or MISSING] * count)
+            for title in GROUP_TITLES:
+                columns[title].extend([groups[title]] * count)
+            values.append(numbers[numeric])
+
+    values = np.concatenate(values) if 0 < len(values) else np.zeros(0)
+    return ({column: np.array(strings, dtype=object) for (column, strings) in columns.items()}, values)
+
+# Returns the group of each row, given the columns to group by. Returns the
+# distinct groups as a tuple of value arrays and the group index of each row
+def group_rows(columns):
+    codes, uniques = [], []
+    for column in columns:
+        unique, inverse = np.unique(column, return_inverse=True)
+        uniques.append(unique)
+        codes.append(inverse.reshape(-1))
+
+    groups, inverse = np.unique(np.stack(codes, axis=1), axis=0, return_inverse=True)
+    return (tuple(unique[groups[:, i]] for (i, unique) in enumerate(uniques)), inverse.reshape(-1))
+
+# Counts the distinct articles of each group
+def article_counts(inverse, group_count, articles):
+    _, article_codes = np.unique(articles, return_inverse=True)
+    pairs = np.unique(np.stack([inverse, article_codes.reshape(-1)], axis=1), axis=0)
+    return np.bincount(pairs[:, 0], minlength=group_count)
+
+# Computes the statistics of the values of each group. Returns a dict of
+# statistic arrays, one value per group
+def group_statistics(inverse, group_count, values, articles):
+    counts = np.bincount(inverse, minlength=group_count)
+    means = np.bincount(inverse, weights=values, minlength=group_count) / counts
+    variances = np.bincount(inverse, weights=(values - means[inverse]) ** 2, minlength=group_count) / counts
+
+    statistics = {
+        'count': counts,
+        'articles': article_counts(inverse, group_count, articles),
+        'mean': means,
+        'std': np.sqrt(variances),
+    }
+
+    # Sort by group and then by value, the values of each group are then a
+    # sorted slice starting at the group offset
+    sorted_values = values[np.lexsort((values, inverse))]
+    starts = np.cumsum(counts) - counts
+    for (name, quantile) in QUANTILES.items():
+        position = starts + quantile * (counts - 1)
+        low, high = np.floor(position).astype(np.int64), np.ceil(position).astype(np.int64)
+        statistics[name] = sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (position - low)
+
+    return statistics
+
+# Writes a summary table as CSV
+def write_table(path, headers, columns):
+    if file := open(path, 'w+'):
+        writer = csv.writer(file)
+        writer.writerow(headers)
+        writer.writerows(zip(*columns))
+    else:
+        print(f'Failed to open file {path}')
+        exit(-1)
+
+# Only run if non-library
+if __name__ == '__main__':
+    samples_path = SAMPLES_PATH
+    arguments = iter(sys.argv[1:])
+    for argument in arguments:
+        if argument == '--input':
+            if (samples_path := next(arguments, None)) is None:
+                print(f'The {argument} option requires a path')
+                exit(-1)
+        else:
+            print('unrecognized arguments, exiting')
+            exit(-1)
+
+    if os.path.isfile(samples_path) and (file := open(samples_path)):
+        samples = json.load(file)
+    else:
+        print(f'Failed to load {samples_path}, are you sure you have ran the `aggregate.py` script?')
+        exit(-1)
+
+    os.makedirs(EXPORT_DIRECTORY, exist_ok=True)
+
+    print(f'Collecting values ... ', flush=True, end='')
+    columns, values = collect_values(samples)
+    print(f'done, {len(values)} values of {len(samples)} samples')
+
+    for (name, group_columns) in SUMMARIES.items():
+        print(f'Summarizing {name} ... ', flush=True, end='')
+        if 0 < len(values):
+            groups, inverse = group_rows([columns[column] for column in group_columns])
+            statistics = group_statistics(inverse, len(groups[0]), values, columns['article'])
+        else:
+            groups = tuple([] for _ in group_columns)
+            statistics = {statistic: [] for statistic in ['count', 'articles', 'mean', 'std'] + list(QUANTILES)}
+
+        write_table(f'{EXPORT_DIRECTORY}/{name}.csv', group_columns + list(statistics),
+                    list(groups) + [np.asarray(column).tolist() for column in statistics.values()])
+        print('done')
+
+    # The number of samples and articles per sample type and pollution
+    print(f'Summarizing sample_types ... ', flush=True, end='')
+    sample_columns = {title: np.array([MISSING if sample.get(title, {}).get('data') is None
+                                       else str(sample[title]['data']) for sample in samples], dtype=object)
+                      for title in ['sample type', 'polluted']}
+    if 0 < len(samples):
+        groups, inverse = group_rows(list(sample_columns.values()))
+        counts = np.bincount(inverse, minlength=len(groups[0]))
+        articles = article_counts(inverse, len(groups[0]),
+                                  np.array([sample['article'] for sample in samples], dtype=object))
+    else:
+        groups, counts, articles = ([], []), [], []
+
+    write_table(f'{EXPORT_DIRECTORY}/sample_types.csv', list(sample_columns) + ['samples', 'articles'],
+                list(groups) + [np.asarray(counts).tolist(), np.asarray(articles).tolist()])
+    print('done')
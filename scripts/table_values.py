@@ -0,0 +1,161 @@
+'''
+Extraction of gene abundance values from the tables written by `extract.py`,
+used by `identify.py` to fill in the data of 'expanding' information.
+
+Table content is the markdown written by `extract.py`, for both the XML and
+PDF paths, with one row per line and cells separated by '|'. Tables with gene
+names in the header row instead of the first column are transposed.
+
+All tables of a batch are flattened into one array of cells, which are parsed
+once. Gene name and numeric columns are then found for all tables at the same
+time, by grouping the cells by (table, column) with NumPy. Each numeric column
+of a table with a gene name column becomes a CSV of 'NAME, VALUE' rows, the
+format expected by expanding information. The unit of a column is taken from
+its header, such as 'Soil (copies/g)', or from the unit the values are written
+with, such as '12 %'.
+'''
+
+import numpy as np
+import re
+
+# Matches a gene name, such as 'tetM', 'tet(A)', 'sul1', 'blaCTX-M', 'intI1'
+# or '16S rRNA'
+GENE_REGEX = re.compile(r"[a-z]{3,4}[A-Z0-9(][\w()'/-]*|16S(?: rRNA)?")
+
+# Matches a numeric cell, optionally with a comparison, a power of ten, a
+# standard deviation and a unit, such as '1.2 × 10^5 ± 3.1 copies/g'. The
+# groups are the value, the exponent and the unit
+NUMBER_REGEX = re.compile(r'[<>≤≥~]?\s*([-+−]?\d+(?:\.\d+)?)'
+                          r'(?:\s*(?:[eE]|[×x*]\s*10\^?)\s*([-+−]?\d+))?'
+                          r'(?:\s*(?:±|\+/-|\+-)\s*\d+(?:\.\d+)?(?:\s*(?:[eE]|[×x*]\s*10\^?)\s*[-+−]?\d+)?)?'
+                          r'\s*(%|(?:gene\s+)?copies(?:\s*/\s*[\w. ]+)?|log\S*)?')
+
+# Matches a unit given in the header of a column, in parenthesis or brackets
+HEADER_UNIT_REGEX = re.compile(r'[(\[]([^()\[\]]*)[)\]]\s*$')
+
+# Matches a markdown table separator line, such as '|------|:---|'
+SEPARATOR_REGEX = re.compile(r'\s*\|?[\s|:-]*-[\s|:-]*')
+
+# The minimum fraction of cells of a column which must be gene names or numbers
+# for it to be a gene name or numeric column
+MIN_COLUMN_FRACTION = 0.5
+
+# Unicode superscripts, which may be used for powers of ten
+SUPERSCRIPTS = str.maketrans('⁰¹²³⁴⁵⁶⁷⁸⁹⁻', '0123456789-')
+
+# Splits markdown table content into rows of stripped cells
+def parse_table(content):
+    rows = []
+    for line in content.split('\n'):
+        if line.strip() == '' or SEPARATOR_REGEX.fullmatch(line):
+            continue
+
+        cells = line.strip().removeprefix('|').removesuffix('|').split('|')
+        rows.append([cell.strip() for cell in cells])
+
+    # Pad rows with missing cells
+    width = max((len(row) for row in rows), default=0)
+    return [row + [''] * (width - len(row)) for row in rows]
+
+# Parses a numeric cell. Returns the (value, unit), where the value is NaN if
+# the cell is not a number and the unit is None if not given
+def parse_number(cell):
+    match = NUMBER_REGEX.fullmatch(cell.translate(SUPERSCRIPTS).replace('−', '-'))
+    if match is None:
+        return (np.nan, None)
+
+    # The power of ten is parsed as part of the number, as multiplying by it
+    # is not exact (such as 1.1 × 10^-3 giving 0.0011000000000000001)
+    if match.group(2) is None:
+        value = float(match.group(1))
+    else:
+        value = float(f'{match.group(1)}e{match.group(2)}')
+
+    return (value, match.group(3))
+
+# Returns True if the cells of the header row (except the first) are mostly
+# gene names while the first column is not, meaning the table is transposed
+def is_transposed(rows):
+    if len(rows) < 2 or len(rows[0]) < 2:
+        return False
+
+    header_genes = np.mean([GENE_REGEX.fullmatch(cell) is not None for cell in rows[0][1:]])
+    column_genes = np.mean([GENE_REGEX.fullmatch(row[0]) is not None for row in rows[1:]])
+    return MIN_COLUMN_FRACTION <= header_genes and column_genes < MIN_COLUMN_FRACTION
+
+# Extracts the gene abundances of each table content. Returns, for each table,
+# a list of (column header, CSV data, unit) for each numeric column, which is
+# empty if no gene names or values were found
+def extract_abundances(contents):
+    tables = []
+    for content in contents:
+        rows = parse_table(content)
+        tables.append([list(column) for column in zip(*rows)] if is_transposed(rows) else rows)
+
+    # Flatten the body cells of all tables, with the (table, column) group of
+    # each cell
+    cells, groups = [], []
+    group_offsets = [0]
+    for table in tables:
+        width = len(table[0]) if 0 < len(table) else 0
+        for row in table[1:]:
+            cells.extend(row)
+            groups.extend(range(group_offsets[-1], group_offsets[-1] + width))
+        group_offsets.append(group_offsets[-1] + width)
+
+    if len(cells) == 0:
+        return [[] for _ in contents]
+
+    parsed = [parse_number(cell) for cell in cells]
+    values = np.array([value for (value, _) in parsed], dtype=np.float64)
+    units = np.array([unit or '' for (_, unit) in parsed], dtype=object)
+    genes = np.array([GENE_REGEX.fullmatch(cell) is not None for cell in cells])
+    groups = np.array(groups)
+
+    # The fraction of gene names and numbers of every column of every table
+    counts = np.maximum(np.bincount(groups, minlength=group_offsets[-1]), 1)
+    gene_fractions = np.bincount(groups, weights=genes, minlength=group_offsets[-1]) / counts
+    numeric_fractions = np.bincount(groups, weights=~np.isnan(values), minlength=group_offsets[-1]) / counts
+
+    # Order the cells by column, the stable sort keeps the rows in order
+    order = np.argsort(groups, kind='stable')
+    values, units = values[order], units[order]
+    bounds = np.searchsorted(groups[order], np.arange(group_offsets[-1] + 1))
+
+    abundances = []
+    for table, start, end in zip(tables, group_offsets, group_offsets[1:]):
+        if end - start < 2 or gene_fractions[start:end].max() < MIN_COLUMN_FRACTION:
+            abundances.append([])
+            continue
+
+        name_column = int(np.argmax(gene_fractions[start:end]))
+        names = [row[name_column] for row in table[1:]]
+
+        table_abundances = []
+        for column in range(end - start):
+            if column == name_column or numeric_fractions[start + column] < MIN_COLUMN_FRACTION:
+                continue
+
+            column_values = values[bounds[start + column]:bounds[start + column + 1]]
+            column_units = units[bounds[start + column]:bounds[start + column + 1]]
+            column_units = column_units[column_units != '']
+
+            lines = [f'{name}, {float(value)!r}' for name, value in zip(names, column_values)
+                     if name != '' and not np.isnan(value)]
+            if len(lines) == 0:
+                continue
+
+            # Prefer the unit of the header, otherwise the most common unit of
+            # the values
+            header = table[0][column]
+            if match := HEADER_UNIT_REGEX.search(header):
+                unit = match.group(1).strip()
+            else:
+                written_units, unit_counts = np.unique(column_units, return_counts=True)
+                unit = written_units[np.argmax(unit_counts)] if 0 < len(written_units) else ''
+
+            table_abundances.append((header, '\n'.join(lines), unit or None))
+
+        abundances.append(table_abundances)
+
+    return abundances
@@ -0,0 +1,277 @@
+'''
+An inverted full-text index over the section content, figure captions and table
+captions of the articles extracted by `extract.py`.
+
+Each indexed text (a passage) is split into lowercase word tokens. For every
+token the index stores a posting list of the passages containing it, with the
+term frequency, the character offset and the length of every occurrence. The
+occurrence offsets are stored separately from the passage postings, ranking
+only reads passage ids and frequencies while offsets are only read for the
+returned hits.
+
+Posting lists are compressed by delta encoding the ascending passage ids and
+the ascending offsets within each passage, and bit packing each list with the
+smallest bit width holding all of its values. Unlike variable-length bytes, a
+bit packed list is decoded in bulk with NumPy, and a single value is found at
+a fixed bit position. Frequencies are stored minus one and occurrence lengths
+as the difference to the lowercase token, which is non-zero only where
+lowercasing changed the length, meaning lists of equal values take no space.
+
+The index file consists of a short header, a JSON document holding the passage
+table and the vocabulary followed by the posting lists
+
+header:     magic (4 bytes), version (u32), JSON length (u64)
+JSON:       {'passages': [[article, kind, subtype, token count], ...],
+             'vocabulary': {token: [offset, passage count, occurrence count,
+                                    passage id width, frequency width,
+                                    offset width, length width]}}
+postings:   per token, the bit packed passage id gaps, frequencies, offsets
+            (passage by passage) and length differences, each starting on a
+            new byte
+
+Hits are ranked with BM25.
+'''
+
+from array import array
+import json
+import math
+import mmap
+import numpy as np
+import re
+import struct
+
+# The magic bytes identifying an index file
+MAGIC = b'EXIX'
+
+# The current version of the format
+VERSION = 3
+
+# The struct format of the file header
+HEADER_FORMAT = struct.Struct('<4sIQ')
+
+# The type of decoded posting values
+POSTING_TYPE = np.dtype('<u4')
+
+# The pattern used to split text into tokens
+TOKEN_REGEX = re.compile(r'\w+')
+
+# The BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Returns the (lowercase token, character offset, length) tuples of the text.
+# The length is that of the token in the text, which lowercasing may change
+def tokenize(text):
+    return [(match.group().lower(), match.start(), match.end() - match.start())
+            for match in TOKEN_REGEX.finditer(text)]
+
+# Returns the smallest bit width holding all values
+def bit_width(values):
+    return int(values.max()).bit_length() if 0 < len(values) else 0
+
+# Returns the byte length of `count` values bit packed with the given width
+def packed_size(count, width):
+    return (count * width + 7) // 8
+
+# Bit packs the values with the given width, least significant bit first
+def pack_bits(values, width):
+    bits = (values[:, None] >> np.arange(width, dtype=POSTING_TYPE)) & 1
+    return np.packbits(bits.astype(np.uint8), bitorder='little').tobytes()
+
+# Unpacks `count` values of the given width from the given bytes, skipping
+# their first `skip` bits
+def unpack_bits(data, skip, count, width):
+    if width == 0:
+        return np.zeros(count, dtype=POSTING_TYPE)
+
+    # The bits of each value are padded to 32 bits and packed back into bytes
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8), count=skip + count * width, bitorder='little')
+    padded = np.zeros((count, 8 * POSTING_TYPE.itemsize), dtype=np.uint8)
+    padded[:, :width] = bits[skip:].reshape(count, width)
+    return np.packbits(padded, axis=1, bitorder='little').view(POSTING_TYPE).reshape(count)
+
+# Incrementally builds an index, one article at a time
+class Builder:
+    def __init__(self):
+        self.passages = []
+
+        # Token to (passage ids, frequencies, offsets, length differences)
+        self.postings = {}
+
+    # Adds all passages of an article, in the format exported by `extract.py`
+    def add(self, name, article):
+        # The section content may be spooled, see `spool.py`
+        for id, section in enumerate(article['sections']):
+            self.add_passage(name, 'section', id, str(section['content']))
+
+        for id, figure in enumerate(article['figures']):
+            if figure['caption'] is not None:
+                self.add_passage(name, 'figure caption', id, figure['caption'])
+
+        for id, table in enumerate(article['tables']):
+            if table['caption'] is not None:
+                self.add_passage(name, 'table caption', id, table['caption'])
+
+    def add_passage(self, name, kind, subtype, text):
+        tokens = tokenize(text)
+        passage_id = len(self.passages)
+        self.passages.append([name, kind, subtype, len(tokens)])
+
+        # Group the occurrences by token
+        occurrences = {}
+        for (token, offset, length) in tokens:
+            if token in occurrences:
+                occurrences[token].append((offset, length))
+            else:
+                occurrences[token] = [(offset, length)]
+
+        for token, token_occurrences in occurrences.items():
+            if token not in self.postings:
+                self.postings[token] = (array('I'), array('I'), array('I'), array('I'))
+            passage_ids, frequencies, offsets, lengths = self.postings[token]
+
+            passage_ids.append(passage_id)
+            frequencies.append(len(token_occurrences))
+            for (offset, length) in token_occurrences:
+                offsets.append(offset)
+                lengths.append(len(token) - length)
+
+    # Returns the posting lists of the token to store, delta encoded
+    def encode(self, token):
+        passage_ids, frequencies, offsets, lengths = (np.asarray(values, dtype=POSTING_TYPE)
+                                                      for values in self.postings[token])
+
+        # The offsets are delta encoded within each passage, the first offset
+        # of each passage is kept as is
+        starts = np.cumsum(frequencies)[:-1]
+        offset_gaps = np.diff(offsets, prepend=POSTING_TYPE.type(0))
+        offset_gaps[starts] = offsets[starts]
+
+        return [np.diff(passage_ids, prepend=POSTING_TYPE.type(0)), frequencies - 1, offset_gaps, lengths]
+
+    # Writes the index to the given path
+    def write(self, path):
+        vocabulary = {}
+        encoded = {}
+        offset = 0
+        for token in sorted(self.postings):
+            lists = encoded[token] = self.encode(token)
+            widths = [bit_width(values) for values in lists]
+            vocabulary[token] = [offset, len(lists[0]), len(lists[2]), *widths]
+            offset += sum(packed_size(len(values), width) for (values, width) in zip(lists, widths))
+
+        header = json.dumps({'passages': self.passages, 'vocabulary': vocabulary}).encode()
+        with open(path, 'wb') as file:
+            file.write(HEADER_FORMAT.pack(MAGIC, VERSION, len(header)))
+            file.write(header)
+
+            for token in sorted(self.postings):
+                for values, width in zip(encoded[token], vocabulary[token][3:]):
+                    file.write(pack_bits(values, width))
+
+# A read-only index, the posting lists are memory mapped
+class Index:
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, header_length = HEADER_FORMAT.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f'{path} is not a version {VERSION} index file')
+
+        header = json.loads(self.map[HEADER_FORMAT.size:HEADER_FORMAT.size + header_length])
+        self.passages = header['passages']
+        self.vocabulary = header['vocabulary']
+        self.data_offset = HEADER_FORMAT.size + header_length
+
+        # The BM25 length normalization of every passage
+        lengths = np.array([passage[3] for passage in self.passages], dtype=np.float64)
+        average_length = lengths.mean() if 0 < len(lengths) else 1
+        self.norms = BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(1, average_length))
+
+    def close(self):
+        if not self.map.closed:
+            self.map.close()
+        self.file.close()
+
+    # Returns the byte offset of each posting list of the token
+    def list_offsets(self, token):
+        offset, passage_count, occurrence_count, *widths = self.vocabulary[token]
+        counts = [passage_count, passage_count, occurrence_count, occurrence_count]
+
+        offsets = [self.data_offset + offset]
+        for count, width in zip(counts[:-1], widths[:-1]):
+            offsets.append(offsets[-1] + packed_size(count, width))
+        return offsets
+
+    # Unpacks `count` values of the given width, starting `skip` values into
+    # the posting list at the given byte offset. Only the bytes holding these
+    # values are read
+    def read(self, offset, skip, count, width):
+        start = offset + skip * width // 8
+        end = offset + packed_size(skip + count, width)
+        return unpack_bits(self.map[start:end], skip * width % 8, count, width)
+
+    # Returns the ascending ids of the passages containing the token and the
+    # frequency of the token in each
+    def postings(self, token):
+        _, passage_count, _, id_width, frequency_width, _, _ = self.vocabulary[token]
+        id_offset, frequency_offset, _, _ = self.list_offsets(token)
+        return (np.cumsum(self.read(id_offset, 0, passage_count, id_width), dtype=POSTING_TYPE),
+                self.read(frequency_offset, 0, passage_count, frequency_width) + 1)
+
+    # Returns the (start, end) offsets of the occurrences of the token in the
+    # passage, given the postings of the token
+    def occurrences(self, token, passage_ids, frequencies, passage_id):
+        i = int(np.searchsorted(passage_ids, passage_id))
+        if i == len(passage_ids) or passage_ids[i] != passage_id:
+            return []
+
+        *_, offset_width, length_width = self.vocabulary[token]
+        _, _, offset_offset, length_offset = self.list_offsets(token)
+        first = int(frequencies[:i].sum(dtype=np.int64))
+        count = int(frequencies[i])
+        starts = np.cumsum(self.read(offset_offset, first, count, offset_width), dtype=np.int64)
+        ends = starts + len(token) - self.read(length_offset, first, count, length_width)
+        return list(zip(starts.tolist(), ends.tolist()))
+
+    # Searches the index for passages matching any of the query tokens.
+    # Returns at most `limit` hits ordered by descending score, each with the
+    # location of every matched token occurrence
+    def search(self, query, limit=20):
+        tokens = sorted({token for (token, _, _) in tokenize(query) if token in self.vocabulary})
+        if len(tokens) == 0 or limit < 1:
+            return []
+
+        # Every matching passage has a positive score, as the IDF is positive
+        scores = np.zeros(len(self.passages))
+        postings = {}
+        for token in tokens:
+            passage_ids, frequencies = postings[token] = self.postings(token)
+            idf = math.log(1 + (len(self.passages) - len(passage_ids) + 0.5) / (len(passage_ids) + 0.5))
+            scores[passage_ids] += idf * frequencies * (BM25_K1 + 1) / (frequencies + self.norms[passage_ids])
+
+        candidates = np.flatnonzero(scores)
+        if limit < len(candidates):
+            candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+
+        hits = []
+        for passage_id in candidates.tolist():
+            # Only read the occurrence offsets of the returned hits
+            locations = []
+            for token in tokens:
+                for (start, end) in self.occurrences(token, *postings[token], passage_id):
+                    locations.append({'start': start, 'end': end})
+
+            article, kind, subtype, _ = self.passages[passage_id]
+            hits.append({
+                'article': article,
+                'kind': kind,
+                'subtype': subtype,
+                'score': float(scores[passage_id]),
+                'locations': sorted(locations, key=lambda location: location['start']),
+            })
+
+        return hits
@@ -213,6 +213,12 @@ function store_info(article) {
   let info = current_info;
   info['stamp'] = new Date().toISOString();
   info['data'] = document.getElementById("information-content").textContent;
+
+  // Keep the id of the identified information the info was stored from, used
+  // to merge with later identify runs
+  if (info['uuid'] !== undefined && info['origin'] === undefined) {
+    info['origin'] = info['uuid'];
+  }
   info['uuid'] = crypto.randomUUID();
 
   // Store the info on the server
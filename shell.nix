@@ -10,6 +10,8 @@ pkgs.mkShell {
       pillow
       html2text
       levenshtein
+      numpy
+      pyarrow
       opencv4
       pytesseract
       openai
@@ -0,0 +1,210 @@
+'''
+End-to-end tests of `aggregate.py`, run on a small `identify.py` output in a
+temporary directory.
+'''
+
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+# The path of the aggregate script
+AGGREGATE = os.path.join(os.path.dirname(__file__), '..', 'scripts', 'aggregate.py')
+
+# Returns a piece of information in the format of `identify.py`
+def information(title, data, sample, expanding=False, label=None):
+    return {
+        'title': title,
+        'data': data,
+        'sample': sample,
+        'sample label': label,
+        'expanding': expanding,
+        'uuid': f'{title} {sample}',
+        'source': {'article': 'article', 'kind': 'section', 'subtype': 0, 'location': {'start': 0, 'end': 0}},
+    }
+
+# The information of several articles
+ARTICLES = {
+    'first': [
+        information('publish date', '2021-01-01', None),
+        information('sample year', '2019', 0),
+        information('gene abundance', 'tetM, 120000\nsul1, 3400', 0, expanding=True),
+    ],
+    'second': [
+        information('publish date', '2022-01-01', None),
+        information('method', 'qPCR', None),
+    ],
+    'third': [
+        information('sample year', '2020', 0),
+        information('sample year', '2021', 1),
+        information('gene abundance', 'tetM, 1.5\nbroken line', 1, expanding=True),
+    ],
+}
+
+class TestAggregate(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        os.makedirs(f'{self.directory.name}/output/identify')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    # Writes the `identify.py` output of the given articles
+    def write(self, articles):
+        for name, infos in articles.items():
+            with open(f'{self.directory.name}/output/identify/{name}.ndjson', 'w') as file:
+                file.write(json.dumps({'stamp': '2023-01-01T00:00:00', 'descriptions': {}}) + '\n')
+                file.writelines(json.dumps(info) + '\n' for info in infos)
+        with open(f'{self.directory.name}/output/identify/results.json', 'w') as file:
+            json.dump({name: f'./output/identify/{name}.ndjson' for name in articles}, file)
+
+    # Runs `aggregate.py blind` with the given arguments, returns the output
+    def run_aggregate(self, *arguments):
+        return subprocess.run([sys.executable, os.path.abspath(AGGREGATE), 'blind', *arguments],
+                              cwd=self.directory.name, check=True, capture_output=True, text=True).stdout
+
+    # Returns the rows of the given CSV export
+    def read_csv(self, name):
+        with open(f'{self.directory.name}/output/aggregate/{name}') as file:
+            return list(csv.DictReader(file))
+
+    # Returns the content of each export
+    def read_exports(self):
+        exports = {}
+        for name in ['articles.json', 'samples.json', 'articles.csv', 'samples.csv', 'malformed.csv']:
+            with open(f'{self.directory.name}/output/aggregate/{name}') as file:
+                exports[name] = file.read()
+        return exports
+
+    # Runs `aggregate.py blind` on the given information of a single article,
+    # returns the rows of the samples CSV
+    def aggregate(self, infos):
+        self.write({'article': infos})
+        self.run_aggregate()
+        return self.read_csv('samples.csv')
+
+    def test_samples_sharing_titles(self):
+        rows = self.aggregate([
+            information('sample year', '2019', 0),
+            information('gene abundance', 'tetM, 120000', 0, expanding=True),
+            information('sample year', '2020', 1),
+            information('gene abundance', 'tetM, 3400', 1, expanding=True),
+            information('publish date', '2021-01-01', None),
+        ])
+
+        samples = {row['sample number']: row for row in rows}
+        self.assertEqual(set(samples), {'0', '1'})
+        self.assertEqual((samples['0']['sample year'], samples['0']['tetm']), ('2019', '120000'))
+        self.assertEqual((samples['1']['sample year'], samples['1']['tetm']), ('2020', '3400'))
+
+    def test_latest_information_of_sample(self):
+        rows = self.aggregate([
+            information('sample year', '2019', 0),
+            information('sample year', '2020', 0),
+        ])
+
+        self.assertEqual([(row['sample number'], row['sample year']) for row in rows], [('0', '2020')])
+
+    def test_sample_label(self):
+        rows = self.aggregate([
+            information('gene abundance', 'tetM, 120000', 0, expanding=True),
+            information('sample year', '2019', 0, label='site A'),
+            information('sample year', '2020', 1),
+        ])
+
+        self.assertEqual([(row['sample number'], row['sample label']) for row in rows], [('0', 'site A'), ('1', '')])
+
+    def test_articles(self):
+        self.write(ARTICLES)
+        self.run_aggregate()
+
+        # Every article is exported in order, the articles without samples too
+        with open(f'{self.directory.name}/output/aggregate/articles.json') as file:
+            articles = json.load(file)
+        self.assertEqual(list(articles), ['first', 'second', 'third'])
+        self.assertEqual(articles['second']['method']['data'], 'qPCR')
+        self.assertEqual([(row['article id'], row['publish date'], row['method'])
+                          for row in self.read_csv('articles.csv')],
+                         [('first', '2021-01-01', ''), ('second', '2022-01-01', 'qPCR'), ('third', '', '')])
+
+        with open(f'{self.directory.name}/output/aggregate/samples.json') as file:
+            samples = json.load(file)
+        self.assertEqual([(sample['article'], sample['sample number']) for sample in samples],
+                         [('first', 0), ('third', 0), ('third', 1)])
+
+        # The headers hold the titles and expanded fields of all articles
+        rows = self.read_csv('samples.csv')
+        self.assertEqual(list(rows[0]), ['article id', 'sample number', 'sample label', 'sample year',
+                                         'gene abundance', 'tetm', 'sul1'])
+        self.assertEqual([(row['tetm'], row['sul1']) for row in rows], [('120000', '3400'), ('', ''), ('1.5', '')])
+        self.assertEqual(self.read_csv('malformed.csv'), [{'article id': 'third', 'sample number': '1',
+                                                           'title': 'gene abundance', 'line number': '2',
+                                                           'line': 'broken line'}])
+
+    def test_schema_cache(self):
+        self.write(ARTICLES)
+        self.run_aggregate()
+        with open(f'{self.directory.name}/output/aggregate/schema.json') as file:
+            schema = json.load(file)
+
+        # The cached schema is kept while no article changed
+        self.run_aggregate()
+        with open(f'{self.directory.name}/output/aggregate/schema.json') as file:
+            self.assertEqual(json.load(file), schema)
+
+        # A changed article may bring new titles
+        self.write(dict(ARTICLES, second=ARTICLES['second'] + [information('sample ph', '7', 0)]))
+        self.run_aggregate()
+        self.assertIn('sample ph', self.read_csv('samples.csv')[0])
+
+    def test_jobs(self):
+        self.write(ARTICLES)
+        self.run_aggregate()
+        serial = self.read_exports()
+
+        os.remove(f'{self.directory.name}/output/aggregate/schema.json')
+        self.run_aggregate('--jobs', '2')
+        self.assertEqual(self.read_exports(), serial)
+
+    def test_incremental(self):
+        self.write(ARTICLES)
+        self.run_aggregate()
+        exports = self.read_exports()
+
+        # The exports from the store are the same
+        self.assertIn('done, 3 of 3 articles updated', self.run_aggregate('incremental'))
+        self.assertEqual(self.read_exports(), exports)
+        self.assertIn('done, 0 of 3 articles updated', self.run_aggregate('incremental'))
+        self.assertEqual(self.read_exports(), exports)
+
+        # Only changed articles are updated, removed articles are dropped
+        changed = {'first': ARTICLES['first'], 'third': ARTICLES['third'][:2]}
+        self.write(changed)
+        self.assertIn('done, 1 of 2 articles updated', self.run_aggregate('incremental'))
+        incremental = self.read_exports()
+
+        self.run_aggregate()
+        self.assertEqual(incremental, self.read_exports())
+        self.assertEqual([row['article id'] for row in self.read_csv('articles.csv')], ['first', 'third'])
+
+    def test_parquet(self):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            self.skipTest('pyarrow is not installed')
+
+        self.write(ARTICLES)
+        self.run_aggregate('parquet')
+
+        # The wide table has a row per sample, as the samples CSV
+        wide = pq.read_table(f'{self.directory.name}/output/aggregate/wide.parquet').to_pylist()
+        self.assertEqual([(row['article'], row['sample'], row['tetm']) for row in wide],
+                         [('first', 0, 120000.0), ('third', 0, None), ('third', 1, 1.5)])
+        long = pq.read_table(f'{self.directory.name}/output/aggregate/long.parquet')
+        self.assertEqual(long.num_rows, 11)
+
+if __name__ == '__main__':
+    unittest.main()
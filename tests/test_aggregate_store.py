@@ -0,0 +1,88 @@
+'''
+Tests of the incremental aggregate store of `aggregate_store.py`, in a
+temporary directory.
+'''
+
+import math
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+import aggregate_store
+import expansion
+
+# Returns an article as prepared by `aggregate.py`, with a sample of the given
+# expanding data
+def prepared(name, data, title='gene abundance'):
+    info = {'title': title, 'data': data, 'sample': 0, 'expanding': True}
+    sample = {title: info, 'article': name, 'sample number': 0}
+    article = {'publish date': {'title': 'publish date', 'data': '2021', 'sample': None, 'expanding': False}}
+    return (name, article, [sample], {(0, title): expansion.parse(data)})
+
+class TestStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = f'{self.directory.name}/aggregate.sqlite'
+        self.store = aggregate_store.Store(self.path)
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        article = prepared('first', 'tetM, 1.5\nsul1, n.d.\nbroken')
+        self.store.add(0, 'stamp', 'hash', article)
+
+        (stored,) = list(self.store.articles())
+        self.assertEqual(stored[:3], article[:3])
+
+        names, values, numbers, malformed = stored[3][(0, 'gene abundance')]
+        self.assertEqual((names, values, malformed), (('tetm', 'sul1'), ('1.5', 'n.d.'), ((3, 'broken'),)))
+        self.assertEqual(numbers[0], 1.5)
+        self.assertTrue(math.isnan(numbers[1]))
+        self.assertEqual(self.store.sources(), {'first': ('stamp', 'hash')})
+
+    def test_order_and_schema(self):
+        self.store.add(1, 'b', 'b', prepared('second', 'sul1, 2', title='other abundance'))
+        self.store.add(0, 'a', 'a', prepared('first', 'tetM, 1'))
+
+        # Articles and fields follow the position in the summary
+        self.assertEqual([article[0] for article in self.store.articles()], ['first', 'second'])
+        self.assertEqual(self.store.schema(), {
+            'article titles': ['publish date'],
+            'sample titles': ['gene abundance', 'other abundance'],
+            'internal fields': ['tetm', 'sul1'],
+        })
+
+        self.store.touch('second', -1, 'c')
+        self.assertEqual([article[0] for article in self.store.articles()], ['second', 'first'])
+        self.assertEqual(self.store.sources()['second'], ('c', 'b'))
+
+    def test_replace_and_retain(self):
+        self.store.add(0, 'a', 'a', prepared('first', 'tetM, 1'))
+        self.store.add(1, 'b', 'b', prepared('second', 'sul1, 2'))
+        self.store.add(0, 'c', 'c', prepared('first', 'intI1, 3'))
+
+        self.store.retain(['first'])
+        self.assertEqual([article[0] for article in self.store.articles()], ['first'])
+        self.assertEqual(self.store.schema()['internal fields'], ['inti1'])
+
+        # The expanded tables and fields of removed articles are removed too
+        for table in ['expanded', 'fields']:
+            count = self.store.connection.execute(f'SELECT COUNT(DISTINCT article) FROM {table}').fetchone()[0]
+            self.assertEqual(count, 1)
+
+    def test_version(self):
+        self.store.add(0, 'a', 'a', prepared('first', 'tetM, 1'))
+        self.store.connection.execute("UPDATE settings SET value = ? WHERE key = 'version'",
+                                      (aggregate_store.VERSION - 1,))
+        self.store.close()
+
+        # Stores of other versions are cleared
+        self.store = aggregate_store.Store(self.path)
+        self.assertEqual(self.store.sources(), {})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+'''
+Tests of the Parquet export of `columnar.py`, written to a temporary
+directory. Skipped if pyarrow is not installed.
+'''
+
+import math
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+import expansion
+
+try:
+    import columnar
+    import pyarrow.parquet as pq
+except ImportError:
+    columnar = None
+
+# Returns a piece of aggregated information
+def information(title, data, expanding=False, unit=None, label=None):
+    return {'title': title, 'data': data, 'expanding': expanding, 'unit': unit, 'sample label': label,
+            'source': {'article': 'first', 'kind': 'table caption', 'subtype': 1}}
+
+@unittest.skipIf(columnar is None, 'pyarrow is not installed')
+class TestExporter(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    # Exports the articles, each as a (name, article, samples) tuple, and
+    # returns the long and wide tables as lists of rows
+    def export(self, articles, schema, batch_rows=columnar.BATCH_ROWS if columnar else None):
+        original, columnar.BATCH_ROWS = columnar.BATCH_ROWS, batch_rows
+        try:
+            exporter = columnar.Exporter(self.directory.name, schema)
+            for (name, article, samples) in articles:
+                expanded = {(None, title): expansion.parse(info['data'])
+                            for (title, info) in article.items() if info['expanding']}
+                for sample in samples:
+                    expanded.update({(sample['sample number'], title): expansion.parse(info['data'])
+                                     for (title, info) in sample.items()
+                                     if title not in ('article', 'sample number') and info['expanding']})
+                exporter.add(name, article, samples, expanded)
+            exporter.close()
+        finally:
+            columnar.BATCH_ROWS = original
+
+        return (pq.read_table(f'{self.directory.name}/long.parquet').to_pylist(),
+                pq.read_table(f'{self.directory.name}/wide.parquet').to_pylist())
+
+    def test_tables(self):
+        article = {'publish date': information('publish date', '2021')}
+        samples = [
+            {'article': 'first', 'sample number': 0, 'sample year': information('sample year', '2019', label='site A'),
+             'abundance': information('abundance', 'tetM, 0.5\nsul1, n.d.', expanding=True, unit='copies/g')},
+            {'article': 'first', 'sample number': 1, 'sample year': information('sample year', '2020')},
+        ]
+        schema = {'sample titles': ['sample year', 'abundance'], 'internal fields': ['tetm', 'sul1', 'sample year']}
+        long, wide = self.export([('first', article, samples)], schema)
+
+        self.assertEqual([(row['sample'], row['title'], row['field'], row['value'], row['number']) for row in long], [
+            (None, 'publish date', 'publish date', '2021', 2021.0),
+            (0, 'sample year', 'sample year', '2019', 2019.0),
+            (0, 'abundance', 'abundance', 'tetM, 0.5\nsul1, n.d.', None),
+            (0, 'abundance', 'tetm', '0.5', 0.5),
+            (0, 'abundance', 'sul1', 'n.d.', None),
+            (1, 'sample year', 'sample year', '2020', 2020.0),
+        ])
+        self.assertEqual({(row['unit'], row['kind'], row['subtype']) for row in long[2:5]},
+                         {('copies/g', 'table caption', '1')})
+
+        # Expanded fields named as a title are only in the long table
+        self.assertEqual(wide, [
+            {'article': 'first', 'sample': 0, 'sample label': 'site A', 'sample year': '2019',
+             'abundance': 'tetM, 0.5\nsul1, n.d.', 'tetm': 0.5, 'sul1': None},
+            {'article': 'first', 'sample': 1, 'sample label': None, 'sample year': '2020', 'abundance': None,
+             'tetm': None, 'sul1': None},
+        ])
+
+    def test_row_groups(self):
+        schema = {'sample titles': ['sample year'], 'internal fields': []}
+        articles = [(f'article {i}', {}, [{'article': f'article {i}', 'sample number': 0,
+                                           'sample year': information('sample year', str(2000 + i))}])
+                    for i in range(10)]
+        long, wide = self.export(articles, schema, batch_rows=3)
+
+        self.assertEqual([row['value'] for row in long], [str(2000 + i) for i in range(10)])
+        self.assertEqual([row['article'] for row in wide], [f'article {i}' for i in range(10)])
+        self.assertEqual(pq.ParquetFile(f'{self.directory.name}/wide.parquet').num_row_groups, 4)
+
+    def test_nullable(self):
+        self.assertEqual(columnar.nullable(expansion.parse('a, 1\nb, x')[2]), [1.0, None])
+        self.assertEqual(columnar.parse_number('1e3'), 1000.0)
+        self.assertTrue(all(columnar.parse_number(value) is None for value in [None, 'n.d.', '']))
+        self.assertFalse(math.isnan(columnar.parse_number('0')))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+'''
+Tests of the SQLite corpus store of `corpus.py`, in a temporary directory.
+'''
+
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+import corpus
+
+# An article in the format exported by `extract.py`
+ARTICLE = {
+    'figures': [{'title': 'Figure 1', 'caption': 'Abundance of tetM', 'path': 'fig.png', 'duplicate': True}],
+    'tables': [{'title': 'Table 1', 'caption': None, 'content': '| Gene |\n| --- |\n| sul1 |'}],
+    'sections': [{'name': 'Methods', 'content': 'Samples were collected in 2019', 'parent': None},
+                 {'name': 'Sampling', 'content': 'Soil samples', 'parent': 0}],
+    'section_order': [0, 1],
+    'metadata': {'title': 'An article', 'abstract': None},
+}
+
+# The schema of stores written before the schema version was introduced
+UNVERSIONED_SCHEMA = '''
+CREATE TABLE articles (id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL, section_order TEXT NOT NULL);
+CREATE TABLE figures (article INTEGER NOT NULL REFERENCES articles(id) ON DELETE CASCADE, idx INTEGER NOT NULL,
+                      title TEXT, caption TEXT, path TEXT, PRIMARY KEY (article, idx));
+INSERT INTO articles VALUES (1, 'old', '[]');
+'''
+
+class TestStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = f'{self.directory.name}/corpus.sqlite'
+        self.json_path = f'{self.directory.name}/article.json'
+        with open(self.json_path, 'w') as file:
+            json.dump(ARTICLE, file)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        with corpus.Store(self.path) as store:
+            store.add('article', ARTICLE, corpus.source_stamp(self.json_path))
+
+        with corpus.Store(self.path) as store:
+            self.assertEqual(store.names(), ['article'])
+            self.assertEqual(store.load('article'), ARTICLE)
+            self.assertIs(store.record('article', 'figures', 0)['duplicate'], True)
+            self.assertEqual(store.record('article', 'sections', 1), ARTICLE['sections'][1])
+            self.assertEqual(store.metadata('article'), ARTICLE['metadata'])
+            self.assertEqual([row[:3] for row in store.search('tetM')], [('article', 'figure caption', 0)])
+
+            with self.assertRaises(KeyError):
+                store.load('missing')
+            with self.assertRaises(IndexError):
+                store.record('article', 'tables', 1)
+
+    def test_replace(self):
+        with corpus.Store(self.path) as store:
+            store.add('article', ARTICLE)
+            store.add('article', {**ARTICLE, 'figures': []})
+            self.assertEqual(store.load('article')['figures'], [])
+            self.assertEqual(store.search('tetM'), [])
+
+    def test_fresh(self):
+        with corpus.Store(self.path) as store:
+            store.add('article', ARTICLE, corpus.source_stamp(self.json_path))
+            store.add('unstamped', ARTICLE)
+            self.assertTrue(store.fresh('article', self.json_path))
+            self.assertFalse(store.fresh('unstamped', self.json_path))
+            self.assertFalse(store.fresh('missing', self.json_path))
+
+            # Extracting again without the store makes it stale
+            with open(self.json_path, 'w') as file:
+                json.dump({**ARTICLE, 'figures': []}, file)
+            self.assertFalse(store.fresh('article', self.json_path))
+
+    def test_migrate(self):
+        connection = sqlite3.connect(self.path)
+        connection.executescript(UNVERSIONED_SCHEMA)
+        connection.close()
+
+        with corpus.Store(self.path) as store:
+            self.assertEqual(store.connection.execute('PRAGMA user_version').fetchone()[0], corpus.SCHEMA_VERSION)
+            self.assertFalse(store.fresh('old', self.json_path))
+
+            store.add('article', ARTICLE)
+            self.assertEqual(store.load('article'), ARTICLE)
+
+    def test_newer_version(self):
+        connection = sqlite3.connect(self.path)
+        connection.execute(f'PRAGMA user_version = {corpus.SCHEMA_VERSION + 1}')
+        connection.close()
+
+        with self.assertRaises(ValueError):
+            corpus.Store(self.path)
+
+if __name__ == '__main__':
+    unittest.main()
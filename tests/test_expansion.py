@@ -0,0 +1,48 @@
+'''
+Tests of the parsing of expanding information of `expansion.py`.
+'''
+
+import numpy as np
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+import expansion
+
+class TestParse(unittest.TestCase):
+    def test_table(self):
+        names, values, numbers, malformed = expansion.parse(' TetM , 1.2e5\nsul1,"3,400"\n\nintI1, n.d.\n')
+
+        self.assertEqual(names, ('tetm', 'sul1', 'inti1'))
+        self.assertEqual(values, ('1.2e5', '3,400', 'n.d.'))
+        self.assertEqual(numbers[0], 120000.0)
+        self.assertTrue(np.isnan(numbers[1:]).all())
+        self.assertEqual(malformed, ())
+
+    def test_malformed(self):
+        names, values, numbers, malformed = expansion.parse('tetM, 1\nonly a name\n, 2\nsul1, 3')
+
+        # Malformed lines are skipped, with their line number
+        self.assertEqual((names, values, numbers.tolist()), (('tetm', 'sul1'), ('1', '3'), [1.0, 3.0]))
+        self.assertEqual(malformed, ((2, 'only a name'), (3, ', 2')))
+
+    def test_shared(self):
+        table = expansion.parse('tetM, 1\nsul1, 2')
+        self.assertIs(expansion.parse('tetM, 1\nsul1, 2'), table)
+
+        # The cached numbers may not be modified
+        with self.assertRaises(ValueError):
+            table[2][0] = 0
+
+    def test_to_numbers(self):
+        self.assertEqual(expansion.to_numbers(['1', ' 2.5', '-3e-2']).tolist(), [1.0, 2.5, -0.03])
+        self.assertEqual(expansion.to_numbers([]).tolist(), [])
+
+        numbers = expansion.to_numbers(['1', 'x', 'inf'])
+        self.assertEqual(numbers[0], 1.0)
+        self.assertTrue(np.isnan(numbers[1]))
+        self.assertTrue(np.isinf(numbers[2]))
+
+if __name__ == '__main__':
+    unittest.main()
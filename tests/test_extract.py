@@ -0,0 +1,287 @@
+'''
+End-to-end tests of `extract.py`, run on small generated XML articles in a
+temporary directory.
+'''
+
+from PIL import Image
+import fitz
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+import corpus
+import extract
+import pack
+
+# The path of the extract script
+EXTRACT = os.path.join(os.path.dirname(__file__), '..', 'scripts', 'extract.py')
+
+# The article XML, with a section and a figure
+ARTICLE_XML = '''<article>
+  <body>
+    <sec>
+      <title>Results</title>
+      <p>Samples were collected and the abundance of tetM was measured.</p>
+    </sec>
+    <fig>
+      <label>Figure 1</label>
+      <caption><p>Abundance of tetM.</p></caption>
+      <graphic xmlns:xlink="http://www.w3.org/1999/xlink" xlink:href="fig1"/>
+    </fig>
+  </body>
+</article>
+'''
+
+class TestExtract(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.articles = {}
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    # Writes a downloaded XML article whose figure is a horizontal gradient
+    # of the given size
+    def article(self, name, size):
+        path = f'{self.directory.name}/output/download/{name}'
+        os.makedirs(path)
+        with open(f'{path}/article.xml', 'w') as file:
+            file.write(ARTICLE_XML)
+        with open(f'{path}/metadata.json', 'w') as file:
+            json.dump({'Title': name, 'PubDate': '2023', 'AuthorList': ['A. Author']}, file)
+
+        image = Image.new('L', size)
+        image.putdata([255 * x // size[0] for y in range(size[1]) for x in range(size[0])])
+        image.save(f'{path}/fig1.png')
+
+        self.articles[name] = f'./output/download/{name}'
+
+    # Writes a downloaded PDF article with a page header and a numbered bold
+    # section header on every other page
+    def pdf_article(self, name, pages):
+        path = f'{self.directory.name}/output/download/{name}'
+        os.makedirs(path)
+        with open(f'{path}/metadata.json', 'w') as file:
+            json.dump({'Title': name, 'PubDate': '2023', 'AuthorList': ['A. Author']}, file)
+
+        doc = fitz.open()
+        for i in range(pages):
+            page = doc.new_page()
+            page.insert_text((72, 40), f'Journal of Results, page {i + 1}', fontsize=8)
+            if i % 2 == 0:
+                page.insert_text((72, 80), f'{i // 2 + 1}. Section {i // 2 + 1}', fontname='hebo', fontsize=12)
+            page.insert_text((72, 120), f'Samples of page {i + 1} were "collected".', fontsize=10)
+        doc.save(f'{path}/article.pdf')
+        doc.close()
+
+        self.articles[name] = f'./output/download/{name}'
+
+    # Runs `extract.py` with the given arguments, returns the extracted
+    # articles
+    def extract(self, *arguments):
+        with open(f'{self.directory.name}/output/download/results.json', 'w') as file:
+            json.dump({'articles': self.articles}, file)
+
+        subprocess.run([sys.executable, os.path.abspath(EXTRACT), *arguments], cwd=self.directory.name,
+                       check=True, capture_output=True)
+
+        articles = {}
+        for name in self.articles:
+            with open(f'{self.directory.name}/output/extract/{name}.json') as file:
+                articles[name] = json.load(file)
+        return articles
+
+    # Returns the size of the image of the first figure of the article
+    def figure_size(self, article):
+        with Image.open(os.path.join(self.directory.name, article['figures'][0]['path'])) as image:
+            return image.size
+
+    def test_dedupe(self):
+        sizes = {'x0': (200, 150), 'x1': (250, 180), 'x2': (300, 210)}
+        for (name, size) in sizes.items():
+            self.article(name, size)
+
+        # The duplicates are links to the figure of the first article
+        for _ in range(2):
+            articles = self.extract('dedupe')
+            self.assertEqual([article['figures'][0]['duplicate'] for article in articles.values()],
+                             [False, True, True])
+            self.assertEqual({self.figure_size(article) for article in articles.values()}, {sizes['x0']})
+
+            # Re-extracting must not write through the links to the canonical
+            # figure
+            articles = self.extract()
+            self.assertEqual({name: self.figure_size(article) for (name, article) in articles.items()}, sizes)
+
+    def test_pdf(self):
+        self.pdf_article('p0', 6)
+        self.pdf_article('p1', 1)
+
+        # The spooled section content is handed over from the workers and
+        # streamed to every export
+        articles = self.extract('pack', 'sqlite', '--jobs', '2')
+        self.assertEqual([section['name'] for section in articles['p0']['sections']],
+                         ['preface', '1. Section 1', '2. Section 2', '3. Section 3'])
+        self.assertEqual(articles['p0']['sections'][2]['content'],
+                         'Samples of page 3 were "collected". \n\n\n\nSamples of page 4 were "collected".')
+
+        store = corpus.Store(f'{self.directory.name}/output/extract/corpus.sqlite')
+        for name, article in articles.items():
+            self.assertEqual(pack.load(f'{self.directory.name}/output/extract/{name}.pack'), article)
+            self.assertEqual([section['content'] for section in store.load(name)['sections']],
+                             [section['content'] for section in article['sections']])
+
+    def test_profile(self):
+        self.pdf_article('p0', 3)
+        self.article('x0', (20, 10))
+
+        # The articles profiled in the workers are reported by the main process
+        self.extract('profile', '--jobs', '2')
+        with open(f'{self.directory.name}/output/extract/profile.json') as file:
+            report = json.load(file)
+
+        self.assertEqual(report['articles'], 2)
+        # The pages after the first are streamed twice, see `extract_from_pdf`
+        self.assertEqual(report['counters']['pages'], 5)
+        self.assertIn('pdf page text', report['phases'])
+        self.assertIn('xml parsing', report['phases'])
+        self.assertEqual({article['name'] for article in report['slowest']}, {'p0', 'x0'})
+
+    def test_limit_options(self):
+        os.makedirs(f'{self.directory.name}/output/download')
+        with open(f'{self.directory.name}/output/download/results.json', 'w') as file:
+            json.dump({'articles': {}}, file)
+
+        for option, value in [('--jobs', '-1'), ('--jobs', '0'), ('--jobs', '1.5'), ('--timeout', '-3'),
+                              ('--memory', 'many'), ('--memory', None)]:
+            arguments = [option] if value is None else [option, value]
+            process = subprocess.run([sys.executable, os.path.abspath(EXTRACT), *arguments],
+                                     cwd=self.directory.name, capture_output=True, text=True)
+            self.assertEqual(process.returncode, 255)
+            self.assertIn(f'The {option} option requires a positive integer', process.stdout)
+
+# Extracts a fake article in a worker of `extract_guarded`, misbehaving
+# according to its name
+def extract_fake_article(name, path, force_pdf_figures):
+    if name == 'hang':
+        time.sleep(60)
+    elif name == 'allocate':
+        chunks = []
+        while True:
+            chunks.append(b'x' * 2 ** 23)
+            time.sleep(0.001)
+    elif name == 'raise':
+        raise RuntimeError('broken article')
+
+    return 'XML', {'name': name}
+
+class TestGuarded(unittest.TestCase):
+    def setUp(self):
+        self.extract_article = extract.extract_article
+        extract.extract_article = extract_fake_article
+
+    def tearDown(self):
+        extract.extract_article = self.extract_article
+
+    def test_quarantine(self):
+        names = ['first', 'hang', 'allocate', 'raise', 'second']
+        start = time.monotonic()
+        outcomes = {name: (reason, result) for (name, _, reason, _, result, _)
+                    in extract.extract_guarded({name: name for name in names}, False, 2, 2, 64 * 2 ** 20)}
+
+        # The misbehaving workers are killed while the others complete
+        self.assertLess(time.monotonic() - start, 30)
+        self.assertEqual(set(outcomes), set(names))
+        self.assertEqual(outcomes['first'], (None, {'name': 'first'}))
+        self.assertEqual(outcomes['second'], (None, {'name': 'second'}))
+        self.assertEqual(outcomes['hang'], ('exceeded the 2 s timeout', None))
+        self.assertIn('memory limit', outcomes['allocate'][0])
+        self.assertEqual(outcomes['raise'], ("raised RuntimeError('broken article')", None))
+
+# The cells of the generated tables, the first row is the header
+TABLE_CELLS = [['Gene', 'Soil', 'Manure'], ['tetM', '0.013', '0.026'], ['sul1', '0.039', '0.052']]
+
+# A line of body text
+BODY_LINE = 'The samples were collected from the sites and stored frozen until the analysis'
+
+class TestTables(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    # Writes a page with a caption followed by the table cells, with rulings
+    # if ruled
+    def table_page(self, doc, title, ruled):
+        page = doc.new_page()
+        page.insert_text((72, 80), f'{title}. Abundance of resistance genes', fontsize=10)
+
+        y = 88
+        for i, row in enumerate(TABLE_CELLS):
+            if ruled and i < 2:
+                page.draw_line((72, y), (400, y))
+            y += 14
+            for j, cell in enumerate(row):
+                page.insert_text((72 + j * 110, y), cell, fontsize=9)
+            y += 4
+        if ruled:
+            page.draw_line((72, y), (400, y))
+
+        page.insert_text((72, y + 40), BODY_LINE, fontsize=10)
+
+    # Returns the tables detected in the given document
+    def detect(self, doc):
+        path = f'{self.directory.name}/tables.pdf'
+        doc.save(path)
+        doc.close()
+
+        tables = []
+        for page, page_text in extract.stream_pages(path, 'dict'):
+            tables.extend(extract.detect_page_tables(page, page_text))
+        return tables
+
+    def test_tables(self):
+        doc = fitz.open()
+        self.table_page(doc, 'Table 1', True)
+        self.table_page(doc, 'Table 2', False)
+
+        expected = extract.format_table(TABLE_CELLS)
+        self.assertEqual([(table['title'], table['content']) for table in self.detect(doc)],
+                         [('Table 1', expected), ('Table 2', expected)])
+
+    def test_not_tables(self):
+        doc = fitz.open()
+
+        # A paragraph mentioning a table is not a caption
+        page = doc.new_page()
+        for i in range(8):
+            page.insert_text((72, 80 + 12 * i), ('Table 1 shows the sites. ' if i == 0 else '') + BODY_LINE,
+                             fontsize=9)
+
+        # Neither are two columns of body text lining up row by row
+        page = doc.new_page()
+        page.insert_text((72, 80), 'Table 2 lists the genes.', fontsize=9)
+        for i in range(1, 8):
+            page.insert_text((72, 80 + 12 * i), BODY_LINE[:40], fontsize=9)
+            page.insert_text((320, 80 + 12 * i), BODY_LINE[40:], fontsize=9)
+
+        self.assertEqual(self.detect(doc), [])
+
+    def test_split_cells(self):
+        # Words as (x0, y0, x1, y1, word), the header spans a gap in the values
+        rows = [[(10, 0, 40, 10, 'Gene'), (60, 0, 130, 10, 'Abundance')],
+                [(10, 20, 40, 30, 'tetM'), (60, 20, 80, 30, '0.1'), (110, 20, 130, 30, '2')]]
+        self.assertEqual(extract.split_table_cells(rows), [['Gene', 'Abundance'], ['tetM', '0.1 2']])
+        self.assertEqual(extract.group_table_rows([word for row in rows for word in row]), rows)
+
+        self.assertEqual(extract.format_table([['Gene', 'Soil'], ['tetM', '0.013']]),
+                         '| Gene | Soil  |\n|------|-------|\n| tetM | 0.013 |\n')
+
+if __name__ == '__main__':
+    unittest.main()
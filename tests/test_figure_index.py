@@ -0,0 +1,78 @@
+'''
+Tests of the near-duplicate figure lookup of `figure_index.py`, on generated
+images in a temporary directory.
+'''
+
+from PIL import Image
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+import figure_index
+
+class TestFigureIndex(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    # Writes a horizontal gradient image of the given size, optionally
+    # reversed, returns its path
+    def image(self, name, size, reverse=False):
+        path = f'{self.directory.name}/{name}.png'
+        image = Image.new('L', size)
+        image.putdata([255 * (size[0] - x if reverse else x) // size[0]
+                       for y in range(size[1]) for x in range(size[0])])
+        image.save(path)
+        return path
+
+    def test_other_article(self):
+        index = figure_index.FigureIndex(f'{self.directory.name}/figures.json')
+        first = self.image('first-figure-0', (64, 48))
+        second = self.image('second-figure-0', (128, 96))
+
+        self.assertEqual(index.canonical(first, 'first'), first)
+        self.assertEqual(index.canonical(second, 'second'), first)
+
+    def test_same_article(self):
+        index = figure_index.FigureIndex(f'{self.directory.name}/figures.json')
+        first = self.image('first-figure-0', (64, 48))
+        panel = self.image('first-figure-1', (128, 96))
+
+        self.assertEqual(index.canonical(first, 'first'), first)
+        self.assertEqual(index.canonical(panel, 'first'), panel)
+        self.assertEqual(index.canonical(first, 'first'), first)
+        self.assertEqual(len(index.figures), 2)
+
+    def test_changed_figure(self):
+        index = figure_index.FigureIndex(f'{self.directory.name}/figures.json')
+        first = self.image('first-figure-0', (64, 48))
+        index.canonical(first, 'first')
+
+        # The stale hash of the re-extracted figure is no longer matched
+        self.image('first-figure-0', (64, 48), reverse=True)
+        self.assertEqual(index.canonical(first, 'first'), first)
+        second = self.image('second-figure-0', (128, 96))
+        self.assertEqual(index.canonical(second, 'second'), second)
+        self.assertEqual(index.canonical(self.image('third-figure-0', (32, 24), reverse=True), 'third'), first)
+
+        index.write()
+        index = figure_index.FigureIndex(f'{self.directory.name}/figures.json')
+        self.assertEqual(set(index.figures), {first, second})
+
+    def test_persisted(self):
+        index = figure_index.FigureIndex(f'{self.directory.name}/figures.json')
+        first = self.image('first-figure-0', (64, 48))
+        index.canonical(first, 'first')
+        index.write()
+
+        index = figure_index.FigureIndex(f'{self.directory.name}/figures.json')
+        second = self.image('second-figure-0', (128, 96))
+        self.assertEqual(index.canonical(first, 'first'), first)
+        self.assertEqual(index.canonical(second, 'second'), first)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,173 @@
+'''
+Tests of the filter files, plugins and version hashes of `filters.py`.
+'''
+
+import json
+import os
+import re
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+import filters
+
+# The same filters in each file format
+FILES = {
+    'filters.json': json.dumps({
+        'sample type': {
+            'targets': {'sections': ['method']},
+            'sample associated': True,
+            'flags': ['IGNORECASE'],
+            'categories': {'soil': ['soil', 'Clay'], 'sewage': 'sewage|waste water', 'other': None},
+            'description': {'info': 'The type of sample', 'data': '"soil" or "sewage"'},
+        },
+        'sampling': {
+            'targets': {'sections': ['method']},
+            'semantic': ['samples were collected'],
+            'top': 1,
+            'description': {'info': 'The sampling procedure', 'data': 'a sentence'},
+        },
+    }),
+    'filters.toml': '''
+["sample type"]
+targets = { sections = ["method"] }
+"sample associated" = true
+flags = ["IGNORECASE"]
+categories = { soil = ["soil", "Clay"], sewage = "sewage|waste water", other = false }
+description = { info = "The type of sample", data = '"soil" or "sewage"' }
+
+[sampling]
+targets = { sections = ["method"] }
+semantic = ["samples were collected"]
+top = 1
+description = { info = "The sampling procedure", data = "a sentence" }
+''',
+    'filters.yaml': '''
+sample type:
+  targets: {sections: [method]}
+  sample associated: true
+  flags: [IGNORECASE]
+  categories: {soil: [soil, Clay], sewage: sewage|waste water, other: null}
+  description: {info: The type of sample, data: '"soil" or "sewage"'}
+sampling:
+  targets: {sections: [method]}
+  semantic: [samples were collected]
+  top: 1
+  description: {info: The sampling procedure, data: a sentence}
+''',
+}
+
+# A plugin entry point, loading to the given value
+class EntryPoint:
+    def __init__(self, value):
+        self.value = value
+
+    def load(self):
+        return self.value
+
+class TestLoadFile(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    # Writes a filter file with the given content, returns its path
+    def write(self, name, content):
+        path = f'{self.directory.name}/{name}'
+        with open(path, 'w') as file:
+            file.write(content)
+        return path
+
+    def test_formats(self):
+        for name, content in FILES.items():
+            with self.subTest(name):
+                if name.endswith('.yaml'):
+                    try:
+                        import yaml
+                    except ImportError:
+                        self.skipTest('PyYAML is not installed')
+
+                loaded = filters.load_file(self.write(name, content))
+                self.assertEqual(list(loaded), ['sample type', 'sampling'])
+
+                categories = loaded['sample type']['categories']
+                self.assertEqual(categories['other'], None)
+                self.assertTrue(categories['soil'].fullmatch('clay'))
+                self.assertTrue(categories['sewage'].fullmatch('Waste Water'))
+                self.assertNotIn('flags', loaded['sample type'])
+                self.assertEqual(loaded['sampling']['semantic'], ['samples were collected'])
+
+                # Every format gives the same filters
+                self.assertEqual(filters.version(loaded['sample type']),
+                                 filters.version(filters.load_file(self.write('json.json', FILES['filters.json']))
+                                                 ['sample type']))
+
+    def test_invalid(self):
+        definitions = [
+            {'targets': {}},
+            {'targets': {}, 'description': {}},
+            {'targets': {}, 'description': {}, 'regex': 'a', 'flags': ['UNKNOWN']},
+            {'targets': {}, 'description': {}, 'semantic': []},
+        ]
+        for definition in definitions:
+            with self.assertRaises(ValueError):
+                filters.load_file(self.write('filters.json', json.dumps({'filter': definition})))
+
+        with self.assertRaises(ValueError):
+            filters.load_file(self.write('filters.json', '[]'))
+        with self.assertRaises(ValueError):
+            filters.load_file(self.write('filters.txt', '{}'))
+        with self.assertRaises(ValueError):
+            filters.load_file(self.write('filters.toml', '[broken'))
+
+    def test_without_toml(self):
+        module, filters.tomllib = filters.tomllib, None
+        try:
+            with self.assertRaises(ValueError):
+                filters.load_file(self.write('filters.toml', FILES['filters.toml']))
+        finally:
+            filters.tomllib = module
+
+class TestPlugins(unittest.TestCase):
+    def setUp(self):
+        self.entry_points = filters.entry_points
+
+    def tearDown(self):
+        filters.entry_points = self.entry_points
+
+    def test_load(self):
+        year = {'targets': {'sections': ['method']}, 'regex': re.compile(r'\d{4}'), 'description': {}}
+        plugins = [EntryPoint({'year': year}), EntryPoint(lambda: {'year': dict(year, expanding=True)})]
+        filters.entry_points = lambda group: plugins if group == filters.PLUGIN_GROUP else []
+
+        # Later plugins replace filters of the same name
+        self.assertEqual(filters.load_plugins(), {'year': dict(year, expanding=True)})
+
+class TestVersion(unittest.TestCase):
+    def test_versioned_keys(self):
+        filter = {'targets': {'sections': ['method']}, 'regex': re.compile(r'\d{4}'),
+                  'description': {'info': 'The year', 'data': 'a year'}}
+        version = filters.version(filter)
+
+        # The description does not change the identified information
+        self.assertEqual(filters.version(dict(filter, description={'info': 'The sample year'})), version)
+
+        for changed in [{'regex': re.compile(r'\d{4}', re.IGNORECASE)}, {'targets': {'sections': ['result']}},
+                        {'sample associated': True}, {'expanding': True}]:
+            self.assertNotEqual(filters.version(dict(filter, **changed)), version)
+
+    def test_function(self):
+        def fancy(*_):
+            return []
+
+        def other(*_):
+            return [None]
+
+        filter = {'targets': {}, 'fancy': fancy, 'description': {}}
+        self.assertEqual(filters.version(filter), filters.version(dict(filter)))
+        self.assertNotEqual(filters.version(filter), filters.version(dict(filter, fancy=other)))
+
+if __name__ == '__main__':
+    unittest.main()
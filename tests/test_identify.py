@@ -0,0 +1,253 @@
+'''
+Tests of `identify.py`, end-to-end on small extracted articles in a temporary
+directory.
+'''
+
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+import identify
+import ndjson
+
+# The path of the identify script
+IDENTIFY = os.path.join(os.path.dirname(__file__), '..', 'scripts', 'identify.py')
+
+# Returns an article in the format exported by `extract.py`
+def article(title, methods):
+    return {
+        'metadata': {'title': title, 'publish date': '2023-01-01', 'abstract': None},
+        'sections': [{'name': 'Methods', 'content': methods, 'parent': None}],
+        'section_order': [0],
+        'figures': [{'title': 'Figure 1', 'caption': 'Abundance of ARGs in soil', 'path': None,
+                     'duplicate': False}],
+        'tables': [],
+    }
+
+# The extracted articles
+ARTICLES = {
+    'first': article('Resistance genes in soil',
+                     'Soil samples were collected in 2019 at site A. The site was polluted.'),
+    'second': article('Resistance genes in manure', 'Manure was collected in 2020 using multiplex qPCR.'),
+    'third': article('Resistance genes in sewage', 'Sewage samples (Author et al., 2010) were taken in 2021.'),
+}
+
+class TestIdentify(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        os.makedirs(f'{self.directory.name}/output/extract')
+
+        paths = {}
+        for name, extracted in ARTICLES.items():
+            paths[name] = f'./output/extract/{name}.json'
+            with open(f'{self.directory.name}/output/extract/{name}.json', 'w') as file:
+                json.dump(extracted, file)
+        with open(f'{self.directory.name}/output/extract/results.json', 'w') as file:
+            json.dump(paths, file)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    # Runs `identify.py` with the given arguments, returns the process
+    def run_identify(self, *arguments):
+        return subprocess.run([sys.executable, os.path.abspath(IDENTIFY), *arguments], cwd=self.directory.name,
+                              capture_output=True, text=True)
+
+    # Runs `identify.py` with the given arguments without any cache, returns
+    # the lines of each exported article without the header
+    def identify(self, *arguments):
+        for cache in ['output/identify', 'output/extract/preprocessed']:
+            shutil.rmtree(f'{self.directory.name}/{cache}', ignore_errors=True)
+
+        process = self.run_identify(*arguments)
+        self.assertEqual(process.returncode, 0, process.stdout + process.stderr)
+
+        with open(f'{self.directory.name}/output/identify/results.json') as file:
+            paths = json.load(file)
+
+        lines = {}
+        for name, path in paths.items():
+            with open(os.path.join(self.directory.name, path)) as file:
+                lines[name] = file.readlines()[1:]
+        return lines
+
+    def test_jobs(self):
+        serial = self.identify()
+        self.assertEqual(list(serial), list(ARTICLES))
+        self.assertTrue(all(0 < len(lines) for lines in serial.values()))
+
+        # The workers identify the same information, in the same order
+        parallel = self.identify('--jobs', '2')
+        self.assertEqual(list(parallel), list(ARTICLES))
+        self.assertEqual(parallel, serial)
+
+    def test_ids(self):
+        first = self.identify()
+        infos = [json.loads(line) for lines in first.values() for line in lines]
+        self.assertEqual(len({info['uuid'] for info in infos}), len(infos))
+
+        # Information keeps its id across runs
+        self.assertEqual([[json.loads(line)['uuid'] for line in lines] for lines in self.identify().values()],
+                         [[json.loads(line)['uuid'] for line in lines] for lines in first.values()])
+
+    # Returns the header stamp and the information of the first article
+    def read_first(self):
+        path = f'{self.directory.name}/output/identify/first.ndjson'
+        with open(path) as file:
+            header = json.loads(file.readline())
+        return header['stamp'], list(ndjson.read(path))
+
+    def test_stamps(self):
+        self.identify()
+        stamp, infos = self.read_first()
+        self.assertTrue(all(info['stamp'] == stamp for info in infos))
+
+        # Cached information keeps the stamp of the run identifying it
+        process = self.run_identify()
+        self.assertEqual(process.returncode, 0, process.stdout + process.stderr)
+        rerun_stamp, rerun_infos = self.read_first()
+        self.assertLess(stamp, rerun_stamp)
+        self.assertEqual(rerun_infos, infos)
+
+    def test_sample_label(self):
+        infos = [json.loads(line) for line in self.identify()['first']]
+        labels = {(info['title'], info['sample'], info['sample label']) for info in infos}
+
+        # Sample associated information carries the label of its sample
+        self.assertIn(('sample year', 0, 'site A'), labels)
+        self.assertIn(('article title', None, None), labels)
+        self.assertTrue(all(info['sample label'] is None for info in infos if info['sample'] in (None, -1)))
+
+    def test_semantic(self):
+        with open(f'{self.directory.name}/filters.json', 'w') as file:
+            json.dump({'sampling': {
+                'targets': {'sections': ['method']},
+                'semantic': ['samples were collected at the site'],
+                'description': {'info': 'The sampling procedure', 'data': 'a sentence'},
+            }}, file)
+
+        lines = self.identify('--filters', 'filters.json', '--jobs', '2')
+        infos = [json.loads(line) for line in lines['first']]
+        self.assertIn('Soil samples were collected in 2019 at site A.',
+                      [info['data'] for info in infos if info['title'] == 'sampling'])
+
+        # The vectors and the IDF fitted over the articles share a single store
+        self.assertTrue(os.path.isfile(f'{self.directory.name}/output/extract/embeddings.sqlite'))
+        self.assertFalse(os.path.exists(f'{self.directory.name}/output/extract/embeddings'))
+
+    def test_invalid_jobs(self):
+        for value in ['0', '-2', '1.5', None]:
+            arguments = ['--jobs'] if value is None else ['--jobs', value]
+            process = self.run_identify(*arguments)
+            self.assertEqual(process.returncode, 255)
+            self.assertIn('The --jobs option requires a positive integer', process.stdout)
+
+class TestPreprocessing(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.preprocessed_directory = identify.PREPROCESSED_DIRECTORY
+        identify.PREPROCESSED_DIRECTORY = f'{self.directory.name}/preprocessed'
+
+        self.article = article('Resistance genes in soil', 'Soil (Author et al., 2010) was sampled at site A.')
+        self.article['sections'].append({'name': 'Sampling', 'content': 'Site B (Figure 1) was sampled.',
+                                         'parent': 0})
+        self.article['section_order'].append(1)
+        self.path = f'{self.directory.name}/first.json'
+        self.write(self.article)
+
+    def tearDown(self):
+        identify.PREPROCESSED_DIRECTORY = self.preprocessed_directory
+        self.directory.cleanup()
+
+    def write(self, extracted):
+        with open(self.path, 'w') as file:
+            json.dump(extracted, file)
+
+    def test_ancestry(self):
+        preprocessed = identify.load_preprocessed('first', self.path, self.article)
+        self.assertEqual(preprocessed['sections']['method'], 0)
+        self.assertEqual(preprocessed['ancestry'], [['method'], ['method']])
+        self.assertEqual(preprocessed['samples'], ['site A', 'site B'])
+
+    def test_cache(self):
+        preprocessed = identify.load_preprocessed('first', self.path, self.article)
+        self.assertTrue(preprocessed['modified'])
+        text, offsets = identify.stripped_section(preprocessed, self.article, 0)
+        self.assertEqual(text, 'Soil  was sampled at site A.')
+        identify.write_preprocessed('first', preprocessed)
+
+        # The stripped sections are reused while the article is unchanged
+        cached = identify.load_preprocessed('first', self.path, self.article)
+        self.assertFalse(cached['modified'])
+        self.assertEqual(identify.stripped_section(cached, self.article, 0), [text, [list(part) for part in offsets]])
+        self.assertFalse(cached['modified'])
+
+        # A rewritten article is preprocessed again
+        self.article['sections'][0]['content'] = 'Manure (Author, 2011) was sampled.'
+        self.write(self.article)
+        preprocessed = identify.load_preprocessed('first', self.path, self.article)
+        self.assertTrue(preprocessed['modified'])
+        self.assertEqual(identify.stripped_section(preprocessed, self.article, 0)[0], 'Manure  was sampled.')
+
+class TestInformationId(unittest.TestCase):
+    def test_deterministic(self):
+        id = identify.information_id('first', 'sample year', 'section', 0, (10, 14))
+        self.assertEqual(identify.information_id('first', 'sample year', 'section', 0, (10, 14)), id)
+        self.assertEqual(str(uuid.UUID(id)), id)
+
+        for changed in [('second', 'sample year', 'section', 0, (10, 14)),
+                        ('first', 'sample type', 'section', 0, (10, 14)),
+                        ('first', 'sample year', 'figure caption', 0, (10, 14)),
+                        ('first', 'sample year', 'section', 1, (10, 14)),
+                        ('first', 'sample year', 'section', 0, (10, 15))]:
+            self.assertNotEqual(identify.information_id(*changed), id)
+        self.assertNotEqual(identify.information_id('first', 'sample year', 'section', 0, (10, 14), 1), id)
+
+class TestAdjustSpan(unittest.TestCase):
+    # Maps the span back by walking over the removed references one by one
+    def linear_adjust_span(self, span, offsets):
+        start, end = span
+        for (position, removed) in zip(offsets[0], [b - a for (a, b) in zip([0] + offsets[1], offsets[1])]):
+            if position <= span[0]:
+                start += removed
+            if position < span[1] or position <= span[0]:
+                end += removed
+        return (start, end)
+
+    def test_references(self):
+        text = 'Soil (Author, 2010) and manure (Author, 2011)(Other, 2012) were sampled (2019).'
+        stripped, offsets = identify.exclude_references(text)
+        self.assertEqual(stripped, 'Soil  and manure  were sampled .')
+
+        for word in ['Soil', 'manure', 'sampled']:
+            start = stripped.index(word)
+            span = identify.adjust_span((start, start + len(word)), offsets)
+            self.assertEqual(text[span[0]:span[1]], word)
+
+        # A reference within the span is kept, one at its start or end is not.
+        # An empty span at a reference is placed after it
+        start = stripped.index('manure')
+        span = identify.adjust_span((start, start + len('manure  were')), offsets)
+        self.assertEqual(text[span[0]:span[1]], 'manure (Author, 2011)(Other, 2012) were')
+        self.assertEqual(identify.adjust_span((5, 5), offsets), (19, 19))
+        self.assertEqual(identify.adjust_span((2, 7), identify.NO_OFFSETS), (2, 7))
+
+    def test_random(self):
+        generator = random.Random(1)
+        for _ in range(200):
+            text = ''.join(generator.choice(['a', 'b ', '(c)', '(dd)', ' ']) for _ in range(30))
+            stripped, offsets = identify.exclude_references(text)
+            for _ in range(10):
+                start = generator.randint(0, len(stripped))
+                span = (start, generator.randint(start, len(stripped)))
+                self.assertEqual(identify.adjust_span(span, offsets), self.linear_adjust_span(span, offsets))
+
+if __name__ == '__main__':
+    unittest.main()
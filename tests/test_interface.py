@@ -0,0 +1,103 @@
+'''
+Tests of the loading of articles and records in `interface.py`, from extract
+output written to a temporary directory.
+'''
+
+from bottle import HTTPError
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+import corpus
+import interface
+import pack
+
+# Returns an article in the format exported by `extract.py`
+def article(content):
+    return {
+        'figures': [],
+        'tables': [],
+        'sections': [{'name': 'Methods', 'content': content, 'parent': None}],
+        'section_order': [0],
+        'metadata': {'title': content},
+    }
+
+class TestLoad(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        interface.EXTRACT_PATHS = {'article': f'{self.directory.name}/article.json'}
+        interface.ARTICLE_CACHE = None
+
+    def tearDown(self):
+        if interface.CORPUS is not None:
+            interface.CORPUS.close()
+            interface.CORPUS = None
+        self.directory.cleanup()
+
+    # Writes the JSON export of the article, and the pack file and corpus
+    # store if given
+    def extract(self, content, export_pack=False, store=False):
+        with open(f'{self.directory.name}/article.json', 'w') as file:
+            json.dump(article(content), file)
+        if export_pack:
+            pack.write(f'{self.directory.name}/article.pack', article(content))
+        if store:
+            interface.CORPUS = interface.CORPUS or corpus.Store(f'{self.directory.name}/corpus.sqlite')
+            interface.CORPUS.add('article', article(content),
+                                 corpus.source_stamp(f'{self.directory.name}/article.json'))
+
+    def test_pack(self):
+        self.extract('Packed', export_pack=True)
+        self.assertEqual(interface.load_record('article', 'sections', 0)['content'], 'Packed')
+
+    def test_stale_pack(self):
+        self.extract('Packed', export_pack=True)
+        self.extract('Extracted again')
+
+        # Make sure the JSON export is newer than the pack file
+        stat = os.stat(f'{self.directory.name}/article.pack')
+        os.utime(f'{self.directory.name}/article.json', ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+
+        self.assertEqual(interface.load_record('article', 'sections', 0)['content'], 'Extracted again')
+        self.assertEqual(interface.load_record('article', 'metadata', None), {'title': 'Extracted again'})
+
+    def test_outdated_pack(self):
+        self.extract('Packed', export_pack=True)
+        with open(f'{self.directory.name}/article.pack', 'r+b') as file:
+            file.seek(4)
+            file.write((pack.VERSION + 1).to_bytes(2, 'little'))
+
+        self.assertEqual(interface.load_record('article', 'sections', 0)['content'], 'Packed')
+
+    def test_store(self):
+        self.extract('Stored', store=True)
+        self.assertEqual(interface.load_record('article', 'sections', 0)['content'], 'Stored')
+        self.assertEqual(interface.load_article('article')['metadata'], {'title': 'Stored'})
+
+    def test_stale_store(self):
+        self.extract('Stored', store=True)
+        self.extract('Extracted again with a different length')
+
+        self.assertEqual(interface.load_record('article', 'sections', 0)['content'],
+                         'Extracted again with a different length')
+        self.assertEqual(interface.load_article('article')['sections'][0]['content'],
+                         'Extracted again with a different length')
+
+    def test_not_stored(self):
+        self.extract('Not stored')
+        interface.CORPUS = corpus.Store(f'{self.directory.name}/corpus.sqlite')
+        self.assertEqual(interface.load_article('article')['metadata'], {'title': 'Not stored'})
+
+    def test_missing_article(self):
+        self.extract('Stored', store=True)
+        for load in [lambda: interface.load_article('missing'),
+                     lambda: interface.load_record('missing', 'sections', 0)]:
+            with self.assertRaises(HTTPError) as context:
+                load()
+            self.assertEqual(context.exception.status_code, 404)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+'''
+Tests of the multi-pattern matcher of `matcher.py`, which must give the same
+matches as `finditer` on each pattern.
+'''
+
+import os
+import random
+import re
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+import matcher
+
+# Returns the matches of each pattern using `finditer`, in the format of
+# `Matcher.scan`
+def finditer_matches(patterns, text):
+    return {key: [(*match.span(), match.group()) for match in regex.finditer(text)]
+            for key, regex in patterns.items()}
+
+class TestMatcher(unittest.TestCase):
+    def assertEquivalent(self, patterns, text):
+        self.assertEqual(matcher.Matcher(patterns).scan(text), finditer_matches(patterns, text))
+
+    def test_filters(self):
+        patterns = {
+            'soil': re.compile('soil|soils|Clay', re.IGNORECASE),
+            'args': re.compile(r'\bARG\b|\bARGs\b'),
+            'first alternative': re.compile('sul|sul1'),
+            'year': re.compile(r'\b(19|20)\d{2}\b'),
+            'method': re.compile(r'\bqPCR\b|\bmetagenomic'),
+        }
+        text = 'Soils and clay soil (ARGs, ARG, sARG) in 2019: sul1 and SUL1 by qPCR and metagenomics, soilsoil.'
+
+        self.assertEquivalent(patterns, text)
+        self.assertEqual(list(matcher.Matcher(patterns).separate), ['year'])
+
+    def test_overlapping_patterns(self):
+        # Patterns match independently, while matches of a single pattern do
+        # not overlap
+        patterns = {'short': re.compile('ab|b'), 'long': re.compile('abab|bab'), 'separate': re.compile('a.a')}
+        self.assertEquivalent(patterns, 'abababa bab aba')
+
+    def test_changed_length(self):
+        # Lowercasing 'İ' gives two characters
+        patterns = {'city': re.compile('istanbul|ankara', re.IGNORECASE), 'case': re.compile('Ankara')}
+        self.assertEquivalent(patterns, 'İstanbul, ISTANBUL and Ankara')
+
+    def test_literal_alternatives(self):
+        self.assertEqual(matcher.literal_alternatives(re.compile(r'\bSoil\b|clay', re.IGNORECASE)),
+                         [('soil', True, True), ('clay', False, False)])
+        self.assertIsNone(matcher.literal_alternatives(re.compile(r'soils?')))
+        self.assertIsNone(matcher.literal_alternatives(re.compile('soil', re.MULTILINE)))
+
+    def test_random(self):
+        generator = random.Random(1)
+        words = ['a', 'ab', 'abc', 'b', 'ba', 'Ab', 'AB', 'c', 'cab']
+        for _ in range(200):
+            patterns = {}
+            for i in range(generator.randint(1, 5)):
+                alternatives = [('\\b' if generator.random() < 0.3 else '') + generator.choice(words) +
+                                ('\\b' if generator.random() < 0.3 else '') for _ in range(generator.randint(1, 4))]
+                flags = re.IGNORECASE if generator.random() < 0.5 else 0
+                patterns[i] = re.compile('|'.join(alternatives), flags)
+
+            text = ''.join(generator.choice(words + [' ', '.']) for _ in range(40))
+            with self.subTest(patterns=patterns, text=text):
+                self.assertEquivalent(patterns, text)
+
+if __name__ == '__main__':
+    unittest.main()
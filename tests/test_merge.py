@@ -0,0 +1,90 @@
+'''
+Tests of the merging of identified and reviewed information of `merge.py`.
+'''
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+import merge
+import ndjson
+
+# Returns a piece of identified information
+def identified(title, data, stamp, sample=None):
+    return {'title': title, 'data': data, 'sample': sample, 'uuid': f'{title} {sample}', 'stamp': stamp,
+            'unit': None, 'description': {'info': title, 'data': 'Any value'}}
+
+# Returns a reviewed piece of information stored from the identified one
+def reviewed(info, stamp, **changes):
+    return {**info, 'uuid': f'reviewed {info["uuid"]}', 'origin': info['uuid'], 'stamp': stamp,
+            'description': None, **changes}
+
+class TestMergeInformation(unittest.TestCase):
+    def test_precedence(self):
+        info = identified('sample year', '2019', '2023-01-01T00:00:00')
+        review = reviewed(info, '2023-02-01T00:00:00+00:00', data='2018', unit='year')
+
+        merged = merge.merge_information(info, review)
+        self.assertEqual(merged['data'], '2018')
+        self.assertEqual(merged['uuid'], review['uuid'])
+        self.assertEqual(merged['origin'], info['uuid'])
+        self.assertEqual(merged['description'], info['description'])
+
+        # The unit follows the newest piece of information
+        self.assertEqual(merged['unit'], 'year')
+        info['stamp'] = '2023-03-01T00:00:00+00:00'
+        self.assertEqual(merge.merge_information(info, review)['unit'], None)
+
+    def test_invalid_stamp(self):
+        info = identified('sample year', '2019', '2023-01-01T00:00:00')
+        review = reviewed(info, 'edited', unit='year')
+        self.assertEqual(merge.merge_information(info, review)['unit'], None)
+
+class TestMerge(unittest.TestCase):
+    def test_not_reviewed(self):
+        infos = [identified('sample year', '2019', '2023-01-01T00:00:00')]
+        self.assertEqual(merge.merge(infos, None), infos)
+
+    def test_origin(self):
+        year = identified('sample year', '2019', '2023-01-01T00:00:00')
+        site = identified('sample site', 'Gothenburg', '2023-01-01T00:00:00')
+        manual = {'title': 'sample depth', 'data': '2 m', 'sample': None, 'uuid': 'manual',
+                  'stamp': '2023-02-01T00:00:00+00:00'}
+
+        merged = merge.merge([year, site], [reviewed(year, '2023-02-01T00:00:00+00:00', data='2018'), manual])
+        self.assertEqual([(info['title'], info['data']) for info in merged],
+                         [('sample year', '2018'), ('sample depth', '2 m')])
+
+    def test_identified_after_review(self):
+        year = identified('sample year', '2019', '2023-01-01T00:00:00+00:00')
+        site = identified('sample site', 'Gothenburg', '2023-01-01T00:00:00+00:00')
+        review = reviewed(year, '2023-02-01T00:00:00+00:00')
+
+        # A new filter contributes, unless the reviewer stored its title
+        ph = identified('sample ph', '7', '2023-03-01T00:00:00+00:00')
+        other_year = identified('sample year', '2020', '2023-03-01T00:00:00+00:00', sample=1)
+        merged = merge.merge([year, site, ph, other_year], [review])
+        self.assertEqual([info['title'] for info in merged], ['sample ph', 'sample year'])
+
+    def test_rerun(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = f'{directory}/article.ndjson'
+            year = identified('sample year', '2019', '2023-01-01T00:00:00+00:00')
+            site = identified('sample site', 'Gothenburg', '2023-01-01T00:00:00+00:00')
+            review = reviewed(year, '2023-02-01T00:00:00+00:00')
+
+            # A later run reusing the cached information keeps its stamp,
+            # the dropped information does not come back
+            ph = identified('sample ph', '7', '2023-03-01T00:00:00+00:00')
+            with ndjson.Writer(path, ph['stamp'], {}) as writer:
+                for info in [year, site, ph]:
+                    writer.write(info)
+
+            infos = list(ndjson.read(path))
+            self.assertEqual([info['stamp'] for info in infos], [year['stamp'], site['stamp'], ph['stamp']])
+            self.assertEqual([info['title'] for info in merge.merge(infos, [review])], ['sample ph', 'sample year'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+'''
+Tests of the reading of single pieces of information in `ndjson.py`.
+'''
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+import ndjson
+
+class TestRecord(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = f'{self.directory.name}/article.ndjson'
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    # Writes the pieces of information with the given titles
+    def write(self, titles):
+        with ndjson.Writer(self.path, '2023-01-01T00:00:00', {'sample year': 'The sampling year'}) as writer:
+            for title in titles:
+                writer.write({'title': title, 'data': 'ö' * len(title), 'stamp': None, 'description': None})
+
+    def test_record(self):
+        titles = ['sample year', 'publish date', 'gene abundance']
+        self.write(titles)
+
+        self.assertEqual(ndjson.count(self.path), 3)
+        self.assertEqual([ndjson.record(self.path, i) for i in range(3)], list(ndjson.read(self.path)))
+        self.assertEqual(ndjson.record(self.path, 0)['description'], 'The sampling year')
+        with self.assertRaises(IndexError):
+            ndjson.record(self.path, 3)
+
+    def test_modified_file(self):
+        self.write(['sample year', 'publish date'])
+        ndjson.record(self.path, 1)
+
+        self.write(['gene abundance', 'sample type', 'sample year'])
+        self.assertEqual(ndjson.count(self.path), 3)
+        self.assertEqual(ndjson.record(self.path, 2)['title'], 'sample year')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+'''
+Tests of the pack container of `pack.py`, written from a small article in a
+temporary directory.
+'''
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+import pack
+
+# An article in the format exported by `extract.py`
+ARTICLE = {
+    'figures': [{'title': 'Figure 1', 'caption': 'Abundance of tetM', 'path': 'fig.png', 'duplicate': False}],
+    'tables': [],
+    'sections': [{'name': 'Methods', 'content': 'Samples were collected in 2019 ö', 'parent': None},
+                 {'name': 'Sampling', 'content': '', 'parent': 0}],
+    'section_order': [0, 1],
+    'metadata': {'title': 'An article', 'abstract': None},
+}
+
+class TestPack(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = f'{self.directory.name}/article.pack'
+        self.json_path = f'{self.directory.name}/article.json'
+
+        with open(self.json_path, 'w') as file:
+            json.dump(ARTICLE, file)
+        pack.write(self.path, ARTICLE)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        self.assertEqual(pack.load(self.path), ARTICLE)
+        self.assertEqual(pack.load(self.json_path), ARTICLE)
+
+    def test_record(self):
+        with pack.Reader(self.path) as reader:
+            self.assertEqual(reader.count('sections'), 2)
+            self.assertEqual(reader.record('sections', 1), ARTICLE['sections'][1])
+            self.assertEqual(reader.record('figures', 0), ARTICLE['figures'][0])
+            self.assertEqual(reader.metadata(), ARTICLE['metadata'])
+            with self.assertRaises(IndexError):
+                reader.record('tables', 0)
+
+    def test_version(self):
+        with open(self.path, 'r+b') as file:
+            file.seek(4)
+            file.write((pack.VERSION + 1).to_bytes(2, 'little'))
+
+        with self.assertRaises(ValueError):
+            pack.Reader(self.path)
+
+    def test_fresh(self):
+        self.assertTrue(pack.fresh(self.path, self.json_path))
+        self.assertFalse(pack.fresh(f'{self.directory.name}/missing.pack', self.json_path))
+
+        # Extracting again without writing the pack file makes it stale
+        stat = os.stat(self.path)
+        os.utime(self.json_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        self.assertFalse(pack.fresh(self.path, self.json_path))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+'''
+Tests of the per-article phase timers of `profiler.py`, with a fake clock.
+'''
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+import profiler
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.now = 0
+        self.perf_counter = profiler.time.perf_counter
+        profiler.time.perf_counter = lambda: self.now
+
+    def tearDown(self):
+        profiler.time.perf_counter = self.perf_counter
+
+    # Advances the fake clock by the given seconds
+    def wait(self, seconds):
+        self.now += seconds
+
+    def test_exclusive_phases(self):
+        result = profiler.Profiler()
+        result.start('article')
+        self.wait(1)
+        with result.phase('parsing'):
+            self.wait(2)
+            with result.phase('html2text'):
+                self.wait(3)
+            self.wait(4)
+            with result.phase('html2text'):
+                self.wait(5)
+        result.count('pages')
+        result.count('pages', 2)
+        result.finish()
+
+        # Nested phases are not counted towards the enclosing one
+        self.assertEqual(result.articles, [{'name': 'article', 'seconds': 15, 'counters': {'pages': 3},
+                                            'phases': {'parsing': 6, 'html2text': 8, 'other': 1}}])
+
+    def test_resume(self):
+        worker = profiler.Profiler()
+        worker.start('article')
+        with worker.phase('parsing'):
+            self.wait(2)
+        worker.finish()
+
+        # The article continues in the main process, such as for exporting
+        result = profiler.Profiler()
+        result.resume(worker.articles[0])
+        with result.phase('export'):
+            self.wait(3)
+        result.finish()
+        self.assertEqual(result.articles[0]['seconds'], 5)
+        self.assertEqual(result.articles[0]['phases'], {'parsing': 2, 'export': 3, 'other': 0})
+
+    def test_disabled(self):
+        result = profiler.Profiler(enabled=False)
+        result.start('article')
+        with result.phase('parsing'):
+            self.wait(1)
+        result.count('pages')
+        result.finish()
+        self.assertEqual(result.articles, [])
+
+    def test_report(self):
+        result = profiler.Profiler()
+        for (name, seconds) in [('fast', 1), ('slow', 5), ('medium', 3)]:
+            result.start(name)
+            with result.phase('parsing'):
+                self.wait(seconds)
+            result.count('pages', seconds)
+            result.finish()
+
+        with tempfile.TemporaryDirectory() as directory:
+            result.write(f'{directory}/profile.json', 2)
+            with open(f'{directory}/profile.json') as file:
+                report = json.load(file)
+
+        self.assertEqual((report['articles'], report['seconds']), (3, 9))
+        self.assertEqual(report['phases'], {'parsing': 9, 'other': 0})
+        self.assertEqual(report['counters'], {'pages': 9})
+        self.assertEqual([article['name'] for article in report['slowest']], ['slow', 'medium'])
+
+if __name__ == '__main__':
+    unittest.main()
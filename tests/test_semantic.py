@@ -0,0 +1,105 @@
+'''
+Tests of the semantic matching of `semantic.py`, with the store in a temporary
+directory.
+'''
+
+import numpy as np
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+import semantic
+
+# The texts the IDF is fitted over
+CORPUS = [
+    'Soil samples were collected at the site. The samples were frozen.',
+    'Manure was sampled from three farms. Genes were quantified with qPCR.',
+    'Sewage samples were collected weekly. Sampling was performed in 2019.',
+]
+
+# The prompts of the ranked texts
+PROMPTS = ['samples were collected from the site', 'sampling was performed']
+
+class TestEncoder(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = f'{self.directory.name}/embeddings.sqlite'
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    # Returns a new encoder of the store
+    def encoder(self):
+        encoder = semantic.Encoder(self.path)
+        self.addCleanup(encoder.close)
+        return encoder
+
+    def test_rank(self):
+        encoder = self.encoder()
+        encoder.fit(CORPUS)
+
+        ranked = encoder.rank(CORPUS, PROMPTS, 0.3, 1)
+        self.assertEqual([[sentence for (_, _, sentence) in matches] for matches in ranked],
+                         [['Soil samples were collected at the site.'], [],
+                          ['Sampling was performed in 2019.']])
+
+        start, end, sentence = ranked[0][0]
+        self.assertEqual(CORPUS[0][start:end], sentence)
+
+    def test_batch_independent(self):
+        encoder = self.encoder()
+        encoder.fit(CORPUS)
+
+        # The vectors and ranking of a text do not depend on the texts ranked
+        # with it
+        alone = encoder.rank([CORPUS[2]], PROMPTS, 0.0, 10)
+        batch = encoder.rank(CORPUS, PROMPTS, 0.0, 10)
+        self.assertEqual(alone[0], batch[2])
+
+        spans, sentences, terms, weights = encoder.encode(CORPUS[2])
+        norms = np.bincount(sentences, weights=weights.astype(np.float64) ** 2)
+        self.assertTrue(np.allclose(norms, 1))
+
+    def test_persisted(self):
+        encoder = self.encoder()
+        idf = encoder.fit(CORPUS).copy()
+        encoded = encoder.encode(CORPUS[0])
+        encoder.connection.commit()
+
+        # A later fit keeps the persisted IDF, and the stored vectors are read
+        # back from the single store
+        other = self.encoder()
+        self.assertTrue(other.fitted())
+        self.assertEqual(other.fit(['Unrelated text.']).tolist(), idf.tolist())
+        self.assertEqual(os.listdir(self.directory.name), ['embeddings.sqlite'])
+
+        count = other.connection.execute('SELECT COUNT(*) FROM vectors').fetchone()[0]
+        self.assertEqual(count, 1)
+        for (stored, array) in zip(other.encode(CORPUS[0]), encoded):
+            self.assertEqual(stored.tolist(), array.tolist())
+
+    def test_fit_when_ranking(self):
+        encoder = self.encoder()
+        self.assertFalse(encoder.fitted())
+
+        encoder.rank(CORPUS, PROMPTS, 0.3, 1)
+        self.assertTrue(encoder.fitted())
+
+    def test_version(self):
+        connection = sqlite3.connect(self.path)
+        connection.execute('CREATE TABLE vectors (key TEXT PRIMARY KEY)')
+        connection.execute(f'PRAGMA user_version = {semantic.VERSION - 1}')
+        connection.commit()
+        connection.close()
+
+        # Stores of other versions are emptied
+        encoder = self.encoder()
+        self.assertFalse(encoder.fitted())
+        encoder.fit(CORPUS)
+        self.assertEqual(len(encoder.rank(CORPUS, PROMPTS, 0.3, 1)), 3)
+
+if __name__ == '__main__':
+    unittest.main()
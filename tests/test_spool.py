@@ -0,0 +1,65 @@
+'''
+Tests of the spooled section content of `spool.py`.
+'''
+
+import io
+import json
+import os
+import pickle
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+import spool
+
+class TestSpool(unittest.TestCase):
+    def setUp(self):
+        self.buffer_size = spool.BUFFER_SIZE
+        spool.BUFFER_SIZE = 8
+
+    def tearDown(self):
+        spool.BUFFER_SIZE = self.buffer_size
+
+    # Returns a spool with a section per list of appended pieces of text
+    def spool(self, sections):
+        result = spool.Spool()
+        for pieces in sections:
+            section = result.add_section()
+            for piece in pieces:
+                result.append(section, piece)
+        return result
+
+    def test_read(self):
+        sections = [['Samples ', 'were collected ', 'in 2019\n'], [], ['"quoted" ', 'ö\\ü\t']]
+        result = self.spool(sections)
+        self.assertEqual([result.read(i) for i in range(3)], [''.join(pieces) for pieces in sections])
+
+    def test_strip(self):
+        sections = [['  \n', ' ', '  Samples', ' were ', ' collected  ', ' \n', '   '], [' ', '\n'],
+                    ['ö  '], ['Samples']]
+        result = self.spool(sections)
+        for i in range(len(sections)):
+            result.strip(i)
+        self.assertEqual([result.read(i) for i in range(len(sections))],
+                         [''.join(pieces).strip() for pieces in sections])
+
+    def test_dump(self):
+        result = self.spool([['Samples\n', 'were "collected" ', 'ö\\ü\t']])
+        value = {'metadata': {'title': 'ö', 'year': 2019, 'pdf': None}, 'sections': [
+            {'title': 'Methods', 'content': result.text(0), 'pages': (1, 2)}]}
+
+        output = io.StringIO()
+        spool.dump(value, output.write)
+        value['sections'][0]['content'] = str(value['sections'][0]['content'])
+        self.assertEqual(output.getvalue(), json.dumps(value))
+
+    def test_handover(self):
+        result = self.spool([['Samples ', 'were collected'], ['in 2019']])
+        path = result.path
+
+        received = pickle.loads(pickle.dumps(result))
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual([received.read(0), received.read(1)], ['Samples were collected', 'in 2019'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+'''
+Tests of the summary statistics of `summarize.py`, both of the grouped
+statistics and end-to-end on a small `aggregate.py` output in a temporary
+directory.
+'''
+
+import csv
+import json
+import numpy as np
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+import summarize
+
+# The path of the summarize script
+SUMMARIZE = os.path.join(os.path.dirname(__file__), '..', 'scripts', 'summarize.py')
+
+# Returns a sample in the format of the `aggregate.py` samples JSON
+def sample(article, number, abundance, unit='copies/g', **titles):
+    result = {title.replace('_', ' '): {'title': title.replace('_', ' '), 'data': data, 'expanding': False}
+              for (title, data) in titles.items()}
+    result['gene abundance'] = {'title': 'gene abundance', 'data': abundance, 'expanding': True, 'unit': unit}
+    result['article'] = article
+    result['sample number'] = number
+    return result
+
+# The aggregated samples
+SAMPLES = [
+    sample('first', 0, 'tetM, 1\nsul1, 10', sample_type='soil', polluted='yes'),
+    sample('first', 1, 'tetM, 3\nsul1, n.d.', sample_type='soil', polluted='no'),
+    sample('second', 0, 'tetM, 2\ntetM, 6', sample_type='sewage'),
+    sample('third', 0, 'tetM, 0.5', unit=None),
+]
+
+class TestStatistics(unittest.TestCase):
+    def test_collect_values(self):
+        columns, values = summarize.collect_values(SAMPLES)
+
+        # Non-numeric values are skipped, missing groups are 'NA'
+        self.assertEqual(values.tolist(), [1, 10, 3, 2, 6, 0.5])
+        self.assertEqual(columns['field'].tolist(), ['tetm', 'sul1', 'tetm', 'tetm', 'tetm', 'tetm'])
+        self.assertEqual(columns['unit'].tolist(), ['copies/g'] * 5 + ['NA'])
+        self.assertEqual(columns['polluted'].tolist(), ['yes', 'yes', 'no', 'NA', 'NA', 'NA'])
+
+    def test_group_statistics(self):
+        generator = np.random.default_rng(1)
+        values = generator.normal(size=200)
+        inverse = generator.integers(0, 7, 200)
+        articles = np.array([f'article {i}' for i in generator.integers(0, 20, 200)], dtype=object)
+
+        statistics = summarize.group_statistics(inverse, 7, values, articles)
+        for group in range(7):
+            group_values = values[inverse == group]
+            self.assertEqual(statistics['count'][group], len(group_values))
+            self.assertEqual(statistics['articles'][group], len(set(articles[inverse == group])))
+            self.assertAlmostEqual(statistics['mean'][group], group_values.mean())
+            self.assertAlmostEqual(statistics['std'][group], group_values.std())
+            for (name, quantile) in summarize.QUANTILES.items():
+                self.assertAlmostEqual(statistics[name][group], np.quantile(group_values, quantile))
+
+    def test_group_rows(self):
+        groups, inverse = summarize.group_rows([np.array(['b', 'a', 'b', 'a'], dtype=object),
+                                                np.array(['x', 'x', 'y', 'x'], dtype=object)])
+        self.assertEqual([group.tolist() for group in groups], [['a', 'b', 'b'], ['x', 'x', 'y']])
+        self.assertEqual(inverse.tolist(), [1, 0, 2, 0])
+
+class TestSummarize(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    # Runs `summarize.py` on the given samples, returns the rows of each table
+    def summarize(self, samples):
+        with open(f'{self.directory.name}/samples.json', 'w') as file:
+            json.dump(samples, file)
+
+        subprocess.run([sys.executable, os.path.abspath(SUMMARIZE), '--input', 'samples.json'],
+                       cwd=self.directory.name, check=True, capture_output=True)
+
+        tables = {}
+        for name in list(summarize.SUMMARIES) + ['sample_types']:
+            with open(f'{self.directory.name}/output/summarize/{name}.csv') as file:
+                tables[name] = list(csv.DictReader(file))
+        return tables
+
+    def test_tables(self):
+        tables = self.summarize(SAMPLES)
+
+        self.assertEqual([(row['field'], row['unit'], row['count'], row['articles'], row['median'])
+                          for row in tables['genes']],
+                         [('sul1', 'copies/g', '1', '1', '10.0'), ('tetm', 'NA', '1', '1', '0.5'),
+                          ('tetm', 'copies/g', '4', '2', '2.5')])
+        self.assertEqual([(row['sample type'], row['count'], row['mean']) for row in tables['genes_by_sample_type']
+                          if row['field'] == 'tetm' and row['unit'] == 'copies/g'],
+                         [('sewage', '2', '4.0'), ('soil', '2', '2.0')])
+        self.assertEqual(len(tables['genes_by_group']), 5)
+        self.assertEqual([(row['sample type'], row['polluted'], row['samples'], row['articles'])
+                          for row in tables['sample_types']],
+                         [('NA', 'NA', '1', '1'), ('sewage', 'NA', '1', '1'), ('soil', 'no', '1', '1'),
+                          ('soil', 'yes', '1', '1')])
+
+    def test_empty(self):
+        tables = self.summarize([])
+        self.assertEqual(tables, {name: [] for name in list(summarize.SUMMARIES) + ['sample_types']})
+
+if __name__ == '__main__':
+    unittest.main()
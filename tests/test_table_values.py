@@ -0,0 +1,69 @@
+'''
+Tests of the parsing of gene abundance values from tables in
+`table_values.py`.
+'''
+
+import math
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+import table_values
+
+class TestParseNumber(unittest.TestCase):
+    def test_formats(self):
+        cases = {
+            '12': (12.0, None),
+            '0.0434': (0.0434, None),
+            '-3.5': (-3.5, None),
+            '−3.5': (-3.5, None),
+            '+7': (7.0, None),
+            '1.1e-3': (0.0011, None),
+            '2.5E4': (25000.0, None),
+            '1.1 × 10^-3': (0.0011, None),
+            '1.1 x 10-3': (0.0011, None),
+            '3.2*10^5': (320000.0, None),
+            '4.7 × 10⁻³': (0.0047, None),
+            '1.2 × 10^5 ± 3.1 × 10^4': (120000.0, None),
+            '0.52 ± 0.1': (0.52, None),
+            '0.52 +/- 0.1': (0.52, None),
+            '12 %': (12.0, '%'),
+            '3.4 × 10^6 copies/g': (3400000.0, 'copies/g'),
+            '5 gene copies': (5.0, 'gene copies'),
+            '-2.1 log10': (-2.1, 'log10'),
+            '< 0.001': (0.001, None),
+            '≥5': (5.0, None),
+            '~ 40': (40.0, None),
+        }
+        for cell, expected in cases.items():
+            self.assertEqual(table_values.parse_number(cell), expected, cell)
+
+    def test_not_number(self):
+        for cell in ['', 'n.d.', 'tetM', 'Soil', '1.2.3', '12 apples']:
+            value, unit = table_values.parse_number(cell)
+            self.assertTrue(math.isnan(value), cell)
+            self.assertIsNone(unit)
+
+class TestExtractAbundances(unittest.TestCase):
+    def test_columns(self):
+        content = ('| Gene | Soil (copies/g) | Manure | Site |\n| --- | --- | --- | --- |\n'
+                   '| tetM | 1.1 × 10^-3 | 12 % | A |\n| sul1 | 2.5e4 | 7 % | B |\n| blaCTX-M | n.d. | 3 % | C |')
+        self.assertEqual(table_values.extract_abundances([content]), [[
+            ('Soil (copies/g)', 'tetM, 0.0011\nsul1, 25000.0', 'copies/g'),
+            ('Manure', 'tetM, 12.0\nsul1, 7.0\nblaCTX-M, 3.0', '%'),
+        ]])
+
+    def test_transposed(self):
+        content = '| Sample | tetM | sul1 |\n| Soil | 0.5 | 0.25 |\n| Manure | 1 | 2 |'
+        self.assertEqual(table_values.extract_abundances([content]), [[
+            ('Soil', 'tetM, 0.5\nsul1, 0.25', None),
+            ('Manure', 'tetM, 1.0\nsul1, 2.0', None),
+        ]])
+
+    def test_batch(self):
+        contents = ['| Site | Depth |\n| A | 2 |', '', '| Gene | Value |\n| intI1 | 4 |']
+        self.assertEqual(table_values.extract_abundances(contents), [[], [], [('Value', 'intI1, 4.0', None)]])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+'''
+Tests of the full-text index of `text_index.py`, built from small articles in
+a temporary directory.
+'''
+
+import numpy as np
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+import text_index
+
+# Returns an article in the format exported by `extract.py`
+def article(sections, captions=()):
+    return {
+        'sections': [{'content': content} for content in sections],
+        'figures': [{'caption': caption} for caption in captions],
+        'tables': [],
+    }
+
+class TestTextIndex(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        builder = text_index.Builder()
+        builder.add('first', article(['Soil samples contained tetM and sul1', 'Manure was collected'],
+                                     ['Abundance of tetM in soil, tetM per gram']))
+        builder.add('second', article(['Sewage contained sul1', 'Sampled in İstanbul and İSTANBUL']))
+        builder.write(f'{self.directory.name}/index.bin')
+        self.index = text_index.Index(f'{self.directory.name}/index.bin')
+
+    def tearDown(self):
+        self.index.close()
+        self.directory.cleanup()
+
+    def test_locations(self):
+        hits = self.index.search('TETM')
+
+        self.assertEqual([(hit['article'], hit['kind'], hit['subtype']) for hit in hits],
+                         [('first', 'figure caption', 0), ('first', 'section', 0)])
+        self.assertEqual(hits[0]['locations'], [{'start': 13, 'end': 17}, {'start': 27, 'end': 31}])
+        self.assertEqual(hits[1]['locations'], [{'start': 23, 'end': 27}])
+
+    def test_limit(self):
+        self.assertEqual(len(self.index.search('sul1 manure', limit=2)), 2)
+        self.assertEqual(len(self.index.search('sul1 manure', limit=10)), 3)
+        self.assertEqual(self.index.search('missing'), [])
+
+    def test_changed_length(self):
+        # Lowercasing 'İ' gives two characters, the end is that of the text
+        hits = self.index.search('İSTANBUL')
+        self.assertEqual(hits[0]['locations'], [{'start': 11, 'end': 19}, {'start': 24, 'end': 32}])
+
+class TestBitPacking(unittest.TestCase):
+    def test_round_trip(self):
+        generator = np.random.default_rng(1)
+        for width in [0, 1, 3, 8, 13, 32]:
+            values = generator.integers(0, 2 ** width, 100, dtype=np.uint64).astype(text_index.POSTING_TYPE)
+            data = text_index.pack_bits(values, width)
+            self.assertEqual(len(data), text_index.packed_size(len(values), width))
+            self.assertEqual(text_index.unpack_bits(data, 0, len(values), width).tolist(), values.tolist())
+
+            # Values are read from their bit position
+            start = 37 * width // 8
+            self.assertEqual(text_index.unpack_bits(data[start:], 37 * width % 8, 20, width).tolist(),
+                             values[37:57].tolist())
+
+    def test_bit_width(self):
+        self.assertEqual(text_index.bit_width(np.array([0, 0], dtype=text_index.POSTING_TYPE)), 0)
+        self.assertEqual(text_index.bit_width(np.array([5, 1], dtype=text_index.POSTING_TYPE)), 3)
+        self.assertEqual(text_index.bit_width(np.array([], dtype=text_index.POSTING_TYPE)), 0)
+
+if __name__ == '__main__':
+    unittest.main()